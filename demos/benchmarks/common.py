@@ -0,0 +1,107 @@
+"""Shared runner for the benchmark suite.
+
+Uses ``pyperf`` when it is installed, otherwise falls back to a simple
+timer that accepts the same ``-o/--output`` option and writes a JSON
+file understood by ``compare.py``.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+try:
+    import pyperf
+except ImportError:  # pragma: nocover
+    pyperf = None
+
+
+def metadata():
+    meta = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+    }
+    try:
+        meta["commit"] = (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return meta
+
+
+def available(factories):
+    """Yields ``(engine, value)`` for each factory that can be set up,
+    skipping engines that are not installed.
+    """
+    for engine, factory in factories:
+        try:
+            value = factory()
+        except ImportError:
+            print(f"{engine}: skipped, not installed", file=sys.stderr)
+            continue
+        yield engine, value
+
+
+def run(benchmarks, description=None):
+    """Runs ``benchmarks``, a list of ``(name, func)`` pairs where
+    ``func`` takes no arguments.
+    """
+    if pyperf is not None and "--no-pyperf" not in sys.argv:
+        runner = pyperf.Runner()
+        if description:
+            runner.metadata["description"] = description
+        for name, func in benchmarks:
+            runner.bench_func(name, func)
+        return
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--no-pyperf", action="store_true")
+    parser.add_argument("-o", "--output", help="write JSON results")
+    parser.add_argument("-l", "--loops", type=int, default=100)
+    parser.add_argument("-n", "--values", type=int, default=10)
+    args = parser.parse_args()
+
+    results = []
+    for name, func in benchmarks:
+        values = bench(func, args.loops, args.values)
+        report(name, values)
+        results.append({"name": name, "loops": args.loops, "values": values})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"metadata": metadata(), "benchmarks": results}, f, indent=2
+            )
+
+
+def bench(func, loops, values):
+    for _ in range(3):
+        func()
+
+    result = []
+    for _ in range(values):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        result.append((time.perf_counter() - start) / loops)
+    return result
+
+
+def report(name, values):
+    mean = statistics.mean(values)
+    stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+    print(
+        f"{name:40} | "
+        f"mean: {mean * 1000000:10.1f} us | "
+        f"stdev: {stdev * 1000000:8.1f} us"
+    )
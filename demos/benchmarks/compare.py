@@ -0,0 +1,48 @@
+"""Compares two JSON result files written by the benchmark suite.
+
+    python demos/benchmarks/compare.py before.json after.json
+
+Understands both the fallback format and ``pyperf`` result files.
+"""
+
+import json
+import statistics
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    result = {}
+    for b in data["benchmarks"]:
+        if "runs" in b:
+            name = b["metadata"]["name"]
+            values = [v for r in b["runs"] for v in r.get("values", ())]
+        else:
+            name = b["name"]
+            values = b["values"]
+        if values:
+            result[name] = statistics.mean(values)
+    return result
+
+
+def main(before, after):
+    a = load(before)
+    b = load(after)
+    for name in sorted(set(a) & set(b)):
+        ratio = b[name] / a[name]
+        change = "faster" if ratio < 1 else "slower"
+        print(
+            f"{name:40} | "
+            f"{a[name] * 1000000:10.1f} us -> {b[name] * 1000000:10.1f} us | "
+            f"{max(ratio, 1 / ratio):5.2f}x {change}"
+        )
+    for name in sorted(set(a) ^ set(b)):
+        print(f"{name:40} | missing in one of results")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(2)
+    main(sys.argv[1], sys.argv[2])
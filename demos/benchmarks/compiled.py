@@ -0,0 +1,156 @@
+"""Compares Cython compiled and interpreted builds on the same corpus.
+
+Build extensions in place first (Cython must be installed)::
+
+    pip install cython
+    python setup.py build_ext --inplace
+
+then run::
+
+    python demos/benchmarks/compiled.py --templates 200
+
+Each build runs in a subprocess; the interpreted one imports
+``wheezy.html`` modules from source even though compiled ones exist
+next to them. The C ``boost`` module is used by both.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date
+from importlib.util import spec_from_file_location
+
+from preprocess import DIALECTS, make_tree
+
+
+class InterpretedFinder(object):
+    """Finds ``wheezy.html`` modules in source form."""
+
+    def find_spec(self, fullname, path=None, target=None):
+        if not fullname.startswith("wheezy.html.") or fullname.endswith(
+            ".boost"
+        ):
+            return None
+        name = fullname.rsplit(".", 1)[-1]
+        for entry in path or ():
+            filename = os.path.join(entry, name + ".py")
+            if os.path.isfile(filename):
+                return spec_from_file_location(fullname, filename)
+        return None
+
+
+def best(func, loops):
+    result = None
+    for _ in range(loops):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        result = elapsed if result is None else min(result, elapsed)
+    return result
+
+
+def workload(args):
+    """Runs in a worker process, returns stage timings."""
+    import shutil
+    import tempfile
+
+    from wheezy.html.ext import lexer
+    from wheezy.html.ext.parser import parse_params, parse_str_or_int
+    from wheezy.html.utils import format_value
+
+    results = {}
+    path = tempfile.mkdtemp()
+    try:
+        dialect = DIALECTS[args.engine]([path])
+        corpus = make_tree(path, dialect, args)
+        for name, stage in dialect["stages"]:
+            results[name] = best(
+                lambda: [stage(t) for t in corpus], args.loops
+            )
+            corpus = [stage(t) for t in corpus]
+    finally:
+        shutil.rmtree(path)
+
+    rnd = random.Random(0)
+    params = [
+        rnd.choice(
+            [
+                "",
+                "choices=account_types",
+                '"Username:", class_="inline"',
+                "autocomplete='off', maxlength=12",
+            ]
+        )
+        for _ in range(10000)
+    ]
+    values = [
+        rnd.choice(["text <b>", 42, 3.5, date(2012, 2, 6), None, [1, 2]])
+        for _ in range(10000)
+    ]
+    exprs = [
+        rnd.choice(["model.username", '"Hello"', "100", "user.dob"])
+        for _ in range(10000)
+    ]
+    results["parse_params"] = best(
+        lambda: [parse_params(p) for p in params], args.loops
+    )
+    results["parse_str_or_int"] = best(
+        lambda: [parse_str_or_int(e) for e in exprs], args.loops
+    )
+    results["format_value"] = best(
+        lambda: [format_value(v) for v in values], args.loops
+    )
+    return {
+        "compiled": not lexer.__file__.endswith(".py"),
+        "results": results,
+    }
+
+
+def worker(args):
+    if args.worker == "interpreted":
+        sys.meta_path.insert(0, InterpretedFinder())
+    print(json.dumps(workload(args)))
+
+
+def spawn(mode):
+    output = subprocess.check_output(
+        [sys.executable] + sys.argv + ["--worker", mode]
+    )
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--engine", choices=sorted(DIALECTS), default="template"
+    )
+    parser.add_argument("--templates", type=int, default=100)
+    parser.add_argument("--widgets", type=int, default=30)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--loops", type=int, default=5)
+    parser.add_argument("--worker", choices=["compiled", "interpreted"])
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    compiled = spawn("compiled")
+    interpreted = spawn("interpreted")
+    if not compiled["compiled"]:
+        print("warning: compiled modules not found, see --help")
+    print(f"{'stage':18} | {'interpreted':>14} | {'compiled':>14} |")
+    print("-" * 62)
+    for name, a in interpreted["results"].items():
+        b = compiled["results"][name]
+        print(
+            f"{name:18} | {a * 1000:11.2f} ms | {b * 1000:11.2f} ms | "
+            f"{a / b:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Error class and error message guards before and after the ``errors
+and`` short circuit.
+
+Renders a form of 50 fields (label, textbox, error) with empty and
+non-empty errors through each installed engine, once with widgets
+preprocessed by the baseline ``'name' in errors`` guard and once with
+the current ``errors and 'name' in errors`` guard.
+
+    python demos/benchmarks/error_class.py
+"""
+
+from common import available, run
+
+from wheezy.html.utils import format_value, html_escape
+
+FIELDS = 50
+
+# templates that test errors for a field
+GUARDED_TEMPLATES = ("ERROR_CLASS0", "ERROR_CLASS1", "ERROR")
+
+
+class Model(object):
+    def __init__(self):
+        for i in range(FIELDS):
+            setattr(self, "field%d" % i, "value %d" % i)
+
+
+def make_form(widget):
+    return "\n".join(widget % {"i": i} for i in range(FIELDS))
+
+
+def baseline(p):
+    """Restores the ``'name' in errors`` guard of preprocessor ``p``."""
+    for attr in GUARDED_TEMPLATES:
+        t = getattr(p, attr)
+        assert "errors and " in t
+        setattr(p, attr, t.replace("errors and ", ""))
+    return p
+
+
+# region: engines
+
+
+def wheezy_template():
+    from wheezy.template.engine import Engine
+    from wheezy.template.ext.core import CoreExtension
+    from wheezy.template.loader import DictLoader
+
+    from wheezy.html.ext.template import WheezyPreprocessor
+
+    text = "@require(model, errors)\n" + make_form(
+        "@model.field%(i)d.label('Field %(i)d:')\n"
+        "@model.field%(i)d.textbox()!h\n"
+        "@model.field%(i)d.error()"
+    )
+
+    def build(p):
+        engine = Engine(
+            loader=DictLoader({"form": p(text)}),
+            extensions=[CoreExtension()],
+        )
+        engine.global_vars.update(
+            {"format_value": format_value, "h": html_escape}
+        )
+        return engine.get_template("form").render
+
+    return WheezyPreprocessor, build
+
+
+def jinja2():
+    from jinja2 import Environment
+
+    from wheezy.html.ext.jinja2 import Jinja2Preprocessor
+
+    text = make_form(
+        "{{ model.field%(i)d.label('Field %(i)d:') }}\n"
+        "{{ model.field%(i)d.textbox()|e }}\n"
+        "{{ model.field%(i)d.error() }}"
+    )
+
+    env = Environment()
+
+    def preprocessor():
+        return Jinja2Preprocessor(
+            variable_start_string=env.variable_start_string,
+            variable_end_string=env.variable_end_string,
+        )
+
+    def build(p):
+        return env.from_string(p(text)).render
+
+    return preprocessor, build
+
+
+def mako():
+    from mako.template import Template
+
+    from wheezy.html.ext.mako import MakoPreprocessor
+
+    text = make_form(
+        "${model.field%(i)d.label('Field %(i)d:')}\n"
+        "${model.field%(i)d.textbox()|h}\n"
+        "${model.field%(i)d.error()}"
+    )
+
+    def build(p):
+        template = Template(text, preprocessor=[p])
+        return lambda ctx: template.render(**ctx)
+
+    return MakoPreprocessor, build
+
+
+def tenjin():
+    from tenjin import Template
+    from tenjin.helpers import escape, to_str
+
+    from wheezy.html.ext.tenjin import TenjinPreprocessor
+
+    text = make_form(
+        "#{model.field%(i)d.label('Field %(i)d:')}\n"
+        "${model.field%(i)d.textbox()}\n"
+        "#{model.field%(i)d.error()}"
+    )
+    helpers = {"escape": escape, "to_str": to_str}
+
+    def build(p):
+        template = Template(input=p(text))
+        return lambda ctx: template.render(ctx, helpers)
+
+    return TenjinPreprocessor, build
+
+
+ENGINES = [
+    ("wheezy.template", wheezy_template),
+    ("jinja2", jinja2),
+    ("mako", mako),
+    ("tenjin", tenjin),
+]
+
+
+def benchmarks():
+    model = Model()
+    errors = {"field%d" % i: ["Required field."] for i in range(0, FIELDS, 5)}
+    for engine, (preprocessor, build) in available(ENGINES):
+        for guard, p in [
+            ("baseline", baseline(preprocessor())),
+            ("guarded", preprocessor()),
+        ]:
+            render = build(p)
+            for label, e in [("no errors", {}), ("errors", errors)]:
+                ctx = {"model": model, "errors": e}
+                yield "%s/%s/%s" % (engine, label, guard), (
+                    lambda render=render, ctx=ctx: render(ctx)
+                )
+
+
+if __name__ == "__main__":
+    run(list(benchmarks()), description="widget error guards")
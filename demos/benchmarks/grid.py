@@ -0,0 +1,59 @@
+"""Shared select widgets in an editable grid: the same choices are
+rendered in every row, only the selected option differs.
+
+    python demos/benchmarks/grid.py --rows 200 --options 100
+"""
+
+import argparse
+import time
+
+from wheezy.html.utils import render_scope, widget_select
+
+
+def best(func, loops):
+    result = None
+    for _ in range(loops):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        result = elapsed if result is None else min(result, elapsed)
+    return result
+
+
+def grid(rows, choices):
+    return "".join(
+        [
+            widget_select(
+                "row%d" % i, "row%d" % i, "k%d" % (i % 7), choices, "", "", 0
+            )
+            for i in range(rows)
+        ]
+    )
+
+
+def scoped(rows, choices):
+    with render_scope():
+        return grid(rows, choices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--options", type=int, default=100)
+    parser.add_argument("--loops", type=int, default=10)
+    args = parser.parse_args()
+
+    items = [("k%d" % i, "Option <%d>" % i) for i in range(args.options)]
+    print(f"rows: {args.rows}, options: {args.options}")
+    print("-" * 40)
+    for name, render, choices in [
+        ("list", grid, list(items)),
+        ("list, render scope", scoped, list(items)),
+        ("tuple", grid, tuple(items)),
+    ]:
+        elapsed = best(lambda: render(args.rows, choices), args.loops)
+        print(f"{name:20} | {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Reading of large inlined files: text mode vs binary read with
+explicit encoding vs memory mapped incremental decoding.
+
+Writes a multi-megabyte SVG sprite and JSON document with CRLF line
+endings and reads them with each method; peak memory is traced
+separately from timing.
+
+    python demos/benchmarks/inline_read.py --mb 8
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from wheezy.html.ext import loader
+
+
+def svg_sprite(size):
+    symbol = (
+        '<symbol id="icon-%d" viewBox="0 0 24 24">\r\n'
+        '  <path d="M12 2l3.09 6.26L22 9.27l-5 4.87 1.18 6.88L12 17.77'
+        'l-6.18 3.25L7 14.14 2 9.27l6.91-1.01L12 2z"/>\r\n'
+        "</symbol>\r\n"
+    )
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg">\r\n']
+    length = 0
+    i = 0
+    while length < size:
+        parts.append(symbol % i)
+        length += len(parts[-1])
+        i += 1
+    parts.append("</svg>\r\n")
+    return "".join(parts)
+
+
+def json_document(size):
+    item = {"id": 0, "name": "Café №", "tags": ["a", "b", "c"]}
+    count = size // len(json.dumps(item, ensure_ascii=False))
+    items = [dict(item, id=i) for i in range(count)]
+    return json.dumps(items, ensure_ascii=False, indent=1).replace(
+        "\n", "\r\n"
+    )
+
+
+def text_mode(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def binary(path):
+    loader.MMAP_SIZE = 1 << 62
+    return loader.read_file(path)
+
+
+def mapped(path):
+    loader.MMAP_SIZE = 0
+    return loader.read_file(path)
+
+
+METHODS = [
+    ("text mode", text_mode),
+    ("binary, decode", binary),
+    ("mmap, incremental", mapped),
+]
+
+
+def best(func, loops):
+    result = None
+    for _ in range(loops):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        result = elapsed if result is None else min(result, elapsed)
+    return result
+
+
+def peak(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--mb", type=int, default=8, help="file size, MB")
+    parser.add_argument("--loops", type=int, default=5)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        size = args.mb << 20
+        files = [("svg", svg_sprite(size)), ("json", json_document(size))]
+        print(f"{'file':6} | {'method':18} | {'time':>10} | {'peak':>9}")
+        print("-" * 54)
+        for name, text in files:
+            filename = os.path.join(path, name)
+            with open(filename, "wb") as f:
+                f.write(text.encode("utf-8"))
+            expected = text_mode(filename)
+            for method, read in METHODS:
+                assert expected == read(filename)
+                elapsed = best(lambda: read(filename), args.loops)
+                memory = peak(lambda: read(filename))
+                print(
+                    f"{name:6} | {method:18} | {elapsed * 1000:7.2f} ms | "
+                    f"{memory / 1048576.0:6.1f} MB"
+                )
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""HTML minify benchmark: byte savings and throughput.
+
+Generates the same synthetic template tree as ``preprocess.py``,
+applies inline and widgets stages and compares the whitespace stage
+with the minify stage (and both) on the result.
+
+    python demos/benchmarks/minify.py --engine mako --templates 200
+
+wheezy.template minifies markup tokens, so its timings include
+tokenization by the engine lexer.
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from preprocess import DIALECTS, make_tree
+
+
+def template_minify():
+    from wheezy.template.engine import Engine
+    from wheezy.template.ext.core import CoreExtension
+    from wheezy.template.loader import DictLoader
+
+    from wheezy.html.ext.template import minify_postprocessor
+
+    lexer = Engine(loader=DictLoader({}), extensions=[CoreExtension()]).lexer
+
+    def tokens(text):
+        return lexer.tokenize(text)
+
+    def minify(text):
+        result = lexer.tokenize(text)
+        minify_postprocessor(result)
+        return result
+
+    return tokens, minify
+
+
+def text_minify(module):
+    def minify():
+        m = __import__(module, None, None, ["minify_preprocessor"])
+        return lambda text: text, m.minify_preprocessor
+
+    return minify
+
+
+def jinja2_minify():
+    from jinja2 import Environment
+
+    from wheezy.html.ext.jinja2 import HtmlMinifyExtension
+
+    return lambda text: text, HtmlMinifyExtension(Environment()).preprocessor
+
+
+MINIFIERS = {
+    "template": template_minify,
+    "jinja2": jinja2_minify,
+    "mako": text_minify("wheezy.html.ext.mako"),
+    "tenjin": text_minify("wheezy.html.ext.tenjin"),
+}
+
+
+def size(result):
+    if isinstance(result, str):
+        return len(result.encode("utf-8"))
+    return sum(len(value.encode("utf-8")) for _, _, value in result)
+
+
+def measure(stage, corpus, loops):
+    best = None
+    for _ in range(loops):
+        start = time.perf_counter()
+        result = [stage(text) for text in corpus]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--engine", choices=sorted(DIALECTS), default="template"
+    )
+    parser.add_argument("--templates", type=int, default=100)
+    parser.add_argument("--widgets", type=int, default=30)
+    parser.add_argument("--depth", type=int, default=2, help="inline depth")
+    parser.add_argument(
+        "--density", type=float, default=0.5, help="whitespace density, 0..1"
+    )
+    parser.add_argument("--loops", type=int, default=5)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        dialect = DIALECTS[args.engine]([path])
+        corpus = make_tree(path, dialect, args)
+        stages = dict(dialect["stages"])
+        for name in ("inline", "widgets"):
+            corpus = [stages[name](text) for text in corpus]
+    finally:
+        shutil.rmtree(path)
+
+    tokens, minify = MINIFIERS[args.engine]()
+    whitespace = stages["whitespace"]
+    baseline = sum(size(tokens(text)) for text in corpus)
+    kb = sum(len(text.encode("utf-8")) for text in corpus) / 1024.0
+    print(
+        f"engine: {args.engine}, templates: {args.templates}, "
+        f"widgets: {args.widgets}, density: {args.density}"
+    )
+    print("-" * 78)
+    print(f"{'none':22} | out: {baseline / 1024.0:9.1f} KB |")
+    for name, stage in [
+        ("whitespace", lambda text: tokens(whitespace(text))),
+        ("minify", minify),
+        ("whitespace + minify", lambda text: minify(whitespace(text))),
+    ]:
+        result, elapsed = measure(stage, corpus, args.loops)
+        out = sum(size(r) for r in result)
+        print(
+            f"{name:22} | out: {out / 1024.0:9.1f} KB | "
+            f"saved: {100.0 * (baseline - out) / baseline:5.1f}% | "
+            f"{kb / elapsed:10.1f} KB/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Preprocess-time benchmark and profiling harness.
+
+Generates a synthetic template tree and times each preprocessor stage
+(inline, widgets, whitespace) separately.
+
+    python demos/benchmarks/preprocess.py --templates 200 --widgets 40
+    python demos/benchmarks/preprocess.py --engine mako --tracemalloc
+    python demos/benchmarks/preprocess.py --profile widgets
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+WIDGETS = [
+    "textbox(autocomplete='off')",
+    "password()",
+    "textarea()",
+    "checkbox()",
+    "dropdown(choices=choices)",
+    "radio(choices=choices)",
+    "label('Field:')",
+    "error()",
+]
+
+# region: dialects
+
+
+def template_dialect(searchpath):
+    from wheezy.html.ext.template import (
+        InlineExtension,
+        WhitespaceExtension,
+        WidgetExtension,
+        whitespace_preprocessor,
+    )
+
+    ws = WhitespaceExtension.preprocessors[0]
+    return {
+        "widget": "@model.%s.%s",
+        "inline": '@inline("%s")',
+        "stages": [
+            ("inline", InlineExtension(searchpath).preprocessors[0]),
+            ("widgets", WidgetExtension.preprocessors[0]),
+            ("whitespace", lambda text: whitespace_preprocessor(ws(text))),
+        ],
+    }
+
+
+def jinja2_dialect(searchpath):
+    from jinja2 import Environment
+
+    from wheezy.html.ext.jinja2 import (
+        InlineExtension,
+        WhitespaceExtension,
+        WidgetExtension,
+    )
+
+    env = Environment()
+    return {
+        "widget": "{{ model.%s.%s }}",
+        "inline": '{%% inline "%s" %%}',
+        "stages": [
+            ("inline", InlineExtension(searchpath).preprocessor),
+            ("widgets", WidgetExtension(env).preprocessor),
+            ("whitespace", WhitespaceExtension(env).preprocessor),
+        ],
+    }
+
+
+def mako_dialect(searchpath):
+    from wheezy.html.ext.mako import (
+        inline_preprocessor,
+        whitespace_preprocessor,
+        widget_preprocessor,
+    )
+
+    return {
+        "widget": "${model.%s.%s}",
+        "inline": '<%%inline file="%s" />',
+        "stages": [
+            ("inline", inline_preprocessor(searchpath)),
+            ("widgets", widget_preprocessor),
+            ("whitespace", whitespace_preprocessor),
+        ],
+    }
+
+
+def tenjin_dialect(searchpath):
+    from wheezy.html.ext.tenjin import (
+        inline_preprocessor,
+        whitespace_preprocessor,
+        widget_preprocessor,
+    )
+
+    return {
+        "widget": "#{model.%s.%s}",
+        "inline": '<?py inline("%s") ?>',
+        "stages": [
+            ("inline", inline_preprocessor(searchpath)),
+            ("widgets", widget_preprocessor),
+            ("whitespace", whitespace_preprocessor),
+        ],
+    }
+
+
+DIALECTS = {
+    "template": template_dialect,
+    "jinja2": jinja2_dialect,
+    "mako": mako_dialect,
+    "tenjin": tenjin_dialect,
+}
+
+
+# region: corpus
+
+
+def markup(rnd, density):
+    """Static markup with ``density`` controlling amount of
+    indentation and blank lines.
+    """
+    indent = " " * int(density * 8)
+    blank = "\n" * (1 + int(density * 2))
+    return (
+        indent
+        + '<div class="row">'
+        + blank
+        + indent * 2
+        + "<p>Lorem ipsum %d dolor sit amet.</p>" % rnd.randint(0, 999)
+        + blank
+        + indent
+        + "</div>\n"
+    )
+
+
+def make_tree(path, dialect, args):
+    """Writes partials for inline depth into ``path`` and returns
+    a list of top level templates.
+    """
+    rnd = random.Random(0)
+    for level in range(args.depth):
+        lines = [markup(rnd, args.density) for _ in range(5)]
+        if level + 1 < args.depth:
+            lines.append(dialect["inline"] % ("partial%d.html" % (level + 1)))
+        with open(os.path.join(path, "partial%d.html" % level), "w") as f:
+            f.write("\n".join(lines))
+
+    templates = []
+    for _ in range(args.templates):
+        lines = []
+        if args.depth:
+            lines.append(dialect["inline"] % "partial0.html")
+        for i in range(args.widgets):
+            lines.append(markup(rnd, args.density))
+            lines.append(
+                dialect["widget"] % ("field%d" % i, rnd.choice(WIDGETS))
+            )
+        templates.append("\n".join(lines))
+    return templates
+
+
+# region: measure
+
+
+def measure(stage, corpus, trace):
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = [stage(text) for text in corpus]
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def report(name, corpus, elapsed, peak):
+    size = sum(len(text.encode("utf-8")) for text in corpus)
+    kbps = size / 1024.0 / elapsed if elapsed else 0.0
+    line = (
+        f"{name:12} | "
+        f"in: {size / 1024.0:10.1f} KB | "
+        f"time: {elapsed * 1000:9.2f} ms | "
+        f"{kbps:12.1f} KB/s"
+    )
+    if peak:
+        line += f" | peak: {peak / 1024.0:10.1f} KB"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--engine", choices=sorted(DIALECTS), default="template"
+    )
+    parser.add_argument("--templates", type=int, default=100)
+    parser.add_argument("--widgets", type=int, default=30)
+    parser.add_argument("--depth", type=int, default=2, help="inline depth")
+    parser.add_argument(
+        "--density", type=float, default=0.5, help="whitespace density, 0..1"
+    )
+    parser.add_argument("--tracemalloc", action="store_true")
+    parser.add_argument(
+        "--profile", metavar="STAGE", help="run STAGE under cProfile"
+    )
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        dialect = DIALECTS[args.engine]([path])
+        corpus = make_tree(path, dialect, args)
+        print(
+            f"engine: {args.engine}, templates: {args.templates}, "
+            f"widgets: {args.widgets}, depth: {args.depth}, "
+            f"density: {args.density}"
+        )
+        print("-" * 80)
+        total = 0.0
+        for name, stage in dialect["stages"]:
+            if name == args.profile:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            result, elapsed, peak = measure(stage, corpus, args.tracemalloc)
+            if name == args.profile:
+                profiler.disable()
+            report(name, corpus, elapsed, peak)
+            total += elapsed
+            corpus = result
+        print(f"{'total':12} | {total * 1000:37.2f} ms")
+        if args.profile:
+            print("-" * 80)
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Render-time benchmarks of widget preprocessors.
+
+Renders standard forms through wheezy.template, Jinja2, Mako and Tenjin
+integrations. Engines that are not installed are skipped.
+
+    python demos/benchmarks/render.py -o before.json
+    python demos/benchmarks/render.py -o after.json
+    python -m pyperf compare_to before.json after.json
+
+Without ``pyperf`` installed use ``compare.py`` instead.
+"""
+
+from common import available, run
+
+from wheezy.html.utils import format_value, html_escape
+
+FIELDS = 50
+ROWS = 1000
+
+COUNTRIES = [("c%d" % i, "Country %d" % i) for i in range(50)]
+GENDERS = [("f", "Female"), ("m", "Male"), ("x", "Other")]
+STATUSES = [("s%d" % i, "Status <%d>" % i) for i in range(10)]
+
+
+class Model(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+# region: dialects
+
+DIALECTS = {
+    "wheezy.template": {
+        "raw": "@%s",
+        "escaped": "@%s!h",
+        "for": "@for %s in %s:",
+        "endfor": "@end",
+    },
+    "jinja2": {
+        "raw": "{{ %s }}",
+        "escaped": "{{ %s|e }}",
+        "for": "{%% for %s in %s %%}",
+        "endfor": "{% endfor %}",
+    },
+    "mako": {
+        "raw": "${%s}",
+        "escaped": "${%s|h}",
+        "for": "%% for %s in %s:",
+        "endfor": "% endfor",
+    },
+    "tenjin": {
+        "raw": "#{%s}",
+        "escaped": "${%s}",
+        "for": "<?py for %s in %s: ?>",
+        "endfor": "<?py #endfor ?>",
+    },
+}
+
+PROFILE_WIDGETS = [
+    ("textbox()", "escaped"),
+    ("dropdown(choices=countries)", "raw"),
+    ("textarea()", "escaped"),
+    ("checkbox()", "raw"),
+    ("radio(choices=genders)", "raw"),
+]
+
+
+def login_form(d):
+    return "\n".join(
+        [
+            "<form>",
+            d["raw"] % "model.error()",
+            d["raw"] % "model.username.label('Username:')",
+            d["escaped"] % "model.username.textbox(autocomplete='off')",
+            d["raw"] % "model.username.error()",
+            d["raw"] % "model.password.label('Password:')",
+            d["escaped"] % "model.password.password()",
+            d["raw"] % "model.password.error()",
+            d["raw"] % "model.remember_me.checkbox()",
+            "</form>",
+        ]
+    )
+
+
+def profile_form(d):
+    lines = ["<form>"]
+    for i in range(FIELDS):
+        widget, output = PROFILE_WIDGETS[i % len(PROFILE_WIDGETS)]
+        name = "model.field%d" % i
+        lines.append(d["raw"] % ("%s.label('Field %d:')" % (name, i)))
+        lines.append(d[output] % ("%s.%s" % (name, widget)))
+        lines.append(d["raw"] % ("%s.error()" % name))
+    lines.append("</form>")
+    return "\n".join(lines)
+
+
+def table_form(d):
+    return "\n".join(
+        [
+            "<table>",
+            d["for"] % ("row", "rows"),
+            "<tr><td>",
+            d["escaped"] % "row.name",
+            "</td><td>",
+            d["raw"] % "row.status.dropdown(choices=statuses)",
+            "</td></tr>",
+            d["endfor"],
+            "</table>",
+        ]
+    )
+
+
+FORMS = [
+    ("login", login_form),
+    ("profile", profile_form),
+    ("table", table_form),
+]
+
+
+# region: engines
+
+
+def wheezy_template():
+    from wheezy.template.engine import Engine
+    from wheezy.template.ext.core import CoreExtension
+    from wheezy.template.loader import DictLoader
+
+    from wheezy.html.ext.template import WidgetExtension
+
+    d = DIALECTS["wheezy.template"]
+    require = "@require(model, errors, rows, countries, genders, statuses)\n"
+    engine = Engine(
+        loader=DictLoader({n: require + f(d) for n, f in FORMS}),
+        extensions=[CoreExtension(), WidgetExtension()],
+    )
+    engine.global_vars.update({"format_value": format_value, "h": html_escape})
+
+    def render(name):
+        return engine.get_template(name).render
+
+    return render
+
+
+def jinja2():
+    from jinja2 import DictLoader, Environment
+
+    from wheezy.html.ext.jinja2 import WidgetExtension
+
+    d = DIALECTS["jinja2"]
+    env = Environment(
+        loader=DictLoader({n: f(d) for n, f in FORMS}),
+        extensions=[WidgetExtension],
+    )
+
+    def render(name):
+        return env.get_template(name).render
+
+    return render
+
+
+def mako():
+    from mako.template import Template
+
+    from wheezy.html.ext.mako import widget_preprocessor
+
+    d = DIALECTS["mako"]
+    templates = {
+        n: Template(f(d), preprocessor=[widget_preprocessor]) for n, f in FORMS
+    }
+
+    def render(name):
+        template = templates[name]
+        return lambda ctx: template.render(**ctx)
+
+    return render
+
+
+def tenjin():
+    from tenjin import Template
+    from tenjin.helpers import escape, to_str
+
+    from wheezy.html.ext.tenjin import widget_preprocessor
+
+    d = DIALECTS["tenjin"]
+    helpers = {"escape": escape, "to_str": to_str}
+    templates = {
+        n: Template(input=widget_preprocessor(f(d))) for n, f in FORMS
+    }
+
+    def render(name):
+        template = templates[name]
+        return lambda ctx: template.render(ctx, helpers)
+
+    return render
+
+
+ENGINES = [
+    ("wheezy.template", wheezy_template),
+    ("jinja2", jinja2),
+    ("mako", mako),
+    ("tenjin", tenjin),
+]
+
+
+def context():
+    fields = {"field%d" % i: "value %d" % i for i in range(FIELDS)}
+    fields.update(
+        {
+            "field1": "c7",
+            "field3": True,
+            "field4": "m",
+            "username": "john",
+            "password": "",
+            "remember_me": False,
+        }
+    )
+    rows = [
+        Model(name="Row <%d>" % i, status="s%d" % (i % 10))
+        for i in range(ROWS)
+    ]
+    return {
+        "model": Model(**fields),
+        "errors": {},
+        "rows": rows,
+        "countries": COUNTRIES,
+        "genders": GENDERS,
+        "statuses": STATUSES,
+    }
+
+
+def benchmarks():
+    ctx = context()
+    for engine, render in available(ENGINES):
+        for name, _ in FORMS:
+            f = render(name)
+            yield "%s/%s" % (engine, name), lambda f=f: f(ctx)
+
+
+if __name__ == "__main__":
+    run(list(benchmarks()), description="wheezy.html widget rendering")
@@ -0,0 +1,94 @@
+"""Widget scanning benchmark on pathological input.
+
+Compares ``RE_WIDGETS.finditer`` (backtracking from every expression
+start token) with ``Preprocessor.finditer`` (candidate driven) as the
+input grows. Time per KB should stay flat for a linear scanner.
+
+    python demos/benchmarks/scan.py
+"""
+
+import time
+
+from wheezy.html.ext.template import WheezyPreprocessor
+
+
+def long_lines(n):
+    """Long lines full of ordinary expressions, no widgets."""
+    return ("<p>@user.name @user.email @item.price!h</p>" * 50 + "\n") * n
+
+
+def long_lines_with_widget(n):
+    """Long lines of expressions with a single widget at the end."""
+    return ("@a.b " * 200 + "@model.name.textbox()\n") * n
+
+
+def label_first(n):
+    """A call that is not a widget on the first line, no widgets."""
+    return "@obj.label(\n" + "<p>@user.name @user.email</p>\n" * 100 * n
+
+
+def unclosed_call(n):
+    """A long line of expressions that ends with an unclosed call."""
+    return "@x " * 250 * n + ".textbox(\n"
+
+
+def long_line_calls(n):
+    """A single line of calls that are not widgets."""
+    return "@x" + " .textbox(" * 100 * n
+
+
+def mixed(n):
+    """A typical template: short lines, some widgets."""
+    return (
+        "<div>@model.name.label('Name:')</div>\n"
+        "<div>@model.name.textbox()</div>\n"
+        "<p>@user.name</p>\n" * 20
+    ) * n
+
+
+def measure(func, text, loops=5):
+    best = None
+    for _ in range(loops):
+        start = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    p = WheezyPreprocessor()
+
+    def regex(text):
+        return list(p.RE_WIDGETS.finditer(text))
+
+    def candidates(text):
+        return list(p.finditer(text))
+
+    for name, factory in [
+        ("long lines", long_lines),
+        ("long lines with widget", long_lines_with_widget),
+        ("label first", label_first),
+        ("unclosed call", unclosed_call),
+        ("long line calls", long_line_calls),
+        ("mixed", mixed),
+    ]:
+        print(name)
+        for n in (1, 2, 4, 8, 16):
+            text = factory(n)
+            kb = len(text) / 1024.0
+            a = measure(regex, text)
+            b = measure(candidates, text)
+            assert [m.span() for m in regex(text)] == [
+                m.span() for m in candidates(text)
+            ]
+            print(
+                f"  {kb:9.1f} KB | "
+                f"finditer: {a * 1000000 / kb:9.1f} us/KB | "
+                f"candidates: {b * 1000000 / kb:9.1f} us/KB | "
+                f"{a / b:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
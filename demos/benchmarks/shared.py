@@ -0,0 +1,191 @@
+"""Inline vs shared widget code and cached fragments: generated code
+size, compile and render time.
+
+    python demos/benchmarks/shared.py --fields 40
+
+Engines that are not installed are skipped.
+"""
+
+import argparse
+import time
+
+from wheezy.html.utils import format_value, html_escape, shared_widgets
+
+WIDGETS = [
+    "dropdown(choices=countries)",
+    "radio(choices=genders)",
+    "listbox(choices=countries, class_='wide')",
+    "multiple_checkbox(choices=genders)",
+]
+
+COUNTRIES = tuple(("c%d" % i, "Country %d" % i) for i in range(50))
+GENDERS = (("f", "Female"), ("m", "Male"), ("x", "Other"))
+
+
+class Model(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def form(widget, fields):
+    return "\n".join(
+        [
+            widget % ("field%d" % i, WIDGETS[i % len(WIDGETS)])
+            for i in range(fields)
+        ]
+    )
+
+
+# keyword arguments of widget preprocessors per mode
+MODES = {
+    "inline": {},
+    "shared": {"shared": True},
+    "fragments": {"fragments": True},
+}
+
+# region: engines
+
+
+def wheezy_template(text, mode):
+    from wheezy.template.engine import Engine
+    from wheezy.template.ext.core import CoreExtension
+    from wheezy.template.loader import DictLoader
+
+    from wheezy.html.ext.template import WidgetExtension
+
+    text = "@require(model, errors, countries, genders)\n" + text
+    engine = Engine(
+        loader=DictLoader({"x": text}),
+        extensions=[CoreExtension(), WidgetExtension(**MODES[mode])],
+    )
+    engine.global_vars.update({"format_value": format_value, "h": html_escape})
+    engine.global_vars.update(shared_widgets)
+
+    def compile():
+        engine.remove("x")
+        tokens = engine.lexer.tokenize(text)
+        source = engine.builder.build_render(engine.parser.parse(tokens))
+        engine.compile_template("x")
+        return source
+
+    return "@model.%s.%s", compile, lambda ctx: engine.render("x", ctx, {}, {})
+
+
+def jinja2(text, mode):
+    from jinja2 import Environment
+
+    from wheezy.html.ext.jinja2 import WidgetExtension
+
+    env = Environment(extensions=[WidgetExtension])
+    env.widget_shared = MODES[mode].get("shared", False)
+    env.widget_fragments = MODES[mode].get("fragments", False)
+    template = [None]
+
+    def compile():
+        template[0] = env.from_string(text)
+        return env.compile(text, raw=True)
+
+    return "{{ model.%s.%s }}", compile, lambda ctx: template[0].render(ctx)
+
+
+def mako(text, mode):
+    from mako.template import Template
+
+    from wheezy.html.ext.mako import MakoPreprocessor
+
+    p = MakoPreprocessor(**MODES[mode])
+    template = [None]
+
+    def compile():
+        template[0] = Template(text, preprocessor=[p])
+        return template[0].code
+
+    return "${model.%s.%s}", compile, lambda ctx: template[0].render(**ctx)
+
+
+def tenjin(text, mode):
+    from tenjin import Template
+    from tenjin.helpers import escape, to_str
+
+    from wheezy.html.ext.tenjin import TenjinPreprocessor
+
+    p = TenjinPreprocessor(**MODES[mode])
+    helpers = {"escape": escape, "to_str": to_str}
+    helpers.update(shared_widgets)
+    template = [None]
+
+    def compile():
+        template[0] = Template(input=p(text))
+        return template[0].script
+
+    return (
+        "#{model.%s.%s}",
+        compile,
+        lambda ctx: template[0].render(ctx, helpers),
+    )
+
+
+ENGINES = [
+    ("wheezy.template", wheezy_template),
+    ("jinja2", jinja2),
+    ("mako", mako),
+    ("tenjin", tenjin),
+]
+
+
+def best(func, loops):
+    result = None
+    for _ in range(loops):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        result = elapsed if result is None else min(result, elapsed)
+    return result
+
+
+def measure(factory, fields, mode, loops):
+    widget = factory("", mode)[0]
+    _, compile, render = factory(form(widget, fields), mode)
+    source = compile()
+    ctx = {
+        "model": Model(**{"field%d" % i: ["c1", "f"] for i in range(fields)}),
+        "errors": {},
+        "countries": COUNTRIES,
+        "genders": GENDERS,
+    }
+    return (
+        len(source),
+        best(compile, loops),
+        best(lambda: render(ctx), loops),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--fields", type=int, default=40)
+    parser.add_argument("--loops", type=int, default=10)
+    args = parser.parse_args()
+
+    print(
+        f"{'engine':16} | {'mode':9} | {'source':>9} | "
+        f"{'compile':>10} | {'render':>10}"
+    )
+    print("-" * 67)
+    for engine, factory in ENGINES:
+        try:
+            results = [
+                measure(factory, args.fields, mode, args.loops)
+                for mode in MODES
+            ]
+        except ImportError:
+            print(f"{engine}: skipped, not installed")
+            continue
+        for mode, (size, compile, render) in zip(MODES, results):
+            print(
+                f"{engine:16} | {mode:9} | {size / 1024.0:6.1f} KB | "
+                f"{compile * 1000:7.2f} ms | {render * 1000:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
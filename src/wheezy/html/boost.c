@@ -198,10 +198,37 @@ escape_html_string(PyObject *s)
 }
 
 
+static PyObject *escape_hook = NULL;
+static Py_ssize_t escape_hook_rate = 1;
+static Py_ssize_t escape_hook_count = 0;
+
+
+static PyObject*
+notify_escape_hook(PyObject *result, Py_ssize_t size_in, Py_ssize_t size_out)
+{
+    if (! result || ++escape_hook_count < escape_hook_rate)
+    {
+        return result;
+    }
+
+    escape_hook_count = 0;
+    PyObject *r = PyObject_CallFunction(escape_hook, "nn", size_in, size_out);
+    if (! r)
+    {
+        Py_DECREF(result);
+        return NULL;
+    }
+
+    Py_DECREF(r);
+    return result;
+}
+
+
 static PyObject*
 escape_html(PyObject *self, PyObject *args)
 {
     PyObject *s;
+    PyObject *result;
     if (! PyArg_ParseTuple(args, "O", &s))
     {
         return NULL;
@@ -209,12 +236,26 @@ escape_html(PyObject *self, PyObject *args)
 
     if (PyUnicode_CheckExact(s))
     {
-        return escape_html_unicode(s);
+        result = escape_html_unicode(s);
+        if (escape_hook && result)
+        {
+            return notify_escape_hook(result,
+                                      PyUnicode_GET_LENGTH(s),
+                                      PyUnicode_GET_LENGTH(result));
+        }
+        return result;
     }
 
     if (PyBytes_CheckExact(s))
     {
-        return escape_html_string(s);
+        result = escape_html_string(s);
+        if (escape_hook && result)
+        {
+            return notify_escape_hook(result,
+                                      PyBytes_GET_SIZE(s),
+                                      PyBytes_GET_SIZE(result));
+        }
+        return result;
     }
 
     if (s == Py_None) {
@@ -228,9 +269,50 @@ escape_html(PyObject *self, PyObject *args)
 }
 
 
+static PyObject*
+set_escape_hook(PyObject *self, PyObject *args)
+{
+    PyObject *hook;
+    Py_ssize_t rate = 1;
+    if (! PyArg_ParseTuple(args, "O|n", &hook, &rate))
+    {
+        return NULL;
+    }
+
+    if (hook != Py_None && ! PyCallable_Check(hook))
+    {
+        PyErr_SetString(PyExc_TypeError, "hook must be callable or None");
+        return NULL;
+    }
+
+    if (rate < 1)
+    {
+        PyErr_SetString(PyExc_ValueError, "sample rate must be >= 1");
+        return NULL;
+    }
+
+    PyObject *previous = escape_hook;
+    if (hook == Py_None)
+    {
+        escape_hook = NULL;
+    }
+    else
+    {
+        Py_INCREF(hook);
+        escape_hook = hook;
+    }
+    escape_hook_rate = rate;
+    escape_hook_count = 0;
+    Py_XDECREF(previous);
+    Py_RETURN_NONE;
+}
+
+
 static PyMethodDef module_methods[] = {
     {"escape_html", escape_html, METH_VARARGS,
         "Escapes a string so it is valid within HTML."},
+    {"set_escape_hook", set_escape_hook, METH_VARARGS,
+        "Sets hook(size_in, size_out) called for 1 in rate escape calls."},
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
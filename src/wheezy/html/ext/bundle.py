@@ -0,0 +1,109 @@
+"""A single file bundle of preprocessed templates.
+
+A build step writes preprocessed template text once with
+:py:func:`write_bundle`; each worker opens the file with
+:py:class:`Bundle`, which maps it into memory with ``mmap``, so the
+operating system page cache is shared across processes. Entries are
+decoded once, on first use.
+
+File layout::
+
+    b"WHB1" | index size (uint32, little endian) | index | data
+
+The index is utf-8 JSON mapping template name to ``[offset, length,
+hash]`` of utf-8 encoded text in data.
+"""
+
+import json
+import mmap
+import os
+import struct
+from hashlib import blake2b
+
+MAGIC = b"WHB1"
+HEADER = struct.Struct("<4sI")
+
+
+def content_hash(data):
+    return blake2b(data, digest_size=8).hexdigest()
+
+
+def write_bundle(path, templates, preprocessors=None):
+    """Writes ``templates``, a mapping of name to template text, to
+    a bundle file at ``path``. Each text is passed through the chain
+    of ``preprocessors`` (callables that accept and return text)
+    first.
+    """
+    index = {}
+    chunks = []
+    offset = 0
+    for name in sorted(templates):
+        text = templates[name]
+        if preprocessors:
+            for p in preprocessors:
+                text = p(text)
+        data = text.encode("utf-8")
+        index[name] = [offset, len(data), content_hash(data)]
+        chunks.append(data)
+        offset += len(data)
+    header = json.dumps(index, sort_keys=True).encode("utf-8")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(header)))
+        f.write(header)
+        for data in chunks:
+            f.write(data)
+    os.replace(tmp, path)
+
+
+class Bundle(object):
+    """Read only, memory mapped view of a bundle file.
+
+    If ``verify`` is ``True`` the content hash of each entry is
+    checked on load.
+    """
+
+    def __init__(self, path, verify=False):
+        self.path = path
+        self.verify = verify
+        self.mtime = os.path.getmtime(path)
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            self.mmap.close()
+            raise ValueError('"%s" is not a template bundle.' % path)
+        start = HEADER.size
+        self.index = json.loads(self.mmap[start : start + size])
+        self.data_offset = start + size
+        self.texts = {}
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def names(self):
+        return tuple(sorted(self.index))
+
+    def get(self, name):
+        """Returns template text for ``name`` or ``None``."""
+        text = self.texts.get(name)
+        if text is not None:
+            return text
+        try:
+            offset, length, digest = self.index[name]
+        except KeyError:
+            return None
+        start = self.data_offset + offset
+        data = self.mmap[start : start + length]
+        if self.verify and content_hash(data) != digest:
+            raise ValueError(
+                'Bundle "%s": entry "%s" is corrupted.' % (self.path, name)
+            )
+        text = self.texts[name] = data.decode("utf-8")
+        return text
+
+    def close(self):
+        self.mmap.close()
@@ -1,17 +1,33 @@
 import re
 
 from wheezy.html.ext.lexer import (
+    INLINE_PARAMS,
+    HtmlMinifyPreprocessor,
     InlinePreprocessor,
     Preprocessor,
     WhitespacePreprocessor,
 )
+from wheezy.html.ext.minify import AssetMinifier
+from wheezy.html.utils import html_escape, resolve_choices, shared_widgets
 
 # from jinja2.ext import Extension
 Extension = __import__("jinja2.ext", None, None, ["Extension"]).Extension
+# from jinja2.loaders import BaseLoader, TemplateNotFound
+loaders = __import__("jinja2.loaders", None, None, ["BaseLoader"])
+BaseLoader = loaders.BaseLoader
+TemplateNotFound = loaders.TemplateNotFound
 
 
 class Jinja2Preprocessor(Preprocessor):
-    def __init__(self, variable_start_string=None, variable_end_string=None):
+    def __init__(
+        self,
+        variable_start_string=None,
+        variable_end_string=None,
+        shared=False,
+        html5=False,
+        fragments=False,
+        timing=False,
+    ):
         pattern = (
             r"\{\{((?P<expr>.+?)\."
             r"(?P<widget>%(widgets)s){1}\((?P<params>.*?)\)\s*"
@@ -23,7 +39,11 @@ class Jinja2Preprocessor(Preprocessor):
             )
         if variable_end_string:
             pattern = pattern.replace("\\}\\}", re.escape(variable_end_string))
-        super(Jinja2Preprocessor, self).__init__(pattern)
+        super(Jinja2Preprocessor, self).__init__(
+            pattern, shared, html5, fragments, timing
+        )
+        if variable_start_string:
+            self.LITERAL_UNSAFE += (variable_start_string,)
 
         attrs = [
             "EXPRESSION",
@@ -35,23 +55,33 @@ class Jinja2Preprocessor(Preprocessor):
             "MULTIPLE_HIDDEN",
             "RADIO",
             "MULTIPLE_SELECT",
+            "SHARED",
         ]
-        c = self.__class__.__dict__
         for attr in attrs:
-            t = c[attr]
+            t = getattr(self, attr)
             t = t.replace("{{", variable_start_string)
             t = t.replace("}}", variable_end_string)
             self.__dict__[attr] = t
 
     EXPRESSION = "{{ %(expr)s%(expr_filter)s }}"
 
+    SHARED = "{{ %(call)s|safe }}"
+
+    SHARED_FILTERS = ("", "|e", "|escape")
+
+    # call results are awaited in ``enable_async`` environments, so
+    # choices may be awaitable or an async function
+    SHARED_CHOICES = "resolve_choices(%s)"
+
+    LITERAL_UNSAFE = ("{{", "{%", "{#", "\n", "\\")
+
     ERROR_CLASS0 = """\
-{%% if '%(name)s' in errors: %%}\
+{%% if errors and '%(name)s' in errors: %%}\
  class="error"\
 {%% endif %%}"""
 
     ERROR_CLASS1 = """\
-{%% if '%(name)s' in errors: %%}\
+{%% if errors and '%(name)s' in errors: %%}\
  class="error %(class)s"\
 {%% else: %%}\
  class="%(class)s"\
@@ -79,7 +109,7 @@ value="1"%(attrs)s%(class)s\
  />"""
 
     MULTIPLE_CHECKBOX = """\
-{%% for key, text in %(choices)s: %%}\
+{%% for key, text in resolve_choices(%(choices)s): %%}\
 <label%(attrs)s%(class)s><input id="%(id)s" name="%(name)s" type="checkbox" \
 value="1"%(attrs)s%(class)s\
 {%% if key in %(value)s: %%}\
@@ -89,7 +119,7 @@ value="1"%(attrs)s%(class)s\
 {%% endfor %%}"""
 
     RADIO = """\
-{%% for key, text in %(choices)s: %%}\
+{%% for key, text in resolve_choices(%(choices)s): %%}\
 <label%(attrs)s%(class)s>\
 <input type="radio" name="%(name)s"%(attrs)s \
 value="{{ key%(expr_filter)s }}"%(class)s\
@@ -101,7 +131,7 @@ value="{{ key%(expr_filter)s }}"%(class)s\
 
     SELECT = """\
 <select id="%(id)s" name="%(name)s"%(attrs)s%(class)s>\
-{%% for key, text in %(choices)s: %%}\
+{%% for key, text in resolve_choices(%(choices)s): %%}\
 <option value="{{ key%(expr_filter)s }}"\
 {%% if key == %(value)s: %%}\
  selected="selected"\
@@ -112,7 +142,7 @@ value="{{ key%(expr_filter)s }}"%(class)s\
 
     MULTIPLE_SELECT = """\
 <select id="%(id)s" name="%(name)s" multiple="multiple"%(attrs)s%(class)s>\
-{%% for key, text in %(choices)s: %%}\
+{%% for key, text in resolve_choices(%(choices)s): %%}\
 <option value="{{ key%(expr_filter)s }}"\
 {%% if key in %(value)s: %%}\
  selected="selected"\
@@ -122,7 +152,7 @@ value="{{ key%(expr_filter)s }}"%(class)s\
 </select>"""
 
     ERROR = """\
-{%% if '%(name)s' in errors: %%}\
+{%% if errors and '%(name)s' in errors: %%}\
 <span%(attrs)s>{{ errors['%(name)s'][-1]%(expr_filter)s }}</span>\
 {%% endif %%}"""
 
@@ -133,15 +163,74 @@ value="{{ key%(expr_filter)s }}"%(class)s\
 
 
 class WidgetExtension(Extension):
+    """Translates widgets. If ``widget_translations`` of environment
+    is set, ``_('...')`` string literals are resolved at preprocess
+    time, e.g. with an overlay per locale::
+
+        env_fr = env.overlay()
+        env_fr.widget_translations = gettext.translation(
+            'messages', localedir, ['fr'])
+
+    If ``widget_shared`` of environment is ``True`` choice widgets
+    are rendered by shared helpers registered in environment globals.
+
+    If ``widget_html5`` of environment is ``True`` widgets render
+    HTML5 markup: minimized boolean attributes and void elements.
+
+    If ``widget_fragments`` of environment is ``True`` output of
+    choice widgets is cached by ``wheezy.html.utils.fragment_cache``.
+
+    If ``widget_timing`` of environment is ``True`` widget render
+    durations are reported to ``wheezy.html.utils.widget_timing``.
+    """
+
     def __init__(self, environment):
         super(WidgetExtension, self).__init__(environment)
-        self.preprocessor = Jinja2Preprocessor(
-            variable_start_string=environment.variable_start_string,
-            variable_end_string=environment.variable_end_string,
+        environment.extend(
+            widget_translations=None,
+            widget_shared=False,
+            widget_html5=False,
+            widget_fragments=False,
+            widget_timing=False,
         )
+        environment.globals.update(shared_widgets)
+        environment.globals["resolve_choices"] = resolve_choices
+        self.preprocessors = {}
+        self.preprocessor = self.get_preprocessor(False, False, False, False)
+
+    def get_preprocessor(self, shared, html5, fragments, timing):
+        """Returns a preprocessor for the mode, created on first use."""
+        key = (shared, html5, fragments, timing)
+        p = self.preprocessors.get(key)
+        if p is None:
+            environment = self.environment
+            p = Jinja2Preprocessor(
+                variable_start_string=environment.variable_start_string,
+                variable_end_string=environment.variable_end_string,
+                shared=shared,
+                html5=html5,
+                fragments=fragments,
+                timing=timing,
+            )
+            p.LITERAL_UNSAFE += (
+                environment.block_start_string,
+                environment.comment_start_string,
+            )
+            self.preprocessors[key] = p
+        return p
 
     def preprocess(self, source, name, filename=None):
-        return self.preprocessor(source)
+        environment = self.environment
+        preprocessor = self.get_preprocessor(
+            bool(environment.widget_shared),
+            bool(environment.widget_html5),
+            bool(environment.widget_fragments),
+            bool(environment.widget_timing),
+        )
+        translations = environment.widget_translations
+        if translations is not None:
+            preprocessor = preprocessor.localize(translations)
+        return preprocessor(source, name=name)
 
 
 class WhitespaceExtension(Extension):
@@ -171,18 +260,83 @@ class WhitespaceExtension(Extension):
         )
 
     def preprocess(self, source, name, filename=None):
-        return self.preprocessor(source)
+        return self.preprocessor(source, name=name)
+
+
+class HtmlMinifyExtension(Extension):
+    """Minifies static HTML markup, see
+    :py:class:`~wheezy.html.ext.lexer.HtmlMinifyPreprocessor`.
+    Environment delimiters and line statement or comment prefixes
+    are recognized as directives.
+    """
+
+    def __init__(self, environment):
+        super(HtmlMinifyExtension, self).__init__(environment)
+        self.preprocessor = HtmlMinifyPreprocessor(directives(environment))
+
+    def preprocess(self, source, name, filename=None):
+        return self.preprocessor(source, name=name)
+
+
+def directives(e):
+    """Returns a pattern of template directives of environment ``e``:
+    delimiters and line statement or comment prefixes.
+    """
+    delimiters = [
+        (e.comment_start_string, e.comment_end_string),
+        (e.block_start_string, e.block_end_string),
+        (e.variable_start_string, e.variable_end_string),
+    ]
+    # longer start string first, e.g. comment <%# vs block <%
+    delimiters.sort(key=lambda d: -len(d[0]))
+    patterns = [
+        re.escape(start) + ".*?" + re.escape(end) for start, end in delimiters
+    ]
+    if e.line_statement_prefix:
+        patterns.append(
+            r"^[ \t]*" + re.escape(e.line_statement_prefix) + ".*?$"
+        )
+    if e.line_comment_prefix:
+        patterns.append(re.escape(e.line_comment_prefix) + ".*?$")
+    return re.compile("|".join(patterns), re.MULTILINE | re.DOTALL)
 
 
 RE_INLINE = re.compile(
-    r'{%\s*inline\s+("|\')(?P<path>.+?)\1\s*%}', re.MULTILINE
+    r'{%\s*inline\s+("|\')(?P<path>.+?)\1' + INLINE_PARAMS + r"\s*%}",
+    re.MULTILINE,
 )
 
+# directives of environment with default delimiters
+RE_DIRECTIVES = re.compile(r"\{#.*?#\}|\{%.*?%\}|\{\{.*?\}\}", re.DOTALL)
+
+# a variable of inlined file replaced by a literal inline parameter,
+# e.g. {{ title }} or {{ title|e }}
+INLINE_PLACEHOLDER = r"\{\{\s*%s\s*(?P<filters>\|[^}]*)?\}\}"
+# filters applied to a literal inline parameter
+INLINE_FILTERS = {
+    "e": html_escape,
+    "escape": html_escape,
+    "safe": str,
+    "string": str,
+}
+
 
 class InlineExtension(Extension):
     """Inline preprocessor. Rewrite {% inline "..." %} tag with
     file content. If fallback is ``True`` rewrite to
-    {% include "..." %} tag.
+    {% include "..." %} tag. If policy
+    (:py:class:`~wheezy.html.ext.lexer.InlinePolicy`) is specified it
+    decides per path. Files are loaded by loader (see
+    :py:mod:`wheezy.html.ext.loader`) if specified, otherwise from
+    searchpath.
+
+    Literal parameters, e.g. {% inline "..." title="..." %}, replace
+    {{ title }} or escaped {{ title|e }} in file content. An asset
+    inlined with as_="data-uri" parameter is replaced by data URI, see
+    :py:class:`~wheezy.html.ext.lexer.DataURIEncoder`. Content inlined
+    with as_="css" or as_="js" parameter, or within <style> and <script>
+    elements if minify is ``True``, is minified, see
+    :py:class:`~wheezy.html.ext.minify.AssetMinifier`.
 
     >>> t = '1 {% inline "master.html" %} 2'
     >>> m = RE_INLINE.search(t)
@@ -193,17 +347,60 @@ class InlineExtension(Extension):
     >>> m = RE_INLINE.search(' {% inline "shared/footer.html" %}')
     >>> m.group('path')
     'shared/footer.html'
+    >>> m = RE_INLINE.search('{% inline "title.html" title="Sign in" %}')
+    >>> m.group('path'), m.group('params')
+    ('title.html', ' title="Sign in"')
     """
 
-    def __init__(self, searchpath, fallback=False):
-        strategy = (
-            fallback and (lambda path: '{% include "' + path + '" %}') or None
+    def __init__(
+        self,
+        searchpath=None,
+        fallback=False,
+        policy=None,
+        loader=None,
+        data_uri=None,
+        minify=False,
+    ):
+        def include(path):
+            return '{% include "' + path + '" %}'
+
+        self.preprocessor = InlinePreprocessor(
+            RE_INLINE,
+            searchpath,
+            fallback and include or None,
+            policy,
+            include,
+            INLINE_PLACEHOLDER,
+            loader,
+            data_uri,
+            AssetMinifier(RE_DIRECTIVES, minify),
+            INLINE_FILTERS,
         )
-        self.preprocessor = InlinePreprocessor(RE_INLINE, searchpath, strategy)
 
     def __call__(self, environment):  # pragma: nocover
         super(InlineExtension, self).__init__(environment)
+        self.preprocessor.minifier.directives = directives(environment)
         return self
 
     def preprocess(self, source, name, filename=None):
-        return self.preprocessor(source)
+        return self.preprocessor(source, name=name)
+
+
+class BundleLoader(BaseLoader):
+    """Loads preprocessed templates from
+    :py:class:`~wheezy.html.ext.bundle.Bundle`. Since the text is
+    already preprocessed, widget, whitespace and inline extensions
+    are not needed in the environment.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+
+    def get_source(self, environment, template):
+        source = self.bundle.get(template)
+        if source is None:
+            raise TemplateNotFound(template)
+        return source, None, lambda: True
+
+    def list_templates(self):
+        return list(self.bundle.names())
@@ -1,19 +1,139 @@
-import os.path
+import mimetypes
 import re
+from base64 import b64encode
+from copy import copy
+from threading import Lock
+from time import perf_counter
+from urllib.parse import quote
 from warnings import warn
 
+try:
+    import cython
+except ImportError:  # pragma: nocover
+    from wheezy.html import shadow as cython
+
+from wheezy.html.ext.bundle import content_hash
+from wheezy.html.ext.loader import FileLoader
+from wheezy.html.ext.minify import MINIFIERS, AssetMinifier, asset_context
 from wheezy.html.ext.parser import (
     parse_known_function,
     parse_name,
     parse_params,
     parse_str_or_int,
 )
-from wheezy.html.utils import html_id
+from wheezy.html.utils import html_escape, html_id
+
+# widgets pattern matches ``.widget(`` literally, an expression before
+# it cannot span lines
+RE_CALL_PATTERN = re.compile(r"\\\.\(\?P<widget>%\(widgets\)s\)(\{1\})?\\\(")
+
+# static text passed to shared widget helpers must be safe to embed in
+# a call expression of any engine
+RE_SHARED_SAFE = re.compile(r"^[^(){}\[\]\\\n@$#%]*$")
+
+# name a widget expression starts with, e.g. ``model`` in
+# ``model.username`` or ``countries`` in ``countries[:10]``
+RE_ROOT_NAME = re.compile(r"\s*([A-Za-z_]\w*)")
+
+# gettext call with a single string literal, e.g. _('Username:')
+RE_GETTEXT = re.compile(r"""^_\(\s*(?P<msg>'[^'\\]*'|"[^"\\]*")\s*\)$""")
+
+# literal parameters of an inline tag, e.g. ``, title="Sign in"``, a
+# part of engine inline patterns
+INLINE_PARAMS = r"""(?P<params>(?:\s*,?\s*\w+\s*=\s*(?:"[^"]*"|'[^']*'))*)"""
+RE_INLINE_PARAM = re.compile(r"""(\w+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+# names in the ``filters`` group of an inline placeholder, e.g. ``|e``
+RE_INLINE_FILTER = re.compile(r"[^\s|!,]+")
+
+# inline parameter of an asset inlined as data URI
+DATA_URI = ("as_", "data-uri")
+
+# rewrites XHTML markup of widget templates to HTML5: minimized
+# boolean attributes, void elements and unquoted static values
+HTML5_RULES = [
+    (re.compile(r' (checked|selected|multiple)="\1"'), r" \1"),
+    (re.compile(r" />"), r">"),
+    (re.compile(r'(\s[\w-]+)="([\w-]+)"'), r"\1=\2"),
+]
+
+# widget templates rewritten by HTML5 rules
+HTML5_TEMPLATES = [
+    "CHECKBOX",
+    "ERROR_CLASS0",
+    "ERROR_CLASS1",
+    "HIDDEN",
+    "INPUT",
+    "LABEL",
+    "MULTIPLE_CHECKBOX",
+    "MULTIPLE_HIDDEN",
+    "MULTIPLE_SELECT",
+    "RADIO",
+    "SELECT",
+    "TEXTAREA",
+]
+
+
+def html5_markup(text):
+    """Rewrites XHTML widget markup in ``text`` to HTML5.
+
+    >>> html5_markup('<input type="checkbox" checked="checked" />')
+    '<input type=checkbox checked>'
+    >>> html5_markup('<select name="%(name)s" multiple="multiple">')
+    '<select name="%(name)s" multiple>'
+    """
+    for r, s in HTML5_RULES:
+        text = r.sub(s, text)
+    return text
+
+
+@cython.cfunc
+@cython.inline
+def line_start(
+    text, pos: cython.Py_ssize_t, end: cython.Py_ssize_t
+) -> cython.Py_ssize_t:
+    """Returns index of the line start that precedes ``end``, but not
+    before ``pos``.
+    """
+    start: cython.Py_ssize_t = text.rfind("\n", pos, end) + 1
+    return start if start > pos else pos
+
+
+def line_end(text, pos: cython.Py_ssize_t) -> cython.Py_ssize_t:
+    """Returns index of the line end that follows ``pos``."""
+    end: cython.Py_ssize_t = text.find("\n", pos)
+    return end if end >= 0 else len(text)
+
+
+def source_name(text):
+    """Identifies a template by a hash of its source ``text``."""
+    return "#" + content_hash(text.encode("utf-8"))
+
+
+def observe(preprocessor, text, kwargs):
+    """Processes ``text`` with ``preprocessor`` and notifies its
+    observer about stage duration, size and counters.
+    """
+    observer = preprocessor.observer
+    template = kwargs.get("name")
+    counts = {}
+    start = perf_counter()
+    result = preprocessor.process(text, counts, template)
+    duration = perf_counter() - start
+    observer.on_stage(
+        preprocessor.stage, template, duration, len(text), len(result)
+    )
+    if counts:
+        observer.on_count(preprocessor.stage, template, counts)
+    return result
 
 
 class Preprocessor(object):
     """Generic widget preprocessor."""
 
+    observer = None
+    stage = "widgets"
+    translations = None
+
     CHECKBOX = None
     ERROR = None
     ERROR_CLASS0 = None
@@ -21,13 +141,26 @@ class Preprocessor(object):
     EXPRESSION = None
     HIDDEN = '<input type="hidden" name="%(name)s" value="%(value)s" />'
     INPUT = None
+    # translated text is not embedded into template source if it
+    # contains any of these
+    LITERAL_UNSAFE = ("\n", "\\")
     LABEL = '<label for="%(id)s"%(attrs)s%(class)s>%(value)s</label>'
     MESSAGE = None
     MULTIPLE_CHECKBOX = None
     MULTIPLE_HIDDEN = None
+    MULTIPLE_SELECT = None
     PREPEND = None
     RADIO = None
     SELECT = None
+    # engine code that renders result of a shared widget helper call
+    SHARED = None
+    # choices argument of a shared widget helper call
+    SHARED_CHOICES = "%s"
+    # expression filters shared helpers render the same as templates:
+    # none or the escape filter of engine
+    SHARED_FILTERS = ("",)
+    # imports widget timer helpers in timing mode
+    TIMING_PREPEND = None
     TEXTAREA = (
         '<textarea id="%(id)s" name="%(name)s"%(attrs)s%(class)s>'
         "%(value)s</textarea>"
@@ -35,7 +168,23 @@ class Preprocessor(object):
 
     # region: preprocessing
 
-    def __init__(self, widgets_pattern):
+    def __init__(
+        self,
+        widgets_pattern,
+        shared=False,
+        html5=False,
+        fragments=False,
+        timing=False,
+    ):
+        self.shared = shared
+        self.html5 = html5
+        self.fragments = fragments
+        self.timing = timing
+        if html5:
+            for attr in HTML5_TEMPLATES:
+                t = getattr(self, attr)
+                if t:
+                    self.__dict__[attr] = html5_markup(t)
         self.widgets = {
             "checkbox": self.checkbox,
             "dropdown": self.dropdown,
@@ -56,25 +205,168 @@ class Preprocessor(object):
             "warning": self.warning,
         }
         assert "%(widgets)s" in widgets_pattern
-        self.RE_WIDGETS = re.compile(
-            widgets_pattern % {"widgets": "|".join(self.widgets.keys())}
-        )
+        names = "|".join(self.widgets.keys())
+        self.RE_WIDGETS = re.compile(widgets_pattern % {"widgets": names})
+        # a token a widget expression starts with, e.g. ``@`` or ``{{``,
+        # and the rest of widget that follows the expression
+        if (
+            RE_CALL_PATTERN.search(widgets_pattern)
+            and "((?P<expr>.+?)" in widgets_pattern
+        ):
+            head, tail = widgets_pattern.split("((?P<expr>.+?)", 1)
+            self.RE_CANDIDATES = re.compile(r"\.(%s)\(" % names)
+            self.RE_START = re.compile(head)
+            self.RE_TAIL = re.compile("(" + tail % {"widgets": names})
+        else:
+            self.RE_CANDIDATES = self.RE_START = self.RE_TAIL = None
+        self.localized = {}
+
+    def localize(self, translations):
+        """Returns a copy of this preprocessor that resolves
+        ``_('...')`` string literals with ``translations`` (an object
+        with ``gettext`` method, e.g. ``gettext.GNUTranslations``)
+        at preprocess time. Copies are cached per ``translations``.
+        """
+        p = self.localized.get(translations)
+        if p is None:
+            p = copy(self)
+            p.translations = translations
+            p.widgets = {
+                kind: getattr(p, widget.__name__)
+                for kind, widget in self.widgets.items()
+            }
+            self.localized[translations] = p
+        return p
 
     def __call__(self, text, **kwargs):
         """Preprocess input text."""
+        if self.observer is not None:
+            return observe(self, text, kwargs)
+        return self.process(text, None, kwargs.get("name"))
+
+    @cython.locals(
+        start=cython.Py_ssize_t, line=cython.Py_ssize_t, result=list
+    )
+    def process(self, text, counts=None, name=None):
+        """Translates widgets in ``text``. Widget kinds are counted
+        in ``counts`` if specified. In timing mode widget durations
+        are reported with template ``name``, or with a hash of ``text``
+        if the engine does not pass the name, so widgets of different
+        templates are not merged.
+        """
+        name = source_name(text) if self.timing and name is None else name
         result = []
         start = 0
-        for m in self.RE_WIDGETS.finditer(text):
+        line = 1
+        for m in self.finditer(text):
             result.append(text[start : m.start()])
-            start = m.end()
             args = m.groupdict()
-            widget = self.widgets[args.pop("widget")]
-            result.append(widget(**args))
-        if start > 0 and self.PREPEND:
-            result.insert(0, self.PREPEND)
+            kind = args.pop("widget")
+            if counts is not None:
+                counts[kind] = counts.get(kind, 0) + 1
+            code = self.widgets[kind](**args)
+            if self.timing:
+                line += text.count("\n", start, m.start())
+                code = self.timed(code, name, line, args["expr"])
+            start = m.end()
+            result.append(code)
+        if start > 0:
+            if self.PREPEND:
+                result.insert(0, self.PREPEND)
+            if self.timing and self.TIMING_PREPEND:
+                result.insert(0, self.TIMING_PREPEND)
         result.append(text[start:])
         return "".join(result)
 
+    def timed(self, code, template, line, expr):
+        """Wraps widget ``code`` with calls of timer helpers from
+        :py:mod:`wheezy.html.utils`.
+        """
+        return (
+            self.SHARED % {"call": "widget_timer_start()"}
+            + code
+            + self.SHARED
+            % {
+                "call": "widget_timer_stop(%r, %d, %r)"
+                % (template, line, parse_name(expr.strip()))
+            }
+        )
+
+    @cython.locals(pos=cython.Py_ssize_t, end=cython.Py_ssize_t)
+    def finditer(self, text):
+        """Yields the same matches as ``RE_WIDGETS.finditer``.
+
+        Candidate ``.widget(`` occurrences are located first with a
+        plain scan, so text without widgets is never scanned by the
+        backtracking widgets pattern. An expression cannot span lines,
+        so a widget starts at the first expression start token on the
+        line of its candidate and ends with the first candidate after
+        that token: the rest of widget (``RE_TAIL``) is matched there
+        once. If it fails, it fails for any later candidate and token
+        of the line, so the line is skipped; otherwise the widgets
+        pattern is matched up to the known end. Each line is scanned
+        a constant number of times.
+        """
+        if self.RE_CANDIDATES is None:
+            yield from self.RE_WIDGETS.finditer(text)
+            return
+        candidate = self.RE_CANDIDATES.search
+        match = self.RE_WIDGETS.match
+        first = self.RE_START.search
+        tail = self.RE_TAIL.match
+        pos = 0
+        while True:
+            c = candidate(text, pos)
+            if c is None:
+                return
+            start = line_start(text, pos, c.start())
+            s = first(text, start, c.start())
+            if s is None:
+                # no expression starts before the candidate
+                pos = c.end()
+                continue
+            end = line_end(text, c.end())
+            if c.start() == s.end():
+                # an expression is not empty
+                c = candidate(text, c.end())
+            t = c is not None and c.start() < end and tail(text, c.start())
+            if not t:
+                pos = end
+                continue
+            m = match(text, s.start(), t.end())
+            yield m
+            pos = m.end()
+
+    def bindings(self, text):
+        """Returns a list of ``(widget, expr, choices)`` for widgets
+        in ``text``, ``choices`` is ``None`` if the widget has no
+        choices.
+        """
+        result = []
+        for m in self.finditer(text):
+            args, kwargs = parse_params(m.group("params"))
+            result.append(
+                (
+                    m.group("widget"),
+                    m.group("expr").strip(),
+                    kwargs.get("choices"),
+                )
+            )
+        return result
+
+    def context_names(self, text):
+        """Returns a sorted list of context names that widgets in
+        ``text`` refer to, see
+        :py:func:`~wheezy.html.utils.gather_context`.
+        """
+        names = set()
+        for widget, expr, choices in self.bindings(text):
+            for e in (expr, choices):
+                m = e and RE_ROOT_NAME.match(e)
+                if m:
+                    names.add(m.group(1))
+        return sorted(names)
+
     # region: helpers
 
     def expression(self, text, expr_filter=""):
@@ -82,11 +374,26 @@ class Preprocessor(object):
         python expression.
         """
         value = parse_str_or_int(text)
+        if not value and self.translations is not None:
+            value = self.translate(text)
         return value or self.EXPRESSION % {
             "expr": text,
             "expr_filter": expr_filter,
         }
 
+    def translate(self, text):
+        """Returns html escaped translation if ``text`` is a gettext
+        call with a string literal, otherwise ``None``.
+        """
+        m = RE_GETTEXT.match(text)
+        if m is None:
+            return None
+        value = html_escape(self.translations.gettext(m.group("msg")[1:-1]))
+        for s in self.LITERAL_UNSAFE:
+            if s in value:
+                return None
+        return value
+
     def join_attrs(self, kwargs):
         """Joins ``kwargs`` as html attributes."""
         if kwargs:
@@ -99,6 +406,64 @@ class Preprocessor(object):
         else:
             return ""
 
+    def static_value(self, text):
+        """Returns literal value of ``text`` if it is safe to pass to
+        a shared widget helper, otherwise ``None``.
+        """
+        value = parse_str_or_int(text)
+        if value is None and self.translations is not None:
+            value = self.translate(text)
+        if value is None or not RE_SHARED_SAFE.match(value):
+            return None
+        return value
+
+    def shared_filter(self, expr_filter):
+        """Checks if shared helpers, which escape values, render the
+        same as templates with expression filter ``expr_filter``.
+        """
+        return "".join(expr_filter.split()) in self.SHARED_FILTERS
+
+    def shared_call(
+        self, helper, name, expr, choices, kwargs, class_, expr_filter
+    ):
+        """Returns code that renders widget with a shared helper from
+        :py:mod:`wheezy.html.utils` or ``None`` if shared and fragments
+        modes are off, widget attributes are not static or expression
+        filter is not supported by helpers. In fragments mode the helper
+        call is cached by ``widget_fragment``.
+        """
+        shared = self.shared or self.fragments
+        if not shared or not self.shared_filter(expr_filter):
+            return None
+        attrs = []
+        for k in sorted(kwargs.keys()):
+            value = self.static_value(kwargs[k])
+            if value is None:
+                return None
+            attrs.append(' %s="%s"' % (k, value))
+        if class_:
+            class_ = self.static_value(class_)
+            if class_ is None:
+                return None
+        if self.fragments:
+            helper = "widget_fragment(" + helper + ", "
+        else:
+            helper += "("
+        return self.SHARED % {
+            "call": "%s%r, %r, %s, %s, %r, %r, errors and %r in errors%s)"
+            % (
+                helper,
+                html_id(name),
+                name,
+                expr,
+                self.SHARED_CHOICES % choices,
+                "".join(attrs),
+                class_ or "",
+                name,
+                self.html5 and ", True" or "",
+            )
+        }
+
     def error_class(self, name, class_):
         """Checks for error and add css class error."""
         if class_:
@@ -122,6 +487,11 @@ class Preprocessor(object):
     def multiple_hidden(self, expr, params, expr_filter):
         """Multiple HTML element input of type hidden."""
         name = parse_name(expr)
+        if self.shared and self.shared_filter(expr_filter):
+            return self.SHARED % {
+                "call": "widget_multiple_hidden(%r, %s%s)"
+                % (name, expr, self.html5 and ", True" or "")
+            }
         return self.MULTIPLE_HIDDEN % {
             "name": name,
             "value": expr,
@@ -216,6 +586,17 @@ class Preprocessor(object):
         args, kwargs = parse_params(params)
         choices = kwargs.pop("choices")
         class_ = kwargs.pop("class", None)
+        call = self.shared_call(
+            "widget_multiple_checkbox",
+            name,
+            expr,
+            choices,
+            kwargs,
+            class_,
+            expr_filter,
+        )
+        if call:
+            return call
         return self.MULTIPLE_CHECKBOX % {
             "id": html_id(name),
             "name": name,
@@ -232,6 +613,17 @@ class Preprocessor(object):
         args, kwargs = parse_params(params)
         class_ = kwargs.pop("class", None)
         choices = kwargs.pop("choices")
+        call = self.shared_call(
+            "widget_radio",
+            name,
+            expr,
+            choices,
+            kwargs,
+            class_,
+            expr_filter,
+        )
+        if call:
+            return call
         return self.RADIO % {
             "id": html_id(name),
             "name": name,
@@ -248,6 +640,17 @@ class Preprocessor(object):
         args, kwargs = parse_params(params)
         class_ = kwargs.pop("class", None)
         choices = kwargs.pop("choices")
+        call = self.shared_call(
+            "widget_select",
+            name,
+            expr,
+            choices,
+            kwargs,
+            class_,
+            expr_filter,
+        )
+        if call:
+            return call
         return self.SELECT % {
             "id": html_id(name),
             "name": name,
@@ -264,6 +667,17 @@ class Preprocessor(object):
         args, kwargs = parse_params(params)
         class_ = kwargs.pop("class", None)
         choices = kwargs.pop("choices")
+        call = self.shared_call(
+            "widget_multiple_select",
+            name,
+            expr,
+            choices,
+            kwargs,
+            class_,
+            expr_filter,
+        )
+        if call:
+            return call
         return self.MULTIPLE_SELECT % {
             "id": html_id(name),
             "name": name,
@@ -319,64 +733,665 @@ class Preprocessor(object):
 class WhitespacePreprocessor(object):
     """Whitespace preprocessor."""
 
+    observer = None
+    stage = "whitespace"
+
     def __init__(self, rules, ignore_rules=None):
         self.rules = rules
         self.ignore_rules = ignore_rules
 
     def __call__(self, text, **kwargs):
+        if self.observer is not None:
+            return observe(self, text, kwargs)
+        return self.process(text)
+
+    @cython.locals(start=cython.Py_ssize_t, result=list)
+    def process(self, text, counts=None, name=None):
+        """Applies whitespace rules to ``text``. The number of
+        substitutions made is counted in ``counts`` if specified.
+        """
         if self.ignore_rules:
             for ignore_rule in self.ignore_rules:
                 start = 0
                 result = []
                 for m in ignore_rule.finditer(text):
-                    result.append(self.cleanup(text[start : m.start()]))
+                    result.append(
+                        self.cleanup(text[start : m.start()], counts)
+                    )
                     result.append(m.group())
                     start = m.end()
                 else:
-                    result.append(self.cleanup(text[start:]))
+                    result.append(self.cleanup(text[start:], counts))
                 text = "".join(result)
             return text
         else:
-            return self.cleanup(text)
+            return self.cleanup(text, counts)
 
-    def cleanup(self, text):
-        for r, s in self.rules:
-            text = r.sub(s, text)
+    @cython.locals(n=cython.Py_ssize_t, subs=cython.Py_ssize_t)
+    def cleanup(self, text, counts=None):
+        if counts is None:
+            for r, s in self.rules:
+                text = r.sub(s, text)
+        else:
+            n = 0
+            for r, s in self.rules:
+                text, subs = r.subn(s, text)
+                n += subs
+            counts["rules"] = counts.get("rules", 0) + n
         return text
 
 
+# content of these elements is copied as is by the minifier
+MINIFY_RAW_TAGS = ("code", "pre", "script", "style", "textarea")
+
+RE_MINIFY_TAG = re.compile(r"<(/?)([A-Za-z!?][\w:.-]*)")
+RE_MINIFY_ATTR = re.compile(r"\s+|=\s*|[^\s=>\"']+|[\"']")
+RE_MINIFY_LINES = re.compile(r"\s*\n\s*")
+RE_MINIFY_SPACES = re.compile(r"[ \t\r\f\v]{2,}|[\t\r\f\v]")
+RE_MINIFY_UNQUOTED = re.compile(r"[\w.:-]+$")
+RE_MINIFY_RAW_END = {
+    tag: re.compile(r"</" + tag + r"[\s>]", re.IGNORECASE)
+    for tag in MINIFY_RAW_TAGS
+}
+
+
+def minify_whitespace(text):
+    """Collapses whitespace in ``text``, a run with a line break
+    collapses to the line break.
+
+    >>> minify_whitespace(' a  \\t b \\n\\n   c ')
+    ' a b\\nc '
+    """
+    return RE_MINIFY_SPACES.sub(" ", RE_MINIFY_LINES.sub("\\n", text))
+
+
+class HtmlMinifyPreprocessor(object):
+    """HTML minifying preprocessor.
+
+    Scans static markup only, template engine directives matched by
+    ``directives`` pattern are copied as is. Removes comments,
+    collapses whitespace in text and tags and strips quotes around
+    static attribute values. A run of whitespace with a line break
+    collapses to the line break, so line oriented directives stay on
+    their lines. Content of ``code``, ``pre``, ``script``, ``style``
+    and ``textarea`` elements, conditional comments and comments that
+    span directives are preserved.
+
+    >>> p = HtmlMinifyPreprocessor(re.compile(r'{{.*?}}'))
+    >>> p('<p  class="x"  id="{{ id }}" >\\n  a  <!-- b -->  c\\n</p >')
+    '<p class=x id="{{ id }}">\\na c\\n</p>'
+    """
+
+    observer = None
+    stage = "minify"
+
+    def __init__(self, directives=None):
+        self.directives = directives
+        self.scanners = {
+            "comment": self.scan_comment,
+            "quote": self.scan_quote,
+            "raw": self.scan_raw,
+            "tag": self.scan_tag,
+            "text": self.scan_text,
+        }
+
+    def __call__(self, text, **kwargs):
+        if self.observer is not None:
+            return observe(self, text, kwargs)
+        return self.process(text)
+
+    @cython.locals(start=cython.Py_ssize_t, parts=list)
+    def process(self, text, counts=None, name=None):
+        """Minifies static markup in ``text``. Removed comments and
+        attribute quotes are counted in ``counts`` if specified.
+        """
+        parts = []
+        start = 0
+        if self.directives is not None:
+            for m in self.directives.finditer(text):
+                parts.append(text[start : m.start()])
+                parts.append(m.group())
+                start = m.end()
+        parts.append(text[start:])
+        return "".join(self.minify(parts, counts))
+
+    @cython.locals(i=cython.Py_ssize_t, result=list, out=list)
+    def minify(self, parts, counts=None):
+        """Returns a copy of ``parts`` list with static markup (items
+        at even indexes) minified, items at odd indexes are
+        directives. Markup state, e.g. an open tag, is carried over
+        directives.
+        """
+        result = []
+        state = ("text", None, None)
+        for i in range(len(parts)):
+            if i % 2:
+                result.append(parts[i])
+            else:
+                out = []
+                state = self.scan(parts[i], state, out, counts)
+                result.append("".join(out))
+        return result
+
+    @cython.locals(pos=cython.Py_ssize_t, end=cython.Py_ssize_t)
+    def scan(self, text, state, out, counts):
+        """Appends minified ``text`` to ``out`` starting in ``state``
+        (a tuple of mode, raw text tag and quote), returns the state
+        at the end of text.
+        """
+        scanners = self.scanners
+        pos = 0
+        end = len(text)
+        while pos < end:
+            pos, state = scanners[state[0]](text, pos, state, out, counts)
+        return state
+
+    # region: scanners
+
+    @cython.locals(pos=cython.Py_ssize_t, i=cython.Py_ssize_t)
+    def scan_text(self, text, pos, state, out, counts):
+        i = text.find("<", pos)
+        if i < 0:
+            out.append(minify_whitespace(text[pos:]))
+            return len(text), state
+        if i > pos:
+            out.append(minify_whitespace(text[pos:i]))
+        if text.startswith("<!--", i):
+            return self.skip_comment(text, i, out, counts)
+        m = RE_MINIFY_TAG.match(text, i)
+        if m is None:
+            out.append("<")
+            if i + 1 == len(text):
+                # a tag name is a directive
+                return i + 1, ("tag", None, None)
+            return i + 1, state
+        out.append(m.group())
+        tag = m.group(2).lower()
+        if m.group(1) or tag not in RE_MINIFY_RAW_END:
+            tag = None
+        return m.end(), ("tag", tag, None)
+
+    @cython.locals(pos=cython.Py_ssize_t, i=cython.Py_ssize_t)
+    def skip_comment(self, text, pos, out, counts):
+        """Removes a comment that starts at ``pos`` unless it is a
+        conditional comment or spans directives.
+        """
+        i = text.find("-->", pos + 4)
+        if i < 0 or text.startswith(("[if", "<![endif]"), pos + 4):
+            return pos, ("comment", None, None)
+        if counts is not None:
+            counts["comments"] = counts.get("comments", 0) + 1
+        i += 3
+        if out and out[-1].endswith(" ") and text[i : i + 1].isspace():
+            out[-1] = out[-1][:-1]
+        return i, ("text", None, None)
+
+    @cython.locals(pos=cython.Py_ssize_t, i=cython.Py_ssize_t)
+    def scan_comment(self, text, pos, state, out, counts):
+        i = text.find("-->", pos)
+        if i < 0:
+            out.append(text[pos:])
+            return len(text), state
+        out.append(text[pos : i + 3])
+        return i + 3, ("text", None, None)
+
+    @cython.locals(pos=cython.Py_ssize_t)
+    def scan_tag(self, text, pos, state, out, counts):
+        c = text[pos]
+        if c == ">":
+            out.append(">")
+            tag = state[1]
+            return pos + 1, (tag and "raw" or "text", tag, None)
+        if c == '"' or c == "'":
+            out.append(c)
+            return pos + 1, ("quote", state[1], c)
+        m = RE_MINIFY_ATTR.match(text, pos)
+        if c == "=":
+            return self.scan_value(text, m.end(), state, out, counts)
+        if not c.isspace():
+            out.append(m.group())
+        elif not text.startswith(">", m.end()):
+            out.append("\n" in m.group() and "\n" or " ")
+        return m.end(), state
+
+    @cython.locals(pos=cython.Py_ssize_t, i=cython.Py_ssize_t)
+    def scan_value(self, text, pos, state, out, counts):
+        """Strips quotes around static attribute value that starts
+        at ``pos``.
+        """
+        out.append("=")
+        q = text[pos : pos + 1]
+        if q != '"' and q != "'":
+            return pos, state
+        i = text.find(q, pos + 1)
+        if (
+            i >= 0
+            and RE_MINIFY_UNQUOTED.match(text, pos + 1, i)
+            and (text[i + 1 : i + 2] == ">" or text[i + 1 : i + 2].isspace())
+        ):
+            if counts is not None:
+                counts["quotes"] = counts.get("quotes", 0) + 1
+            out.append(text[pos + 1 : i])
+            return i + 1, state
+        out.append(q)
+        return pos + 1, ("quote", state[1], q)
+
+    @cython.locals(pos=cython.Py_ssize_t, i=cython.Py_ssize_t)
+    def scan_quote(self, text, pos, state, out, counts):
+        i = text.find(state[2], pos)
+        if i < 0:
+            out.append(text[pos:])
+            return len(text), state
+        out.append(text[pos : i + 1])
+        return i + 1, ("tag", state[1], None)
+
+    def scan_raw(self, text, pos, state, out, counts):
+        m = RE_MINIFY_RAW_END[state[1]].search(text, pos)
+        if m is None:
+            out.append(text[pos:])
+            return len(text), state
+        out.append(text[pos : m.start()])
+        return m.start(), ("text", None, None)
+
+
 class InlinePreprocessor(object):
-    """Inline preprocessor"""
+    """Inline preprocessor. ``strategy``, if specified, returns text
+    that replaces the inline tag of a path instead of file content.
+
+    If ``policy`` (:py:class:`InlinePolicy`) is specified it decides
+    per path whether file content is inlined or the tag is rewritten
+    by ``include`` to an engine include.
+
+    Literal parameters of an inline tag (the ``params`` group of
+    pattern) replace ``placeholder`` expressions in file content,
+    ``placeholder`` is a regular expression with ``%s`` for the
+    parameter name. Names in its optional ``filters`` group are looked
+    up in ``filters`` and applied to the literal, an unsupported filter
+    is a ``ValueError``. Parameterized inlines are always inlined,
+    results are cached per path and parameters.
+
+    Files are loaded by ``loader`` (see :py:mod:`wheezy.html.ext.loader`)
+    if specified, otherwise from ``directories``.
+
+    An asset inlined with ``as_="data-uri"`` parameter is replaced by
+    a data URI, or a URL if it is too large, by ``data_uri``
+    (:py:class:`DataURIEncoder`), results are cached per path.
+
+    Content inlined with ``as_="css"`` or ``as_="js"`` parameter, or
+    within ``<style>`` or ``<script>`` element if detection is enabled,
+    is minified by ``minifier``
+    (:py:class:`~wheezy.html.ext.minify.AssetMinifier`).
+    """
 
-    def __init__(self, pattern, directories, strategy=None):
+    observer = None
+    stage = "inline"
+
+    def __init__(
+        self,
+        pattern,
+        directories,
+        strategy=None,
+        policy=None,
+        include=None,
+        placeholder=None,
+        loader=None,
+        data_uri=None,
+        minifier=None,
+        filters=None,
+    ):
         self.pattern = pattern
         self.directories = directories
+        self.loader = loader or FileLoader(directories)
+        self.placeholder = placeholder
+        self.filters = filters or {}
+        self.substitutions = {}
+        self.data_uri = data_uri or DataURIEncoder()
+        self.assets = {}
+        self.minifier = minifier or AssetMinifier(detect=False)
         if strategy:
             self.strategy = strategy
+        if policy is not None:
+            assert include is not None
+            self.policy = policy
+            self.include = include
+            self.strategy = self.adaptive
 
     def __call__(self, text, **kwargs):
+        if self.observer is not None:
+            return observe(self, text, kwargs)
+        return self.process(text)
+
+    @cython.locals(start=cython.Py_ssize_t, result=list)
+    def process(self, text, counts=None, name=None):
+        """Rewrites inline tags in ``text``, recursively. The number
+        of inlined paths is counted in ``counts`` if specified.
+        """
         result = []
         start = 0
         for m in self.pattern.finditer(text):
             result.append(text[start : m.start()])
             start = m.end()
-            path = m.group("path")
-            result.append(self(self.strategy(path)))
+            if counts is not None:
+                counts["inline"] = counts.get("inline", 0) + 1
+            result.append(self.inline(text, m, counts))
         if start:
             result.append(text[start:])
             return "".join(result)
         else:
             return text
 
+    def inline(self, text, m, counts=None):
+        """Returns replacement of inline tag match ``m`` in ``text``."""
+        path = m.group("path")
+        params = m.groupdict().get("params")
+        params = params and inline_params(params) or ()
+        if DATA_URI in params:
+            return self.asset(path)
+        kind = dict(params).pop("as_", None)
+        # as_ parameter tags content kind, it is not a placeholder
+        params = tuple(p for p in params if p[0] != "as_")
+        if params:
+            inlined = self.substitute(path, params)
+        else:
+            inlined = self.strategy(path)
+        inlined = self.process(inlined, counts)
+        if kind is None and self.minifier.detect:
+            kind = asset_context(text, m.start())
+        if kind in MINIFIERS:
+            return self.minifier(kind, inlined)
+        return inlined
+
     def strategy(self, path):
+        return self.read(path)
+
+    def adaptive(self, path):
+        """Returns file content or an include of ``path`` as decided
+        by policy.
+        """
+        text = self.read(path)
+        if self.policy.decide(path, len(text)):
+            return self.include(path)
+        return text
+
+    def substitute(self, path, params):
+        """Returns content of file ``path`` with placeholders replaced
+        by literal ``params``.
+
+        >>> p = InlinePreprocessor(None, [], placeholder='#%s#')
+        >>> p.read = lambda path: '<h1>#title#</h1>#x#'
+        >>> p.substitute('a', (('title', 'Sign in'), ('x', '1')))
+        '<h1>Sign in</h1>1'
+        """
+        key = (path.lstrip("/"), params)
+        text = self.substitutions.get(key)
+        if text is None:
+            text = self.read(path)
+            if self.placeholder is None:
+                warn('InlinePreprocessor: "%s" parameters ignored.' % path)
+            else:
+                for name, value in params:
+                    text = re.sub(
+                        self.placeholder % name,
+                        lambda m: self.filter(path, m, value),
+                        text,
+                    )
+            self.substitutions[key] = text
+        return text
+
+    def filter(self, path, m, value):
+        """Returns literal ``value`` passed through filters of
+        placeholder match ``m``.
+
+        >>> p = InlinePreprocessor(None, [], filters={'h': html_escape})
+        >>> m = re.match('@x(?P<filters>!.)', '@x!h')
+        >>> p.filter('a', m, '<b>')
+        '&lt;b&gt;'
+        >>> m = re.match('@x(?P<filters>!.)', '@x!u')
+        >>> p.filter('a', m, '<b>')
+        Traceback (most recent call last):
+            ...
+        ValueError: "a": filter "u" of "@x!u" is not supported.
+        """
+        names = m.groupdict().get("filters")
+        if names:
+            for f in RE_INLINE_FILTER.findall(names):
+                if f not in self.filters:
+                    raise ValueError(
+                        '"%s": filter "%s" of "%s" is not supported.'
+                        % (path, f, m.group())
+                    )
+                value = self.filters[f](value)
+        return value
+
+    def asset(self, path):
+        """Returns data URI or URL of asset ``path``."""
+        path = path.lstrip("/")
+        uri = self.assets.get(path)
+        if uri is None:
+            data = self.loader.load_bytes(path)
+            if data is None:
+                warn('InlinePreprocessor: "%s" not found.' % path)
+                return ""
+            uri = self.assets[path] = self.data_uri(path, data)
+        return uri
+
+    def read(self, path):
+        """Returns content of file ``path`` found by loader."""
+        path = path.lstrip("/")
+        text = self.loader.load(path)
+        if text is None:
+            warn('InlinePreprocessor: "%s" not found.' % path)
+            return ""
+        return text
+
+
+def inline_params(params):
+    """Returns a tuple of ``(name, value)`` pairs of literal inline
+    parameters.
+
+    >>> inline_params(', title="Sign in", x="1"')
+    (('title', 'Sign in'), ('x', '1'))
+    """
+    return tuple(
+        (name, double or single)
+        for name, double, single in RE_INLINE_PARAM.findall(params)
+    )
+
+
+# media types of text assets, percent-encoded in data URIs
+TEXT_MEDIA_TYPES = (
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# media types that ``mimetypes`` may not know on all platforms
+MEDIA_TYPES = {
+    ".svg": "image/svg+xml",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+}
+
+
+class DataURIEncoder(object):
+    """Encodes an asset as data URI (:rfc:`2397`). Text assets (e.g.
+    SVG) are percent-encoded unless base64 is shorter, binary ones are
+    base64 encoded. An asset larger than ``max_size`` bytes is
+    referenced by URL instead, ``url`` is formatted with the path.
+
+    >>> e = DataURIEncoder(max_size=16)
+    >>> e('x.svg', b'<svg a="1"/>')
+    'data:image/svg+xml,%3Csvg%20a=%221%22/%3E'
+    >>> e('x.png', bytes(range(4)))
+    'data:image/png;base64,AAECAw=='
+    >>> e('icons/x.png', bytes(17))
+    '/icons/x.png'
+    """
+
+    def __init__(self, max_size=4096, url="/%s"):
+        self.max_size = max_size
+        self.url = url
+
+    def __call__(self, path, data):
+        if len(data) > self.max_size:
+            return self.url % path
+        media_type = (
+            mimetypes.guess_type(path)[0]
+            or MEDIA_TYPES.get(path[path.rfind(".") :])
+            or "application/octet-stream"
+        )
+        text = media_type.startswith("text/")
+        if text:
+            media_type += ";charset=utf-8"
+        encoded = "data:%s;base64,%s" % (
+            media_type,
+            b64encode(data).decode("ascii"),
+        )
+        if text or media_type in TEXT_MEDIA_TYPES:
+            percent = "data:%s,%s" % (media_type, quote(data, "/:=;,!*~"))
+            if len(percent) < len(encoded):
+                return percent
+        return encoded
+
+
+class InlinePolicy(object):
+    """Decides per path whether an inlined file is included by the
+    engine at runtime instead.
+
+    Inlined content is copied into each template that refers to it,
+    an include costs an engine call per render. A file is included
+    if it is larger than ``min_include_size`` and the total size of
+    its copies (size times references) exceeds ``max_inline_bytes``.
+    Paths in ``hot`` are always inlined.
+
+    References across a template set are counted by :py:meth:`scan`,
+    a path that is not scanned counts as referenced once.
+
+    >>> policy = InlinePolicy(min_include_size=10, max_inline_bytes=100)
+    >>> policy.references['footer.html'] = 10
+    >>> policy.decide('footer.html', 9), policy.decide('footer.html', 11)
+    (False, True)
+    >>> policy.decide('header.html', 50), policy.decide('header.html', 101)
+    (False, True)
+    >>> policy.report()
+    [('footer.html', 11, 10, 'include'), ('header.html', 101, 1, 'include')]
+    """
+
+    def __init__(self, min_include_size=2048, max_inline_bytes=65536, hot=()):
+        self.min_include_size = min_include_size
+        self.max_inline_bytes = max_inline_bytes
+        self.hot = frozenset(p.lstrip("/") for p in hot)
+        self.references = {}
+        self.decisions = {}
+
+    def scan(self, preprocessor, texts):
+        """Counts references to inlined paths in ``texts`` with the
+        pattern of ``preprocessor`` (:py:class:`InlinePreprocessor`).
+        Paths inlined by an inlined file are counted once per
+        reference to that file.
+        """
+        paths = {}
+
+        def visit(text, n):
+            for m in preprocessor.pattern.finditer(text):
+                path = m.group("path").lstrip("/")
+                params = m.groupdict().get("params")
+                params = params and inline_params(params) or ()
+                if DATA_URI in params:
+                    continue
+                if all(name == "as_" for name, value in params):
+                    self.references[path] = self.references.get(path, 0) + n
+                if path not in paths:
+                    paths[path] = preprocessor.read(path)
+                visit(paths[path], n)
+
+        for text in texts:
+            visit(text, 1)
+
+    def decide(self, path, size):
+        """Returns ``True`` if ``path`` of ``size`` is included."""
         path = path.lstrip("/")
-        for d in self.directories:
-            abspath = os.path.abspath(os.path.join(d, path))
-            if os.path.exists(abspath) and os.path.isfile(abspath):
-                f = open(abspath, "r")
-                try:
-                    return f.read()
-                finally:
-                    f.close()
-        warn('InlinePreprocessor: "%s" not found.' % path)
-        return ""
+        references = self.references.get(path, 1)
+        include = (
+            path not in self.hot
+            and size > self.min_include_size
+            and size * references > self.max_inline_bytes
+        )
+        self.decisions[path] = (size, references, include)
+        return include
+
+    def report(self):
+        """Returns a sorted list of ``(path, size, references,
+        decision)`` for paths decided so far.
+        """
+        return [
+            (path, size, references, include and "include" or "inline")
+            for path, (size, references, include) in sorted(
+                self.decisions.items()
+            )
+        ]
+
+
+class PreprocessorStats(object):
+    """An observer that aggregates preprocessing statistics, e.g.
+    to be exposed by a health endpoint.
+
+    >>> stats = PreprocessorStats()
+    >>> stats.on_stage('widgets', 'x.html', 0.5, 100, 300)
+    >>> stats.on_count('widgets', 'x.html', {'textbox': 2})
+    >>> stats.on_count('widgets', 'y.html', {'textbox': 1, 'label': 1})
+    >>> s = stats.snapshot()
+    >>> s['stages']['widgets']['calls'], s['stages']['widgets']['bytes_out']
+    (1, 300)
+    >>> sorted(s['counts']['widgets'].items())
+    [('label', 1), ('textbox', 3)]
+
+    Assign an instance to ``observer`` attribute of a preprocessor
+    (or the preprocessor class) to enable instrumentation.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.stages = {}
+        self.counts = {}
+
+    def on_stage(self, name, template, duration, bytes_in, bytes_out):
+        """Called once per preprocessor call. ``bytes_in`` and
+        ``bytes_out`` are lengths of input and output text.
+        """
+        with self.lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                self.stages[name] = stage = {
+                    "calls": 0,
+                    "duration": 0.0,
+                    "bytes_in": 0,
+                    "bytes_out": 0,
+                }
+            stage["calls"] += 1
+            stage["duration"] += duration
+            stage["bytes_in"] += bytes_in
+            stage["bytes_out"] += bytes_out
+
+    def on_count(self, name, template, counts):
+        """Called with counters collected by stage, e.g. number of
+        widgets per kind.
+        """
+        with self.lock:
+            c = self.counts.setdefault(name, {})
+            for key, value in counts.items():
+                c[key] = c.get(key, 0) + value
+
+    def snapshot(self):
+        """Returns a copy of aggregated statistics."""
+        with self.lock:
+            return {
+                "stages": {k: dict(v) for k, v in self.stages.items()},
+                "counts": {k: dict(v) for k, v in self.counts.items()},
+            }
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.counts = {}
@@ -0,0 +1,301 @@
+"""Loaders of files inlined by
+:py:class:`~wheezy.html.ext.lexer.InlinePreprocessor`.
+
+A loader maps a name, a relative path with ``/`` separator, to file
+text: ``load(name)`` returns the text or ``None`` if the file is not
+found, ``load_bytes(name)`` returns file content undecoded (used for
+assets inlined as data URI), ``list_names()`` returns names of all
+files available::
+
+    from wheezy.html.ext.loader import PackageLoader, preload
+    from wheezy.html.ext.template import InlineExtension
+
+    loader = preload(PackageLoader("myapp", "templates"))
+    inline = InlineExtension(loader=loader)
+
+Files in package data or a zip archive are read without extracting
+them to the filesystem; :py:func:`preload` reads a whole tree in one
+pass, e.g. at application startup.
+
+Loaders decode files with explicit ``encoding`` (utf-8 by default),
+translate ``\\r\\n`` and ``\\r`` line endings to ``\\n`` unless
+``newlines`` is ``False`` and strip a byte order mark if ``strip_bom``
+is ``True``, in a single incremental pass, see :py:func:`decode`.
+"""
+
+import codecs
+import io
+import mmap
+import os
+import zipfile
+from importlib.resources import files
+
+# files of this size or larger are memory mapped and decoded in chunks
+MMAP_SIZE = 1 << 20
+CHUNK_SIZE = 1 << 20
+
+
+def decode(chunks, encoding="utf-8", newlines=True, strip_bom=False):
+    r"""Decodes an iterable of bytes-like ``chunks`` with an incremental
+    decoder, so a multi-byte sequence or ``\r\n`` may span chunks.
+
+    >>> chunks = [b'\xef\xbb\xbfa\r', b'\n\xc3', b'\xa9\r']
+    >>> decode(chunks, strip_bom=True) == 'a\n\u00e9\n'
+    True
+    >>> decode([b'a\r\n'], newlines=False)
+    'a\r\n'
+    """
+    if strip_bom and codecs.lookup(encoding).name == "utf-8":
+        encoding = "utf-8-sig"
+    decoder = codecs.getincrementaldecoder(encoding)()
+    if newlines:
+        decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+    parts = [decoder.decode(chunk) for chunk in chunks]
+    parts.append(decoder.decode(b"", True))
+    text = "".join(parts)
+    if strip_bom and text[:1] == "\ufeff":
+        text = text[1:]
+    return text
+
+
+def read_file(path, encoding="utf-8", newlines=True, strip_bom=False):
+    """Reads and decodes file ``path``, see :py:func:`decode`. A file
+    of :py:data:`MMAP_SIZE` or larger is memory mapped and decoded in
+    chunks of :py:data:`CHUNK_SIZE`, without a copy of its bytes.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_SIZE or not size:
+            return decode([f.read()], encoding, newlines, strip_bom)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            with memoryview(m) as view:
+                return decode(
+                    (
+                        view[i : i + CHUNK_SIZE]
+                        for i in range(0, size, CHUNK_SIZE)
+                    ),
+                    encoding,
+                    newlines,
+                    strip_bom,
+                )
+
+
+class FileLoader(object):
+    """Loads files from a list of ``directories``, the first one a
+    file is found in wins.
+    """
+
+    def __init__(
+        self, directories, encoding="utf-8", newlines=True, strip_bom=False
+    ):
+        self.directories = directories
+        self.encoding = encoding
+        self.newlines = newlines
+        self.strip_bom = strip_bom
+
+    def list_names(self):
+        names = set()
+        for directory in self.directories:
+            for root, dirs, filenames in os.walk(directory):
+                for filename in filenames:
+                    path = os.path.relpath(
+                        os.path.join(root, filename), directory
+                    )
+                    names.add(path.replace(os.sep, "/"))
+        return sorted(names)
+
+    def find(self, name):
+        for d in self.directories:
+            abspath = os.path.abspath(os.path.join(d, name))
+            if os.path.exists(abspath) and os.path.isfile(abspath):
+                return abspath
+        return None
+
+    def load(self, name):
+        abspath = self.find(name)
+        if abspath is None:
+            return None
+        return read_file(abspath, self.encoding, self.newlines, self.strip_bom)
+
+    def load_bytes(self, name):
+        abspath = self.find(name)
+        if abspath is None:
+            return None
+        with open(abspath, "rb") as f:
+            return f.read()
+
+
+class PackageLoader(object):
+    """Loads files of ``package`` data, from ``path`` within the
+    package, with ``importlib.resources``; the package can be imported
+    from a wheel, a zipapp or a directory.
+    """
+
+    def __init__(
+        self,
+        package,
+        path="",
+        encoding="utf-8",
+        newlines=True,
+        strip_bom=False,
+    ):
+        self.encoding = encoding
+        self.newlines = newlines
+        self.strip_bom = strip_bom
+        root = files(package)
+        for part in path.split("/"):
+            if part:
+                root = root.joinpath(part)
+        self.root = root
+
+    def list_names(self):
+        names = []
+
+        def visit(resource, prefix):
+            for r in resource.iterdir():
+                if r.is_dir():
+                    visit(r, prefix + r.name + "/")
+                else:
+                    names.append(prefix + r.name)
+
+        if self.root.is_dir():
+            visit(self.root, "")
+        return sorted(names)
+
+    def load(self, name):
+        data = self.load_bytes(name)
+        if data is None:
+            return None
+        return decode([data], self.encoding, self.newlines, self.strip_bom)
+
+    def load_bytes(self, name):
+        resource = self.root
+        for part in name.split("/"):
+            resource = resource.joinpath(part)
+        if not resource.is_file():
+            return None
+        return resource.read_bytes()
+
+
+class ZipLoader(object):
+    """Loads files from zip ``archive`` (a path or a file
+    object), from ``path`` within the archive. The archive is opened
+    once, on first use.
+    """
+
+    def __init__(
+        self,
+        archive,
+        path="",
+        encoding="utf-8",
+        newlines=True,
+        strip_bom=False,
+    ):
+        self.archive = archive
+        self.encoding = encoding
+        self.newlines = newlines
+        self.strip_bom = strip_bom
+        self.prefix = path.strip("/") and path.strip("/") + "/"
+        self.zip = None
+        self.names = {}
+
+    def open(self):
+        if self.zip is None:
+            self.zip = zipfile.ZipFile(self.archive)
+            self.names = {
+                info.filename[len(self.prefix) :]: info
+                for info in self.zip.infolist()
+                if not info.is_dir() and info.filename.startswith(self.prefix)
+            }
+        return self.zip
+
+    def list_names(self):
+        self.open()
+        return sorted(self.names)
+
+    def load(self, name):
+        data = self.load_bytes(name)
+        if data is None:
+            return None
+        return decode([data], self.encoding, self.newlines, self.strip_bom)
+
+    def load_bytes(self, name):
+        z = self.open()
+        info = self.names.get(name)
+        if info is None:
+            return None
+        return z.read(info)
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+            self.zip = None
+
+
+class DictLoader(object):
+    r"""Loads files from ``templates``, a mapping of name to text or
+    bytes. Bytes are decoded on first ``load``, see :py:func:`decode`.
+
+    >>> loader = DictLoader({'a.html': b'a\r\n', 'b.html': 'b'})
+    >>> loader.load('a.html'), loader.load('b.html')
+    ('a\n', 'b')
+    >>> loader.load_bytes('a.html'), loader.load_bytes('b.html')
+    (b'a\r\n', b'b')
+    """
+
+    def __init__(
+        self, templates, encoding="utf-8", newlines=True, strip_bom=False
+    ):
+        self.templates = templates
+        self.encoding = encoding
+        self.newlines = newlines
+        self.strip_bom = strip_bom
+        self.texts = {}
+
+    def list_names(self):
+        return sorted(self.templates)
+
+    def load(self, name):
+        data = self.templates.get(name)
+        if data is None or isinstance(data, str):
+            return data
+        text = self.texts.get(name)
+        if text is None:
+            text = self.texts[name] = decode(
+                [data], self.encoding, self.newlines, self.strip_bom
+            )
+        return text
+
+    def load_bytes(self, name):
+        data = self.templates.get(name)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return data
+
+
+def preload(loader, extensions=None):
+    """Reads all files of ``loader`` in one pass and returns
+    :py:class:`DictLoader`. If ``extensions`` are specified, e.g.
+    ``(".html",)``, other files are skipped. Files are kept as bytes,
+    so assets are not decoded, text is decoded on first use with
+    options of ``loader``.
+
+    >>> loader = preload(DictLoader({'a.html': 'a', 'b.txt': 'b'}),
+    ...                  ['.html'])
+    >>> loader.list_names()
+    ['a.html']
+    >>> loader.load('a.html'), loader.load('b.txt')
+    ('a', None)
+    >>> loader.load_bytes('a.html')
+    b'a'
+    """
+    return DictLoader(
+        {
+            name: loader.load_bytes(name)
+            for name in loader.list_names()
+            if not extensions or name.endswith(tuple(extensions))
+        },
+        loader.encoding,
+        loader.newlines,
+        loader.strip_bom,
+    )
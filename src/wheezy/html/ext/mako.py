@@ -1,35 +1,72 @@
+import posixpath
 import re
 
 from wheezy.html.ext.lexer import (
+    INLINE_PARAMS,
+    HtmlMinifyPreprocessor,
     InlinePreprocessor,
     Preprocessor,
     WhitespacePreprocessor,
 )
+from wheezy.html.ext.minify import AssetMinifier
+from wheezy.html.utils import html_escape
 
 
 class MakoPreprocessor(Preprocessor):
-    def __init__(self, skip_imports=False):
+    def __init__(
+        self,
+        skip_imports=False,
+        shared=False,
+        html5=False,
+        fragments=False,
+        timing=False,
+    ):
         super(MakoPreprocessor, self).__init__(
             r"\$\{((?P<expr>.+?)\."
             r"(?P<widget>%(widgets)s){1}\((?P<params>.*?)\)\s*?"
-            r"(?P<expr_filter>(\|\s*[\w,\s]+?|)))\}"
+            r"(?P<expr_filter>(\|\s*[\w,\s]+?|)))\}",
+            shared,
+            html5,
+            fragments,
+            timing,
         )
+        if shared or fragments:
+            self.PREPEND = self.SHARED_PREPEND
 
     PREPEND = """\
 <%!
-from wheezy.html.utils import format_value
+from wheezy.html.utils import format_value, resolve_choices
+%>"""
+
+    SHARED_PREPEND = """\
+<%!
+from wheezy.html.utils import (
+    format_value, resolve_choices, widget_fragment,
+    widget_multiple_checkbox, widget_multiple_hidden,
+    widget_multiple_select, widget_radio, widget_select)
+%>"""
+
+    TIMING_PREPEND = """\
+<%!
+from wheezy.html.utils import widget_timer_start, widget_timer_stop
 %>"""
 
     EXPRESSION = "${%(expr)s%(expr_filter)s}"
 
+    SHARED = "${%(call)s|n}"
+
+    SHARED_FILTERS = ("", "|h")
+
+    LITERAL_UNSAFE = ("${", "\n", "\\")
+
     ERROR_CLASS0 = """\\
-%% if '%(name)s' in errors:
+%% if errors and '%(name)s' in errors:
  class="error"\\
 %% endif
 """
 
     ERROR_CLASS1 = """\\
-%% if '%(name)s' in errors:
+%% if errors and '%(name)s' in errors:
  class="error %(class)s"\\
 %% else:
  class="%(class)s"\\
@@ -60,7 +97,7 @@ value="1"%(attrs)s%(class)s\
  />"""
 
     MULTIPLE_CHECKBOX = """\\
-%% for key, text in %(choices)s:
+%% for key, text in resolve_choices(%(choices)s):
 <label%(attrs)s%(class)s><input id="%(id)s" name="%(name)s" type="checkbox" \
 value="1"%(attrs)s%(class)s\
 %% if key in %(value)s:
@@ -71,7 +108,7 @@ value="1"%(attrs)s%(class)s\
 """
 
     RADIO = """\\
-%% for key, text in %(choices)s:
+%% for key, text in resolve_choices(%(choices)s):
 <label%(attrs)s%(class)s>\
 <input type="radio" name="%(name)s"%(attrs)s \
 value="${key%(expr_filter)s}"%(class)s\
@@ -84,7 +121,7 @@ value="${key%(expr_filter)s}"%(class)s\
 
     SELECT = """\
 <select id="%(id)s" name="%(name)s"%(attrs)s%(class)s>\\
-%% for key, text in %(choices)s:
+%% for key, text in resolve_choices(%(choices)s):
 <option value="${key%(expr_filter)s}"\\
 %% if key == %(value)s:
  selected="selected"\\
@@ -95,7 +132,7 @@ value="${key%(expr_filter)s}"%(class)s\
 
     MULTIPLE_SELECT = """\
 <select id="%(id)s" name="%(name)s" multiple="multiple"%(attrs)s%(class)s>\\
-%% for key, text in %(choices)s:
+%% for key, text in resolve_choices(%(choices)s):
 <option value="${key%(expr_filter)s}"\\
 %% if key in %(value)s:
  selected="selected"\\
@@ -105,7 +142,7 @@ value="${key%(expr_filter)s}"%(class)s\
 </select>"""
 
     ERROR = """\\
-%% if '%(name)s' in errors:
+%% if errors and '%(name)s' in errors:
 <span%(attrs)s>${errors['%(name)s'][-1]%(expr_filter)s}</span>\\
 %% endif
 """
@@ -124,16 +161,48 @@ whitespace_preprocessor = WhitespacePreprocessor(
         (re.compile(r">\s+<"), r"><"),
     ]
 )
+minify_preprocessor = HtmlMinifyPreprocessor(
+    re.compile(
+        r"\$\{.*?\}|<%!?\s.*?%>|</?%.*?>|^[ \t]*(%|##).*?$|\\\n",
+        re.MULTILINE | re.DOTALL,
+    )
+)
 
 RE_INLINE = re.compile(
-    r'<%inline\s+file=("|\')(?P<path>.+?)\1\s*/>', re.MULTILINE
+    r'<%inline\s+file=("|\')(?P<path>.+?)\1' + INLINE_PARAMS + r"\s*/>",
+    re.MULTILINE,
 )
 
+# a variable of inlined file replaced by a literal inline parameter,
+# e.g. ${title} or ${title | h}
+INLINE_PLACEHOLDER = r"\$\{\s*%s\s*(?P<filters>\|[^}]*)?\}"
+# filters applied to a literal inline parameter
+INLINE_FILTERS = {"h": html_escape, "n": str, "str": str}
+
 
-def inline_preprocessor(directories, fallback=False):
+def inline_preprocessor(
+    directories=None,
+    fallback=False,
+    policy=None,
+    loader=None,
+    data_uri=None,
+    minify=False,
+):
     """Inline preprocessor. Rewrite <%inline file="..." /> tag with
     file content. If fallback is ``True`` rewrite to
-    <%include file="..." /> tag.
+    <%include file="..." /> tag. If policy
+    (:py:class:`~wheezy.html.ext.lexer.InlinePolicy`) is specified it
+    decides per path. Files are loaded by loader (see
+    :py:mod:`wheezy.html.ext.loader`) if specified, otherwise from
+    directories.
+
+    Literal parameters, e.g. <%inline file="..." title="..." />,
+    replace ${title} or escaped ${title|h} in file content. An asset
+    inlined with as_="data-uri" parameter is replaced by data URI, see
+    :py:class:`~wheezy.html.ext.lexer.DataURIEncoder`. Content inlined
+    with as_="css" or as_="js" parameter, or within <style> and <script>
+    elements if minify is ``True``, is minified, see
+    :py:class:`~wheezy.html.ext.minify.AssetMinifier`.
 
     >>> t = '1 <%inline file="master.html"/> 2'
     >>> m = RE_INLINE.search(t)
@@ -144,8 +213,69 @@ def inline_preprocessor(directories, fallback=False):
     >>> m = RE_INLINE.search(' <%inline file="shared/footer.html"/>')
     >>> m.group('path')
     'shared/footer.html'
+    >>> m = RE_INLINE.search('<%inline file="title.html" title="Sign in"/>')
+    >>> m.group('path'), m.group('params')
+    ('title.html', ' title="Sign in"')
     """
-    strategy = (
-        fallback and (lambda path: '<%include file="' + path + '"/>') or None
+
+    def include(path):
+        return '<%include file="' + path + '"/>'
+
+    return InlinePreprocessor(
+        RE_INLINE,
+        directories,
+        fallback and include or None,
+        policy,
+        include,
+        INLINE_PLACEHOLDER,
+        loader,
+        data_uri,
+        AssetMinifier(minify_preprocessor.directives, minify),
+        INLINE_FILTERS,
     )
-    return InlinePreprocessor(RE_INLINE, directories, strategy)
+
+
+class BundleLookup(object):
+    """Template lookup of preprocessed templates from
+    :py:class:`~wheezy.html.ext.bundle.Bundle`. Keyword arguments are
+    passed to ``mako.template.Template``; preprocessors are not needed
+    since the text is already preprocessed.
+    """
+
+    def __init__(self, bundle, **template_args):
+        self.bundle = bundle
+        self.template_args = template_args
+        self.templates = {}
+
+    def has_template(self, uri):
+        return uri.lstrip("/") in self.bundle
+
+    def adjust_uri(self, uri, relativeto):
+        if uri[0] == "/":
+            return uri
+        elif relativeto is not None:
+            return posixpath.join(posixpath.dirname(relativeto), uri)
+        else:
+            return "/" + uri
+
+    def filename_to_uri(self, filename):
+        return filename
+
+    def get_template(self, uri, relativeto=None):
+        uri = self.adjust_uri(uri, relativeto)
+        try:
+            return self.templates[uri]
+        except KeyError:
+            pass
+        # from mako import exceptions, template
+        m = __import__("mako", None, None, ["exceptions", "template"])
+        text = self.bundle.get(uri.lstrip("/"))
+        if text is None:
+            raise m.exceptions.TopLevelLookupException(
+                'Can\'t locate template for uri "%s"' % uri
+            )
+        t = m.template.Template(
+            text, lookup=self, uri=uri, **self.template_args
+        )
+        self.templates[uri] = t
+        return t
@@ -0,0 +1,268 @@
+"""Dependency free CSS and JavaScript minifiers for content inlined by
+:py:class:`~wheezy.html.ext.lexer.InlinePreprocessor`.
+
+Minification is token level and conservative: comments are removed
+(except ``/*! ... */`` license comments), a run of whitespace collapses
+to a single space, or is removed next to punctuation, and a run of
+whitespace with a line break collapses to the line break, so line
+oriented template directives stay on their lines and JavaScript
+automatic semicolon insertion is not affected. Strings, template
+literals and regular expression literals are copied as is.
+"""
+
+import re
+
+from wheezy.html.ext.bundle import content_hash
+
+RE_CSS_TOKEN = re.compile(
+    r"""(?P<comment>/\*.*?(?:\*/|$))
+    |(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    |(?P<space>\s+)
+    |(?P<other>[^\s"'/{};,>~:]+|.)""",
+    re.DOTALL | re.VERBOSE,
+)
+
+RE_JS_TOKEN = re.compile(
+    r"""(?P<comment>/\*.*?(?:\*/|$)|//[^\n]*)
+    |(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'
+        |`(?:\\.|[^`\\])*`)
+    |(?P<space>\s+)
+    |(?P<name>[\w$\\]+)
+    |(?P<other>.)""",
+    re.DOTALL | re.VERBOSE,
+)
+
+RE_JS_REGEXP = re.compile(
+    r"/(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/[A-Za-z]*"
+)
+
+# no space is needed next to these characters
+CSS_PUNCTUATION = frozenset("{};,>~")
+# spaces are kept after a colon in selectors, e.g. ``a :hover``
+CSS_PUNCTUATION_AFTER = frozenset("{};,>~:")
+JS_PUNCTUATION = frozenset("{}[]();,:?=<>!&|+-*/%^~.")
+
+# a slash after these tokens starts a regular expression literal
+JS_REGEXP_PREFIX = frozenset("(,=:[!&|?{};+-*%<>~^")
+JS_REGEXP_KEYWORDS = frozenset(
+    [
+        "case",
+        "delete",
+        "do",
+        "else",
+        "in",
+        "instanceof",
+        "new",
+        "of",
+        "return",
+        "throw",
+        "typeof",
+        "void",
+        "yield",
+    ]
+)
+
+
+def join(tokens, before, after, keep=None):
+    """Joins ``tokens``, whitespace tokens are ``None`` (a space) or
+    ``"\\n"``. A run of whitespace collapses to a line break if it has
+    one, otherwise to a space, which is dropped at the start and the end,
+    before a character in ``before`` or after a character in ``after``
+    unless ``keep(previous, next)``.
+    """
+    out = []
+    pending = False
+    for token in tokens:
+        if token == "\n":
+            if out[-1:] != ["\n"]:
+                out.append(token)
+            pending = False
+        elif token is None:
+            pending = bool(out) and out[-1] != "\n"
+        else:
+            if pending:
+                a, b = out[-1][-1], token[0]
+                if not (a in after or b in before) or (keep and keep(a, b)):
+                    out.append(" ")
+            pending = False
+            out.append(token)
+    return "".join(out)
+
+
+def space(value):
+    return "\n" if "\n" in value else None
+
+
+def minify_css(text):
+    """Minifies CSS ``text``.
+
+    >>> minify_css('a :hover , b > i {\\n  color : red ; /* x */\\n}')
+    'a :hover,b>i{\\ncolor:red;\\n}'
+    >>> minify_css('p { margin: 0 ; content: "a  b" ; }')
+    'p{margin:0;content:"a  b"}'
+    """
+    tokens = []
+    start = 0
+    for m in RE_CSS_TOKEN.finditer(text):
+        value = m.group()
+        if m.lastgroup in ("comment", "space") and value[:3] != "/*!":
+            tokens.append(space(value))
+        else:
+            start = css_token(tokens, value, start)
+    return join(tokens, CSS_PUNCTUATION, CSS_PUNCTUATION_AFTER)
+
+
+def css_token(tokens, value, start):
+    """Appends CSS token ``value`` to ``tokens``, returns the index of
+    the current statement start.
+
+    A statement ended by ``{`` is a selector, spaces before its colons
+    are kept, e.g. ``a :hover``; ended by ``;`` or ``}`` it is a
+    declaration and spaces before its colon are dropped.
+    """
+    if value == "}":
+        # the last semicolon of a block is optional
+        while tokens and tokens[-1] is None:
+            tokens.pop()
+        if tokens and tokens[-1] == ";":
+            tokens.pop()
+    if value in ";}":
+        tokens[start:] = css_declaration(tokens[start:])
+    tokens.append(value)
+    return len(tokens) if value in "{};" else start
+
+
+def css_declaration(tokens):
+    """Drops whitespace tokens before colons of declaration ``tokens``.
+
+    >>> css_declaration(['color', None, None, ':', None, 'red'])
+    ['color', ':', None, 'red']
+    """
+    result = []
+    for token in reversed(tokens):
+        if token is None and result and result[-1] == ":":
+            continue
+        result.append(token)
+    result.reverse()
+    return result
+
+
+def js_keep(a, b):
+    # ``a - -b``, ``a + +b`` and ``a / /re/`` need a space, so does
+    # ``1 .toString()``, ``1.toString()`` is a syntax error
+    return a == b and a in "+-/" or b == "." and a.isdigit()
+
+
+def minify_js(text):
+    """Minifies JavaScript ``text``.
+
+    >>> minify_js('var a = b / 2, re = /[/]+/g; // x\\nreturn a - -b')
+    'var a=b/2,re=/[/]+/g;\\nreturn a- -b'
+    >>> minify_js('if (x) {\\n  f( "a  b" ) /* y */ }')
+    'if(x){\\nf("a  b")}'
+    >>> minify_js('a = 1 .toString() + b . c')
+    'a=1 .toString()+b.c'
+    """
+    tokens = []
+    last = None
+    pos = 0
+    length = len(text)
+    while pos < length:
+        if text[pos] == "/" and (
+            last is None
+            or last in JS_REGEXP_PREFIX
+            or last in JS_REGEXP_KEYWORDS
+        ):
+            m = RE_JS_REGEXP.match(text, pos)
+            if m is not None and not text.startswith(("//", "/*"), pos):
+                tokens.append(m.group())
+                last = "/"
+                pos = m.end()
+                continue
+        m = RE_JS_TOKEN.match(text, pos)
+        pos = m.end()
+        value = m.group()
+        if m.lastgroup in ("comment", "space") and value[:3] != "/*!":
+            tokens.append(space(value))
+        else:
+            tokens.append(value)
+            last = value
+    return join(tokens, JS_PUNCTUATION, JS_PUNCTUATION, js_keep)
+
+
+MINIFIERS = {"css": minify_css, "js": minify_js}
+
+# script types minified as JavaScript
+JS_TYPES = ("javascript", "module", "json", "ecmascript")
+
+
+def asset_context(text, pos):
+    """Returns ``"css"`` or ``"js"`` if ``pos`` in markup ``text`` is
+    within a ``<style>`` or a JavaScript ``<script>`` element.
+
+    >>> asset_context('<style>a{}', 7), asset_context('<style></style>', 15)
+    ('css', None)
+    >>> t = '<script type="text/html">'
+    >>> asset_context('<script>', 8), asset_context(t, len(t))
+    ('js', None)
+    """
+    head = text[:pos].lower()
+    for tag, kind in (("<style", "css"), ("<script", "js")):
+        i = head.rfind(tag)
+        if i < 0 or head.find("</" + tag[1:], i) >= 0:
+            continue
+        start = head.find(">", i)
+        if start < 0:
+            return None
+        attrs = head[i + len(tag) : start]
+        if kind == "js" and "type=" in attrs:
+            if not any(t in attrs for t in JS_TYPES):
+                return None
+        return kind
+    return None
+
+
+class AssetMinifier(object):
+    """Minifies inlined CSS and JavaScript content. Template engine
+    directives matched by ``directives`` pattern are copied as is.
+    Results are cached by content hash, so each distinct content is
+    minified once.
+
+    If ``detect`` is ``True`` content inlined within ``<style>`` and
+    ``<script>`` elements is minified, otherwise only content tagged
+    with ``as_="css"`` or ``as_="js"`` inline parameter.
+
+    >>> m = AssetMinifier(re.compile(r'{{.*?}}'))
+    >>> m('css', 'a { color : {{ c }} ; }')
+    'a{color:{{ c }}}'
+    """
+
+    def __init__(self, directives=None, detect=True):
+        self.directives = directives
+        self.detect = detect
+        self.cache = {}
+
+    def __call__(self, kind, text):
+        key = content_hash((kind + "\n" + text).encode("utf-8"))
+        result = self.cache.get(key)
+        if result is None:
+            result = self.cache[key] = self.minify(kind, text)
+        return result
+
+    def minify(self, kind, text):
+        minify = MINIFIERS[kind]
+        if self.directives is None:
+            return minify(text)
+        # directives are replaced by placeholder names during
+        # minification, which are never split or joined with a
+        # neighbour token
+        directives = []
+
+        def placeholder(m):
+            directives.append(m.group())
+            return "\x00%d\x00" % (len(directives) - 1)
+
+        result = minify(self.directives.sub(placeholder, text))
+        return re.sub(
+            "\x00(\\d+)\x00", lambda m: directives[int(m.group(1))], result
+        )
@@ -1,5 +1,10 @@
 import re
 
+try:
+    import cython
+except ImportError:  # pragma: nocover
+    from wheezy.html import shadow as cython
+
 known_functions = ["format"]
 
 RE_ARGS = re.compile(r'\s*(?P<expr>(([\'"]).*?\3|.+?))\s*\,')
@@ -55,6 +60,7 @@ ignore: value.strftime('%m-%d-%y'))")
     return context, "%s_value(%s, %s)" % (name, context, args)
 
 
+@cython.locals(kwargs=dict)
 def parse_kwargs(text):
     """Parses key-value type of parameters.
 
@@ -70,6 +76,7 @@ def parse_kwargs(text):
     return kwargs
 
 
+@cython.locals(args=list)
 def parse_args(text):
     """Parses argument type of parameters.
 
@@ -83,6 +90,8 @@ def parse_args(text):
     ['"Account Type:"']
     """
     args = []
+    if not text:
+        return args
     for m in RE_ARGS.finditer(text + ","):
         args.append(m.group("expr"))
     return args
@@ -122,7 +131,13 @@ def parse_str_or_int(text):
     >>> parse_str_or_int('100')
     '100'
     >>> parse_str_or_int('model.username')
+    >>> parse_str_or_int('')
     """
+    if not text:
+        return None
+    c = text[0]
+    if c != '"' and c != "'" and not c.isdecimal():
+        return None
     m = RE_STR_VALUE.match(text)
     if m:
         return m.group("value")
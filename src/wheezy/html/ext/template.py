@@ -1,30 +1,59 @@
 import re
 
 from wheezy.html.ext.lexer import (
+    INLINE_PARAMS,
+    HtmlMinifyPreprocessor,
     InlinePreprocessor,
     Preprocessor,
     WhitespacePreprocessor,
 )
+from wheezy.html.ext.minify import AssetMinifier
+from wheezy.html.utils import html_escape
+
+# widgets that iterate choices
+CHOICES_TEMPLATES = ("MULTIPLE_CHECKBOX", "RADIO", "SELECT", "MULTIPLE_SELECT")
 
 
 class WheezyPreprocessor(Preprocessor):
-    def __init__(self):
+    def __init__(
+        self,
+        shared=False,
+        html5=False,
+        fragments=False,
+        timing=False,
+        lazy=False,
+    ):
+        if lazy:
+            for attr in CHOICES_TEMPLATES:
+                self.__dict__[attr] = getattr(self, attr).replace(
+                    "in %(choices)s:", "in resolve_choices(%(choices)s):"
+                )
         super(WheezyPreprocessor, self).__init__(
             r"@((?P<expr>.+?)\."
             r"(?P<widget>%(widgets)s){1}\((?P<params>.*?)\)\s*?"
-            r"(?P<expr_filter>((?<!!)!\w+(!\w+)*|)))(?=\s|$)"
+            r"(?P<expr_filter>((?<!!)!\w+(!\w+)*|)))(?=\s|$)",
+            shared,
+            html5,
+            fragments,
+            timing,
         )
 
     EXPRESSION = "@%(expr)s%(expr_filter)s"
 
+    SHARED = "@%(call)s"
+
+    SHARED_FILTERS = ("", "!h")
+
+    LITERAL_UNSAFE = ("@", "\n", "\\")
+
     ERROR_CLASS0 = """\\
-@if '%(name)s' in errors:
+@if errors and '%(name)s' in errors:
  class="error"\\
 @end
 """
 
     ERROR_CLASS1 = """\\
-@if '%(name)s' in errors:
+@if errors and '%(name)s' in errors:
  class="error %(class)s"\\
 @else:
  class="%(class)s"\\
@@ -100,7 +129,7 @@ value="@key%(expr_filter)s"%(class)s\\
 </select>"""
 
     ERROR = """\\
-@if '%(name)s' in errors:
+@if errors and '%(name)s' in errors:
 <span%(attrs)s>@errors['%(name)s'][-1]%(expr_filter)s</span>\\
 @end
 """
@@ -113,8 +142,55 @@ value="@key%(expr_filter)s"%(class)s\\
 
 
 class WidgetExtension(object):
+    """Translates widgets. If ``translations`` are specified,
+    ``_('...')`` string literals are resolved at preprocess time, so
+    use an engine per locale.
+
+    If ``lazy`` is ``True`` choice widgets accept choices given by a
+    callable (see ``wheezy.html.utils.LazyChoices``), resolved with
+    ``wheezy.html.utils.resolve_choices``, it must be added to engine
+    global variables. Shared helpers always accept them.
+
+    If ``shared`` is ``True`` choice widgets are rendered by shared
+    helpers, ``wheezy.html.utils.shared_widgets`` must be added to
+    engine global variables.
+
+    If ``html5`` is ``True`` widgets render HTML5 markup: minimized
+    boolean attributes and void elements.
+
+    If ``fragments`` is ``True`` output of choice widgets is cached
+    by ``wheezy.html.utils.fragment_cache``, shared widgets must be
+    added to engine global variables.
+
+    If ``timing`` is ``True`` widget render durations are reported to
+    ``wheezy.html.utils.widget_timing``, shared widgets must be added
+    to engine global variables.
+    """
+
     preprocessors = [WheezyPreprocessor()]
 
+    def __init__(
+        self,
+        translations=None,
+        shared=False,
+        html5=False,
+        fragments=False,
+        timing=False,
+        lazy=False,
+    ):
+        p = self.preprocessors[0]
+        if shared or html5 or fragments or timing or lazy:
+            p = WheezyPreprocessor(
+                shared=shared,
+                html5=html5,
+                fragments=fragments,
+                timing=timing,
+                lazy=lazy,
+            )
+        if translations is not None:
+            p = p.localize(translations)
+        self.preprocessors = [p]
+
 
 whitespace_preprocessor = WhitespacePreprocessor(
     rules=[
@@ -145,13 +221,67 @@ class WhitespaceExtension(object):
     postprocessors = [whitespace_postprocessor]
 
 
-RE_INLINE = re.compile(r'@inline\(("|\')(?P<path>.+?)\1\)', re.MULTILINE)
+minify_preprocessor = HtmlMinifyPreprocessor()
+
+
+def minify_postprocessor(tokens):
+    """Minifies markup tokens, markup state is carried over other
+    tokens.
+    """
+    parts = []
+    index = []
+    for i in range(len(tokens)):
+        lineno, token, value = tokens[i]
+        if token == "markup":
+            if len(parts) % 2:
+                parts.append("")
+            index.append((i, len(parts)))
+            parts.append(value)
+        else:
+            if len(parts) % 2 == 0:
+                parts.append("")
+            parts.append(token)
+    parts = minify_preprocessor.minify(parts)
+    for i, j in index:
+        lineno, token, value = tokens[i]
+        tokens[i] = (lineno, token, parts[j])
+
+
+class HtmlMinifyExtension(object):
+    """Minifies static HTML markup, see
+    :py:class:`~wheezy.html.ext.lexer.HtmlMinifyPreprocessor`.
+    """
+
+    postprocessors = [minify_postprocessor]
+
+
+RE_INLINE = re.compile(
+    r'@inline\(("|\')(?P<path>.+?)\1' + INLINE_PARAMS + r"\s*\)", re.MULTILINE
+)
+
+# a variable of inlined file replaced by a literal inline parameter,
+# e.g. @title or @title!h, but not @title.upper()
+INLINE_PLACEHOLDER = r"@%s(?P<filters>(?:!\w+)*)(?![\w(\[!]|\.\w)"
+# filters applied to a literal inline parameter
+INLINE_FILTERS = {"s": str, "h": html_escape}
 
 
 class InlineExtension(object):
     """Inline preprocessor. Rewrite @inline("...") tag with
     file content. If fallback is ``True`` rewrite to
-    @include("...") tag.
+    @include("...") tag. If policy
+    (:py:class:`~wheezy.html.ext.lexer.InlinePolicy`) is specified it
+    decides per path. Files are loaded by loader (see
+    :py:mod:`wheezy.html.ext.loader`) if specified, otherwise from
+    searchpath.
+
+    Literal parameters, e.g. @inline("...", title="..."), replace
+    @title or escaped @title!h in file content. An asset inlined with
+    as_="data-uri" parameter is replaced by data URI, see
+    :py:class:`~wheezy.html.ext.lexer.DataURIEncoder`. Content inlined
+    with as_="css" or as_="js" parameter, or within <style> and <script>
+    elements if minify is ``True``, is minified, see
+    :py:class:`~wheezy.html.ext.minify.AssetMinifier`.
 
     >>> t = '1 @inline("master.html") 2'
     >>> m = RE_INLINE.search(t)
@@ -162,12 +292,51 @@ class InlineExtension(object):
     >>> m = RE_INLINE.search(' @inline("shared/footer.html")')
     >>> m.group('path')
     'shared/footer.html'
+    >>> m = RE_INLINE.search('@inline("title.html", title="Sign in")')
+    >>> m.group('path'), m.group('params')
+    ('title.html', ', title="Sign in"')
     """
 
-    def __init__(self, searchpath, fallback=False):
-        strategy = (
-            fallback and (lambda path: '@include("' + path + '")') or None
-        )
+    def __init__(
+        self,
+        searchpath=None,
+        fallback=False,
+        policy=None,
+        loader=None,
+        data_uri=None,
+        minify=False,
+    ):
+        def include(path):
+            return '@include("' + path + '")'
+
         self.preprocessors = [
-            InlinePreprocessor(RE_INLINE, searchpath, strategy)
+            InlinePreprocessor(
+                RE_INLINE,
+                searchpath,
+                fallback and include or None,
+                policy,
+                include,
+                INLINE_PLACEHOLDER,
+                loader,
+                data_uri,
+                AssetMinifier(detect=minify),
+                INLINE_FILTERS,
+            )
         ]
+
+
+class BundleLoader(object):
+    """Loads preprocessed templates from
+    :py:class:`~wheezy.html.ext.bundle.Bundle`. Since the text is
+    already preprocessed, widget, whitespace and inline extensions
+    are not needed in the engine.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+
+    def list_names(self):
+        return self.bundle.names()
+
+    def load(self, name):
+        return self.bundle.get(name)
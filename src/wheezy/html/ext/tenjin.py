@@ -1,31 +1,57 @@
+import os.path
 import re
 
 from wheezy.html.ext.lexer import (
+    INLINE_PARAMS,
+    HtmlMinifyPreprocessor,
     InlinePreprocessor,
     Preprocessor,
     WhitespacePreprocessor,
 )
+from wheezy.html.ext.minify import AssetMinifier
+from wheezy.html.utils import html_escape
 
 
 class TenjinPreprocessor(Preprocessor):
-    def __init__(self):
+    def __init__(
+        self, shared=False, html5=False, fragments=False, timing=False
+    ):
         super(TenjinPreprocessor, self).__init__(
             r"(?P<expr_filter>[#\$])\{((?P<expr>.+?)\."
             r"(?P<widget>%(widgets)s){1}"
-            r"\((?P<params>.*?)\)\s*)\}"
+            r"\((?P<params>.*?)\)\s*)\}",
+            shared,
+            html5,
+            fragments,
+            timing,
         )
 
+    PREPEND = """\
+<?py from wheezy.html.utils import resolve_choices ?>
+"""
+
+    TIMING_PREPEND = """\
+<?py from wheezy.html.utils import widget_timer_start, widget_timer_stop ?>
+"""
+
     EXPRESSION = "%(expr_filter)s{%(expr)s}"
 
+    SHARED = "#{%(call)s}"
+
+    # expressions have no filters, values are escaped in ${...}
+    SHARED_FILTERS = ("#", "$")
+
+    LITERAL_UNSAFE = ("#{", "${", "\n", "\\")
+
     ERROR_CLASS0 = """\
 <?py #pass ?>
-<?py if '%(name)s' in errors: ?>
+<?py if errors and '%(name)s' in errors: ?>
  class="error"<?py #pass ?>
 <?py #endif ?>"""
 
     ERROR_CLASS1 = """\
 <?py #pass ?>
-<?py if '%(name)s' in errors: ?>
+<?py if errors and '%(name)s' in errors: ?>
  class="error %(class)s"<?py #pass ?>
 <?py else: ?>
  class="%(class)s"<?py #pass ?>
@@ -56,7 +82,7 @@ value="1"%(attrs)s%(class)s\
 
     MULTIPLE_CHECKBOX = """\
 <?py #pass ?>
-<?py for key, text in %(choices)s: ?>
+<?py for key, text in resolve_choices(%(choices)s): ?>
 <label%(attrs)s%(class)s><input id="%(id)s" name="%(name)s" type="checkbox" \
 value="1"%(attrs)s%(class)s<?py #pass ?>
 <?py if key in %(value)s: ?>
@@ -67,7 +93,7 @@ value="1"%(attrs)s%(class)s<?py #pass ?>
 
     RADIO = """\
 <?py #pass ?>
-<?py for key, text in %(choices)s: ?>
+<?py for key, text in resolve_choices(%(choices)s): ?>
 <label%(attrs)s%(class)s>\
 <input type="radio" name="%(name)s"%(attrs)s \
 value="%(expr_filter)s{key}"%(class)s
@@ -81,7 +107,7 @@ value="%(expr_filter)s{key}"%(class)s
 <?py #pass ?>
 <select id="%(id)s" name="%(name)s"%(attrs)s%(class)s>\
 <?py #pass ?>
-<?py for key, text in %(choices)s: ?>
+<?py for key, text in resolve_choices(%(choices)s): ?>
 <option value="%(expr_filter)s{key}"<?py #pass ?>
 <?py if key == %(value)s: ?>
  selected="selected"<?py #pass ?>
@@ -94,7 +120,7 @@ value="%(expr_filter)s{key}"%(class)s
 <?py #pass ?>
 <select id="%(id)s" name="%(name)s" multiple="multiple"%(attrs)s%(class)s>\
 <?py #pass ?>
-<?py for key, text in %(choices)s: ?>
+<?py for key, text in resolve_choices(%(choices)s): ?>
 <option value="%(expr_filter)s{key}"<?py #pass ?>
 <?py if key in %(value)s: ?>
  selected="selected"<?py #pass ?>
@@ -105,7 +131,7 @@ value="%(expr_filter)s{key}"%(class)s
 
     ERROR = """\
 <?py #pass ?>
-<?py if '%(name)s' in errors: ?>
+<?py if errors and '%(name)s' in errors: ?>
 <span%(attrs)s>%(expr_filter)s{errors['%(name)s'][-1]}</span>\
 <?py #pass ?>
 <?py #endif ?>"""
@@ -124,16 +150,45 @@ whitespace_preprocessor = WhitespacePreprocessor(
         (re.compile(r"(?<!\?)>\s+<(?!\?)"), r"><"),
     ]
 )
+minify_preprocessor = HtmlMinifyPreprocessor(
+    re.compile(r"<\?py\s.*?\?>|[#$]\{\{.*?\}\}|[#$]\{.*?\}", re.DOTALL)
+)
 
 RE_INLINE = re.compile(
-    r'<\?py\s+inline\(("|\')(?P<path>.+?)\1\)\s*\?>', re.MULTILINE
+    r'<\?py\s+inline\(("|\')(?P<path>.+?)\1' + INLINE_PARAMS + r"\s*\)\s*\?>",
+    re.MULTILINE,
 )
 
+# a variable of inlined file replaced by a literal inline parameter,
+# e.g. ${title} (escaped) or #{title}
+INLINE_PLACEHOLDER = r"(?:#|(?P<filters>\$))\{\s*%s\s*\}"
+# filters applied to a literal inline parameter
+INLINE_FILTERS = {"$": html_escape}
+
 
-def inline_preprocessor(directories, fallback=False):
+def inline_preprocessor(
+    directories=None,
+    fallback=False,
+    policy=None,
+    loader=None,
+    data_uri=None,
+    minify=False,
+):
     """Inline preprocessor. Rewrite <?py inline("...") ?> tag with
     file content. If fallback is ``True`` rewrite to
-    <?py include("...") ?> tag.
+    <?py include("...") ?> tag. If policy
+    (:py:class:`~wheezy.html.ext.lexer.InlinePolicy`) is specified it
+    decides per path. Files are loaded by loader (see
+    :py:mod:`wheezy.html.ext.loader`) if specified, otherwise from
+    directories.
+
+    Literal parameters, e.g. <?py inline("...", title="...") ?>,
+    replace escaped ${title} or #{title} in file content. An asset inlined
+    with as_="data-uri" parameter is replaced by data URI, see
+    :py:class:`~wheezy.html.ext.lexer.DataURIEncoder`. Content inlined
+    with as_="css" or as_="js" parameter, or within <style> and <script>
+    elements if minify is ``True``, is minified, see
+    :py:class:`~wheezy.html.ext.minify.AssetMinifier`.
 
     >>> t = '1 <?py inline("master.html") ?> 2'
     >>> m = RE_INLINE.search(t)
@@ -144,8 +199,59 @@ def inline_preprocessor(directories, fallback=False):
     >>> m = RE_INLINE.search(' <?py inline("shared/footer.html") ?>')
     >>> m.group('path')
     'shared/footer.html'
+    >>> m = RE_INLINE.search('<?py inline("title.html", title="Sign") ?>')
+    >>> m.group('path'), m.group('params')
+    ('title.html', ', title="Sign"')
     """
-    strategy = (
-        fallback and (lambda path: '<?py include("' + path + '") ?>') or None
+
+    def include(path):
+        return '<?py include("' + path + '") ?>'
+
+    return InlinePreprocessor(
+        RE_INLINE,
+        directories,
+        fallback and include or None,
+        policy,
+        include,
+        INLINE_PLACEHOLDER,
+        loader,
+        data_uri,
+        AssetMinifier(minify_preprocessor.directives, minify),
+        INLINE_FILTERS,
     )
-    return InlinePreprocessor(RE_INLINE, directories, strategy)
+
+
+class BundleLoader(object):
+    """Tenjin loader of preprocessed templates from
+    :py:class:`~wheezy.html.ext.bundle.Bundle`. Use it with a memory
+    cache storage, e.g. ``tenjin.Engine(loader=BundleLoader(bundle),
+    cache=tenjin.MemoryCacheStorage())``.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+
+    def exists(self, filepath):
+        return filepath in self.bundle
+
+    def find(self, filename, dirs=None):
+        if dirs:
+            for dirname in dirs:
+                filepath = os.path.join(dirname, filename)
+                if filepath in self.bundle:
+                    return filepath
+        if filename in self.bundle:
+            return filename
+        return None
+
+    def abspath(self, filepath):
+        return filepath
+
+    def timestamp(self, filepath):
+        return self.bundle.mtime
+
+    def load(self, filepath):
+        text = self.bundle.get(filepath)
+        if text is None:
+            return None
+        return text, self.bundle.mtime
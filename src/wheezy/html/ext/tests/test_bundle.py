@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class BundleTestCase(unittest.TestCase):
+    """Test the ``Bundle``."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "templates.bundle")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def open(self, templates, **kwargs):
+        from wheezy.html.ext.bundle import Bundle, write_bundle
+
+        write_bundle(self.path, templates, **kwargs)
+        b = Bundle(self.path, verify=True)
+        self.addCleanup(b.close)
+        return b
+
+    def test_get(self):
+        b = self.open({"a.html": "A", "b/c.html": "ж C"})
+        assert 2 == len(b)
+        assert ("a.html", "b/c.html") == b.names()
+        assert "a.html" in b
+        assert "A" == b.get("a.html")
+        assert "ж C" == b.get("b/c.html")
+        assert b.get("x.html") is None
+
+    def test_texts(self):
+        b = self.open({"a.html": "ж A"})
+        text = b.get("a.html")
+        assert {"a.html": text} == b.texts
+        assert text is b.get("a.html")
+
+    def test_empty(self):
+        b = self.open({})
+        assert 0 == len(b)
+        assert () == b.names()
+
+    def test_preprocessors(self):
+        b = self.open(
+            {"a.html": " a "},
+            preprocessors=[str.strip, lambda s: s.upper()],
+        )
+        assert "A" == b.get("a.html")
+
+    def test_not_a_bundle(self):
+        from wheezy.html.ext.bundle import Bundle
+
+        with open(self.path, "wb") as f:
+            f.write(b"XXXX\0\0\0\0")
+        self.assertRaises(ValueError, lambda: Bundle(self.path))
+
+    def test_corrupted(self):
+        from wheezy.html.ext.bundle import Bundle
+
+        self.open({"a.html": "abc"}).close()
+        with open(self.path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"x")
+        b = Bundle(self.path, verify=True)
+        self.addCleanup(b.close)
+        self.assertRaises(ValueError, lambda: b.get("a.html"))
+        b = Bundle(self.path)
+        self.addCleanup(b.close)
+        assert "abx" == b.get("a.html")
+
+
+class BundleLoaderMixin(object):
+    """Renders a preprocessed template from bundle."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "templates.bundle")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def bundle(self, templates, preprocessors):
+        from wheezy.html.ext.bundle import Bundle, write_bundle
+
+        write_bundle(self.path, templates, preprocessors)
+        b = Bundle(self.path)
+        self.addCleanup(b.close)
+        return b
+
+    def test_render(self):
+        class Model(object):
+            remember_me = True
+
+        self.assert_render_equal(
+            '<input id="remember-me" name="remember_me" type="checkbox" '
+            'value="1" checked="checked" />',
+            model=Model(),
+            errors={},
+        )
@@ -1,6 +1,11 @@
 import unittest
 
-from wheezy.html.ext.tests.test_lexer import PreprocessorMixin
+from wheezy.html.ext.tests.test_bundle import BundleLoaderMixin
+from wheezy.html.ext.tests.test_lexer import (
+    PreprocessorMixin,
+    Translations,
+    html_events,
+)
 
 
 class Jinja2PreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
@@ -69,6 +74,198 @@ class Jinja2PreprocessorTestCase2(PreprocessorMixin, unittest.TestCase):
     GENERAL_WARNING = "${message.warning()|e}"
 
 
+class Jinja2SharedPreprocessorTestCase(Jinja2PreprocessorTestCase2):
+    """Test the ``Jinja2Preprocessor`` in shared mode."""
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        assert_jinja2_equal(
+            {"variable_start_string": "${", "variable_end_string": "}"},
+            template,
+            expected,
+            shared=True,
+            **kwargs,
+        )
+
+    def test_filter(self):
+        """Widgets with a filter other than escape are not shared."""
+        self.m.scm = "hg"
+        self.render(
+            self.DROPDOWN.replace(")}", ")|upper}"),
+            '<select id="scm" name="scm">'
+            '<option value="GIT">GIT</option>'
+            '<option value="HG" selected="selected">MERCURIAL</option>'
+            '<option value="SVN">SVN</option>'
+            "</select>",
+        )
+
+
+class Jinja2FragmentsPreprocessorTestCase(Jinja2PreprocessorTestCase2):
+    """Test the ``Jinja2Preprocessor`` in fragments mode."""
+
+    scm = tuple(PreprocessorMixin.scm)
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        assert_jinja2_equal(
+            {"variable_start_string": "${", "variable_end_string": "}"},
+            template,
+            expected,
+            fragments=True,
+            **kwargs,
+        )
+
+
+class Jinja2TimingPreprocessorTestCase(Jinja2PreprocessorTestCase2):
+    """Test the ``Jinja2Preprocessor`` in timing mode."""
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.utils import widget_timing
+
+        with widget_timing() as timings:
+            assert_jinja2_equal(
+                {"variable_start_string": "${", "variable_end_string": "}"},
+                template,
+                expected,
+                timing=True,
+                **kwargs,
+            )
+        assert 1 == len(timings.durations)
+
+
+class Jinja2HTML5PreprocessorTestCase(Jinja2PreprocessorTestCase2):
+    """Test the ``Jinja2Preprocessor`` in HTML5 mode, markup is
+    parsed the same as XHTML.
+    """
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        assert_jinja2_equal(
+            {"variable_start_string": "${", "variable_end_string": "}"},
+            template,
+            expected,
+            html5=True,
+            parse=html_events,
+            **kwargs,
+        )
+
+
+class Jinja2AsyncPreprocessorTestCase(Jinja2PreprocessorTestCase2):
+    """Test the ``Jinja2Preprocessor`` in ``enable_async`` environment,
+    choices are given by an async function.
+    """
+
+    shared = False
+
+    def setUp(self):
+        super(Jinja2AsyncPreprocessorTestCase, self).setUp()
+
+        async def scm():
+            return PreprocessorMixin.scm
+
+        self.scm = scm
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        assert_jinja2_equal(
+            {
+                "variable_start_string": "${",
+                "variable_end_string": "}",
+                "enable_async": True,
+            },
+            template,
+            expected,
+            shared=self.shared,
+            **kwargs,
+        )
+
+
+class Jinja2AsyncSharedPreprocessorTestCase(Jinja2AsyncPreprocessorTestCase):
+    """Test the ``Jinja2Preprocessor`` in ``enable_async`` environment
+    and shared mode.
+    """
+
+    shared = True
+
+
+class Jinja2WidgetTimingTestCase(unittest.TestCase):
+    """Test the ``WidgetExtension`` with ``widget_timing``."""
+
+    def test_durations(self):
+        from jinja2 import DictLoader, Environment
+
+        from wheezy.html.ext.jinja2 import WidgetExtension
+        from wheezy.html.utils import widget_timing
+
+        env = Environment(
+            loader=DictLoader(
+                {
+                    "x.html": "<p>\n{{ model.scm.dropdown(choices=scm) }}\n"
+                    "{{ model.pwd.password() }}{{ model.pwd.error() }}</p>"
+                }
+            ),
+            extensions=[WidgetExtension],
+        )
+        env.widget_timing = True
+        t = env.get_template("x.html")
+        ctx = {"model": {"scm": "a"}, "errors": {}, "scm": [("a", "A")]}
+        with widget_timing() as timings:
+            t.render(ctx)
+            t.render(ctx)
+        assert [
+            (("x.html", 2, "scm"), 2),
+            (("x.html", 3, "pwd"), 4),
+        ] == [(k, v[0]) for k, v in sorted(timings.durations.items())]
+        assert "x.html:2 scm" in timings.summary()
+        env.widget_timing = False
+        assert "widget_timer" not in env.compile(
+            env.loader.get_source(env, "x.html")[0], raw=True
+        )
+
+
+class Jinja2PreprocessorBindingsTestCase(unittest.TestCase):
+    """Test the ``Jinja2Preprocessor.bindings``."""
+
+    def test_context_names(self):
+        from wheezy.html.ext.jinja2 import Jinja2Preprocessor
+
+        p = Jinja2Preprocessor("{{", "}}")
+        text = (
+            "{{ model.scm.dropdown(choices=scm) }}"
+            "<p>{{ user.name.textbox()|e }}</p>\n"
+            "{{ model.gender.radio(choices=lists.genders[:2]) }}"
+        )
+        assert [
+            ("dropdown", "model.scm", "scm"),
+            ("textbox", "user.name", None),
+            ("radio", "model.gender", "lists.genders[:2]"),
+        ] == p.bindings(text)
+        assert ["lists", "model", "scm", "user"] == p.context_names(text)
+
+
+class Jinja2PreprocessorFindIterTestCase(unittest.TestCase):
+    """Test the ``Jinja2Preprocessor.finditer``."""
+
+    def test_finditer(self):
+        from wheezy.html.ext.jinja2 import Jinja2Preprocessor
+        from wheezy.html.ext.tests.test_lexer import (
+            PreprocessorFindIterTestCase,
+        )
+
+        t = PreprocessorFindIterTestCase()
+        for start, end in [("{{", "}}"), ("${", "}")]:
+            p = Jinja2Preprocessor(
+                variable_start_string=start, variable_end_string=end
+            )
+            assert p.RE_CANDIDATES
+            for text in t.samples(start, end):
+                t.assert_same(p, text)
+
+    def test_multiline(self):
+        """A widget may end on a line after its call."""
+        from wheezy.html.ext.jinja2 import Jinja2Preprocessor
+
+        p = Jinja2Preprocessor("{{", "}}")
+        text = "{{ x.textbox()\n}} {{ y.textbox()|e\n }}"
+        assert [(0, 17), (18, 38)] == [m.span() for m in p.finditer(text)]
+
+
 class Jinja2WhitespaceExtensionTestCase(unittest.TestCase):
     """Test the ``WhitespaceExtension``."""
 
@@ -103,13 +300,68 @@ class Jinja2WhitespaceExtensionTestCase2(Jinja2WhitespaceExtensionTestCase):
     block_end_string = "%>"
 
 
+class Jinja2HtmlMinifyExtensionTestCase(unittest.TestCase):
+    """Test the ``HtmlMinifyExtension``."""
+
+    block_start_string = "{%"
+    block_end_string = "%}"
+    variable_start_string = "{{"
+    variable_end_string = "}}"
+    comment_start_string = "{#"
+    comment_end_string = "#}"
+    line_statement_prefix = "#"
+    line_comment_prefix = "##"
+
+    def setUp(self):
+        from wheezy.html.ext.jinja2 import HtmlMinifyExtension
+
+        extension = HtmlMinifyExtension(self)
+        self.preprocess = lambda s: extension.preprocess(s, None)
+
+    def test_minify(self):
+        """Directives are copied as is."""
+        t = (
+            '<p  class="x" {{ a }}>  {{ "a  b" }}  </p>\n'
+            '  {%  if x  %}<i id="a">{#  x  #}</i>{% endif %}\n'
+            "  # for x in y:  ## x  y\n"
+            "  <b>  </b>\n"
+            "  # endfor\n"
+        )
+        assert (
+            '<p class=x {{ a }}> {{ "a  b" }} </p>\n'
+            "{%  if x  %}<i id=a>{#  x  #}</i>{% endif %}\n"
+            "  # for x in y:  ## x  y\n"
+            "<b> </b>\n"
+            "  # endfor\n" == self.preprocess(t)
+        )
+
+
+class Jinja2HtmlMinifyExtensionTestCase2(Jinja2HtmlMinifyExtensionTestCase):
+    """Test the ``HtmlMinifyExtension``."""
+
+    block_start_string = "<%"
+    block_end_string = "%>"
+    variable_start_string = "${"
+    variable_end_string = "}"
+    comment_start_string = "<%#"
+    comment_end_string = "%>"
+    line_statement_prefix = None
+    line_comment_prefix = None
+
+    def test_minify(self):
+        """Directives are copied as is."""
+        assert '<p id=x>${ "a  b" }<%# <a  b> %> <% x %>' == (
+            self.preprocess('<p  id="x"  >${ "a  b" }<%# <a  b> %>  <% x %>')
+        )
+
+
 class InlineExtensionTestCase(unittest.TestCase):
     """Test the ``InlineExtension``."""
 
-    def p(self, text, fallback=False):
+    def p(self, text, fallback=False, policy=None):
         from wheezy.html.ext.jinja2 import InlineExtension
 
-        p = InlineExtension(searchpath=["."], fallback=fallback)
+        p = InlineExtension(searchpath=["."], fallback=fallback, policy=policy)
         return p.preprocess(text, None)
 
     def test_inline(self):
@@ -120,6 +372,41 @@ class InlineExtensionTestCase(unittest.TestCase):
             '{% inline "LICENSE" %}', fallback=True
         )
 
+    def test_inline_policy(self):
+        from wheezy.html.ext.lexer import InlinePolicy
+
+        policy = InlinePolicy(min_include_size=0, max_inline_bytes=0)
+        assert '{% include "LICENSE" %}' == self.p(
+            '{% inline "LICENSE" %}', policy=policy
+        )
+        assert "include" == policy.report()[0][3]
+        policy = InlinePolicy(
+            min_include_size=0, max_inline_bytes=0, hot=["/LICENSE"]
+        )
+        assert "Copyright" in self.p('{% inline "LICENSE" %}', policy=policy)
+
+    def test_inline_params(self):
+        """Parameters are substituted even if fallback is set."""
+        from wheezy.html.ext.jinja2 import InlineExtension
+
+        p = InlineExtension(searchpath=[], fallback=True).preprocessor
+        p.read = lambda path: "<h1>{{ title }}</h1>{{title}}{{ title|e }}"
+        assert "<h1>Sign in</h1>Sign inSign in" == p(
+            "{% inline 'h.html' title='Sign in' %}"
+        )
+
+    def test_inline_params_filters(self):
+        """Filters of placeholders are applied to parameters."""
+        from wheezy.html.ext.jinja2 import InlineExtension
+
+        p = InlineExtension(searchpath=[]).preprocessor
+        p.read = lambda path: "{{ x|e }}{{ x | escape|safe }}{{ x.y|e }}"
+        assert "&lt;b&gt;&lt;b&gt;{{ x.y|e }}" == p(
+            "{% inline 'a.html' x='<b>' %}"
+        )
+        p.read = lambda path: "{{ x|upper }}"
+        self.assertRaises(ValueError, p, "{% inline 'b.html' x='b' %}")
+
     def test_inline_not_found(self):
         import warnings
 
@@ -128,19 +415,80 @@ class InlineExtensionTestCase(unittest.TestCase):
         warnings.simplefilter("default")
 
 
+class WidgetExtensionLocalizeTestCase(unittest.TestCase):
+    """Test the ``WidgetExtension`` with ``widget_translations``."""
+
+    def test_overlay(self):
+        t = Translations({"Username:": "Nom d'utilisateur :"})
+        text = "{{ model.username.label(_('Username:')) }}"
+        ctx = {"model": None, "errors": {}, "_": lambda s: s}
+        assert_jinja2_equal(
+            {}, text, '<label for="username">Username:</label>', **ctx
+        )
+        assert_jinja2_equal(
+            {},
+            text,
+            '<label for="username">Nom d\'utilisateur :</label>',
+            translations=t,
+            **ctx,
+        )
+
+
+class BundleLoaderTestCase(BundleLoaderMixin, unittest.TestCase):
+    """Test the ``BundleLoader``."""
+
+    def assert_render_equal(self, expected, **kwargs):
+        from wheezy.html.ext.jinja2 import (
+            BundleLoader,
+            Jinja2Preprocessor,
+            TemplateNotFound,
+        )
+
+        p = Jinja2Preprocessor("{{", "}}")
+        b = self.bundle({"x.html": "{{ model.remember_me.checkbox() }}"}, [p])
+        loader = BundleLoader(b)
+        assert ["x.html"] == loader.list_templates()
+        self.assertRaises(
+            TemplateNotFound, lambda: loader.get_source(None, "y.html")
+        )
+        assert_bundle_equal(loader, "x.html", expected, **kwargs)
+
+
 try:
     # from jinja2 import Environment
     Environment = __import__("jinja2", None, None, ["Environment"]).Environment
     from wheezy.html.ext.jinja2 import WidgetExtension
 
-    def assert_jinja2_equal(options, text, expected, **kwargs):
-        template = Environment(
-            extensions=[WidgetExtension], **options
-        ).from_string(text)
+    def assert_jinja2_equal(
+        options,
+        text,
+        expected,
+        translations=None,
+        shared=False,
+        html5=False,
+        fragments=False,
+        timing=False,
+        parse=str,
+        **kwargs,
+    ):
+        env = Environment(extensions=[WidgetExtension], **options).overlay()
+        env.widget_translations = translations
+        env.widget_shared = shared
+        env.widget_html5 = html5
+        env.widget_fragments = fragments
+        env.widget_timing = timing
+        template = env.from_string(text)
         value = template.render(kwargs)
-        assert expected == value
+        assert parse(expected) == parse(value)
+
+    def assert_bundle_equal(loader, name, expected, **kwargs):
+        env = Environment(loader=loader)
+        assert expected == env.get_template(name).render(kwargs)
 
 except ImportError:  # pragma: nocover
 
     def assert_jinja2_equal(text, expected, **kwargs):  # noqa
         pass
+
+    def assert_bundle_equal(loader, name, expected, **kwargs):  # noqa
+        pass
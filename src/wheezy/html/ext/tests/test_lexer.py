@@ -1,4 +1,5 @@
 import unittest
+from html.parser import HTMLParser
 
 
 def generate_white_space_patterns():  # pragma: nocover
@@ -425,6 +426,571 @@ class PreprocessorWidgetsTestCase(unittest.TestCase):
         """ == self.p.warning("model", 'class="x", cursor="auto"', "|f")
 
 
+class PreprocessorFindIterTestCase(unittest.TestCase):
+    """Test the ``Preprocessor.finditer``."""
+
+    def assert_same(self, p, text):
+        expected = [m.span() for m in p.RE_WIDGETS.finditer(text)]
+        assert expected == [m.span() for m in p.finditer(text)]
+
+    def samples(self, start, end):
+        import random
+
+        w = start + "%s" + end
+        yield "x" * 100
+        yield w % "a" * 50
+        yield w % "m.x.textbox()" + " " + w % "m.y.label('Y:')"
+        yield start + "a " + w % "b.textbox()"
+        yield w % "x.textbox(a)b " + w % "y.textbox()"
+        yield w % "a" + "\n" + w % "b.hidden()" + "\n" + w % "c.hidden()"
+        yield "m.x.textbox()\n" + w % "m.x.textbox(class_='c')"
+        yield start + "x.textbox()\n" + end + " " + w % "y.textbox()"
+        yield start + "@.textbox() a.textbox()" + end
+        rnd = random.Random(0)
+        tokens = [
+            start,
+            end,
+            "m.x",
+            ".textbox(",
+            ".hidden()",
+            ")",
+            " ",
+            "\n",
+            "a",
+        ]
+        for _ in range(200):
+            yield "".join(rnd.choice(tokens) for _ in range(20))
+
+    def test_template(self):
+        from wheezy.html.ext.template import WheezyPreprocessor
+
+        p = WheezyPreprocessor()
+        assert p.RE_CANDIDATES
+        for text in self.samples("@", ""):
+            self.assert_same(p, text)
+
+    def test_mako(self):
+        from wheezy.html.ext.mako import widget_preprocessor as p
+
+        assert p.RE_CANDIDATES
+        for text in self.samples("${", "}"):
+            self.assert_same(p, text)
+
+    def test_tenjin(self):
+        from wheezy.html.ext.tenjin import widget_preprocessor as p
+
+        assert p.RE_CANDIDATES
+        for text in self.samples("#{", "}"):
+            self.assert_same(p, text)
+
+    def test_linear(self):
+        """A candidate that is not a widget does not cause the rest of
+        text to be scanned again.
+        """
+        import time
+
+        from wheezy.html.ext.template import WheezyPreprocessor
+
+        p = WheezyPreprocessor()
+        for text in [
+            "@obj.label(\n" + "<p>@user.name @user.email</p>\n" * 20000,
+            "@x " * 20000 + ".textbox(\n",
+            "@x" + " .textbox(" * 20000,
+            "@x" + " .textbox()x" * 20000,
+        ]:
+            start = time.perf_counter()
+            assert [] == list(p.finditer(text))
+            assert time.perf_counter() - start < 0.5
+        self.assert_same(p, "@obj.label(\n@a @b.textbox() @c.label('C')")
+        self.assert_same(p, "@x " * 100 + ".textbox(\n@x.textbox()")
+
+    def test_no_candidates(self):
+        from wheezy.html.ext.lexer import Preprocessor
+
+        p = Preprocessor(r"\.(?P<widget>%(widgets)s)")
+        assert p.RE_CANDIDATES is None
+        self.assert_same(p, "a.textbox b.label")
+
+
+class Translations(object):
+    def __init__(self, messages):
+        self.messages = messages
+
+    def gettext(self, message):
+        return self.messages.get(message, message)
+
+
+class PreprocessorLocalizeTestCase(unittest.TestCase):
+    """Test the ``Preprocessor.localize``."""
+
+    def setUp(self):
+        from wheezy.html.ext.lexer import Preprocessor
+
+        self.p = Preprocessor("%(widgets)s")
+        self.p.EXPRESSION = "%(expr)s%(expr_filter)s"
+        self.t = Translations(
+            {"User:": "Utilisateur <b>:", "Line:": "a\nb", "Home": "@"}
+        )
+
+    def test_expression(self):
+        """String literals of gettext calls are translated and
+        escaped.
+        """
+        p = self.p.localize(self.t)
+        assert "Utilisateur &lt;b&gt;:" == p.expression("_('User:')")
+        assert "Utilisateur &lt;b&gt;:" == p.expression('_( "User:" )')
+        assert "Password:" == p.expression("_('Password:')")
+        assert "_(x)|h" == p.expression("_(x)", "|h")
+        assert "_('User:') + x" == p.expression("_('User:') + x")
+        assert "_('User:')" == self.p.expression("_('User:')")
+
+    def test_unsafe(self):
+        """Translation that is not safe to embed is left to
+        runtime.
+        """
+        p = self.p.localize(self.t)
+        assert "_('Line:')" == p.expression("_('Line:')")
+        assert "@" == p.expression("_('Home')")
+        p.LITERAL_UNSAFE = ("@",)
+        assert "_('Home')" == p.expression("_('Home')")
+
+    def test_widgets(self):
+        """Widgets of a copy use its translations and copies are
+        cached per translations.
+        """
+        self.p.LABEL = "%(value)s"
+        self.p.ERROR_CLASS0 = ""
+        p = self.p.localize(self.t)
+        assert p is self.p.localize(self.t)
+        assert p is not self.p.localize(Translations({}))
+        assert "Utilisateur &lt;b&gt;:" == p.widgets["label"](
+            "model.user", "_('User:')", ""
+        )
+        assert "_('User:')" == self.p.widgets["label"](
+            "model.user", "_('User:')", ""
+        )
+
+
+class HTMLEvents(HTMLParser):
+    """Collects parser events, end tags of void elements and values
+    of minimized boolean attributes are normalized.
+    """
+
+    VOID = ("br", "hr", "img", "input", "link", "meta")
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.events = []
+
+    def handle_starttag(self, tag, attrs):
+        self.events.append(
+            (
+                "start",
+                tag,
+                sorted([(k, k if v is None else v) for k, v in attrs]),
+            )
+        )
+
+    def handle_endtag(self, tag):
+        if tag not in self.VOID:
+            self.events.append(("end", tag))
+
+    def handle_data(self, data):
+        self.events.append(("data", data))
+
+
+def html_events(text):
+    """Returns a list of ``html.parser`` events for ``text``."""
+    parser = HTMLEvents()
+    parser.feed(text)
+    parser.close()
+    return parser.events
+
+
+class PreprocessorHTML5TestCase(unittest.TestCase):
+    """Test the ``Preprocessor`` in HTML5 mode."""
+
+    def test_templates(self):
+        """Templates are rewritten per instance."""
+        from wheezy.html.ext.lexer import Preprocessor
+
+        p = Preprocessor("%(widgets)s", html5=True)
+        assert (
+            '<input type=hidden name="%(name)s" value="%(value)s">' == p.HIDDEN
+        )
+        assert p.HIDDEN != Preprocessor.HIDDEN
+        assert Preprocessor.LABEL == p.LABEL
+
+    def test_html_events(self):
+        """XHTML and HTML5 forms are parsed the same."""
+        assert html_events(
+            '<select multiple="multiple"><option selected="selected" '
+            'value="1">x</option></select><input type="checkbox" />'
+        ) == html_events(
+            "<select multiple><option selected value=1>x</option>"
+            "</select><input type=checkbox>"
+        )
+        assert html_events('<input value="a b" />') != html_events(
+            "<input value=a b>"
+        )
+
+
+class HtmlMinifyPreprocessorTestCase(unittest.TestCase):
+    """Test the ``HtmlMinifyPreprocessor``."""
+
+    def setUp(self):
+        import re
+
+        from wheezy.html.ext.lexer import HtmlMinifyPreprocessor
+
+        self.p = HtmlMinifyPreprocessor(
+            re.compile(r"{{.*?}}|^%.*?$", re.MULTILINE)
+        )
+
+    def test_whitespace(self):
+        """Whitespace is collapsed, line breaks are preserved."""
+        assert " a b " == self.p("  a \t b  ")
+        assert "<p>\na\n</p>\n% if x:\n<b>" == self.p(
+            "<p>\n  a  \n\n</p>\n% if x:\n  <b>"
+        )
+        assert "<p class=a id=b>" == self.p('<p\tclass="a"  id="b" \n>')
+        assert "<p\nclass=a>" == self.p('<p \n class="a">')
+
+    def test_comments(self):
+        """Comments are removed unless conditional or with
+        directives.
+        """
+        assert "a b" == self.p("a <!-- x --> b")
+        assert "<!--[if IE]><p><![endif]-->" == self.p(
+            "<!--[if IE]><p><![endif]-->"
+        )
+        assert "<!-- {{ x }} -->" == self.p("<!-- {{ x }} -->")
+        assert "<!-- \n% if x:\n -->" == self.p("<!-- \n% if x:\n -->")
+
+    def test_quotes(self):
+        """Quotes around static values are removed."""
+        assert "<a id=x-1 lang=en-US>" == self.p("<a id='x-1' lang=\"en-US\">")
+        assert '<a href="/" title="a b" x="">' == self.p(
+            '<a href="/" title="a b" x="">'
+        )
+        assert '<br id="a"/>' == self.p('<br id="a"/>')
+        assert '<a id="{{ x }}" class=a>' == self.p(
+            '<a id="{{ x }}" class="a" >'
+        )
+        assert "<a title=\"a  'b' > c\">" == self.p("<a title=\"a  'b' > c\">")
+
+    def test_raw(self):
+        """Content of pre, script, style and textarea is preserved."""
+        for tag in ("pre", "script", "style", "textarea"):
+            text = "<%s> a  \n  <!-- b --> </%s>" % (tag, tag)
+            assert text + "\n" == self.p(text + "\n  ")
+        assert "<PRE> a  b </pre>" == self.p("<PRE> a  b </pre >")
+
+    def test_directives(self):
+        """Markup state is carried over directives."""
+        assert "<{{ tag }} id=x>" == self.p('<{{ tag }}   id="x" >')
+        assert "<p {{ attrs }} id=x>a {{ b }} c" == self.p(
+            '<p  {{ attrs }}  id="x">a  {{ b }}  c'
+        )
+        assert "<pre> {{ x }}  </pre>" == self.p("<pre> {{ x }}  </pre>")
+        assert '<p title="{{ x }} a  b">' == self.p('<p title="{{ x }} a  b">')
+
+
+class InlinePreprocessorParamsTestCase(unittest.TestCase):
+    """Test the ``InlinePreprocessor`` parameters."""
+
+    def setUp(self):
+        import re
+
+        from wheezy.html.ext.lexer import INLINE_PARAMS, InlinePreprocessor
+
+        self.reads = []
+        self.p = InlinePreprocessor(
+            re.compile(r"@(?P<path>\w)" + INLINE_PARAMS + ";"),
+            [],
+            placeholder="#%s#",
+        )
+        self.p.read = self.read
+
+    def read(self, path):
+        self.reads.append(path)
+        return {"a": "[#x#@b y='#x#';]", "b": "(#y#)"}[path]
+
+    def test_substitute(self):
+        """Parameters are substituted before nested inlines."""
+        assert "[1(1)] [2(2)]" == self.p('@a x="1"; @a, x="2";')
+        assert "[#x#(#x#)]" == self.p("@a;")
+
+    def test_cache(self):
+        """Substituted content is cached per path and parameters."""
+        self.p('@a x="1"; @a x="1";')
+        self.p('@a x="1";')
+        assert ["a", "b"] == self.reads
+        self.p('@a x="2";')
+        assert ["a", "b", "a", "b"] == self.reads
+
+    def test_policy_scan(self):
+        """Parameterized inlines are not counted by policy."""
+        from wheezy.html.ext.lexer import InlinePolicy
+
+        policy = InlinePolicy()
+        policy.scan(self.p, ['@a x="1"; @b;'])
+        assert {"b": 1} == policy.references
+
+    def test_no_placeholder(self):
+        """Parameters are ignored with a warning."""
+        import warnings
+
+        self.p.placeholder = None
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            assert "[#x#(#y#)]" == self.p('@a x="1";')
+        assert 2 == len(w)
+
+
+class InlinePreprocessorDataURITestCase(unittest.TestCase):
+    """Test the ``InlinePreprocessor`` assets inlined as data URI."""
+
+    def setUp(self):
+        import re
+
+        from wheezy.html.ext.lexer import (
+            INLINE_PARAMS,
+            DataURIEncoder,
+            InlinePreprocessor,
+        )
+        from wheezy.html.ext.loader import DictLoader
+
+        self.loader = DictLoader(
+            {
+                "a.html": "<img src=\"@x.png as_='data-uri';\">",
+                "x.png": b"\x89PNG",
+                "x.svg": '<svg><path d="M12,2l3.09,6.26L22,9.27z"/></svg>',
+                "x.css": "p{color:#fff}",
+                "big.woff2": bytes(17),
+            }
+        )
+        self.p = InlinePreprocessor(
+            re.compile(r"@(?P<path>[\w./]+)" + INLINE_PARAMS + ";"),
+            [],
+            loader=self.loader,
+            data_uri=DataURIEncoder(max_size=16, url="/static/%s"),
+        )
+
+    def test_data_uri(self):
+        """Assets are encoded by media type."""
+        assert '<img src="data:image/png;base64,iVBORw==">' == (
+            self.p("@a.html;")
+        )
+        assert "data:text/css;charset=utf-8,p%7Bcolor:%23fff%7D" == (
+            self.p('@x.css as_="data-uri";')
+        )
+        self.p.data_uri.max_size = 4096
+        assert (
+            "data:image/svg+xml,%3Csvg%3E%3Cpath%20d=%22M12,2l3.09,6.26"
+            "L22,9.27z%22/%3E%3C/svg%3E" == self.p('@x.svg as_="data-uri";')
+        )
+
+    def test_url(self):
+        """Assets larger than max size are referenced by URL."""
+        assert "url(/static/big.woff2)" == self.p(
+            'url(@/big.woff2 as_="data-uri";)'
+        )
+
+    def test_cache(self):
+        """Encoded assets are cached per path."""
+        self.p('@x.png as_="data-uri";')
+        del self.loader.templates["x.png"]
+        assert "data:image/png;base64,iVBORw==" == self.p(
+            '@/x.png as_="data-uri";'
+        )
+
+    def test_not_found(self):
+        import warnings
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            assert "" == self.p('@x.gif as_="data-uri";')
+        assert 1 == len(w)
+
+    def test_policy_scan(self):
+        """Assets are not read by policy."""
+        from wheezy.html.ext.lexer import InlinePolicy
+
+        policy = InlinePolicy()
+        policy.scan(self.p, ["@a.html;"])
+        assert {"a.html": 1} == policy.references
+
+
+class InlinePreprocessorMinifyTestCase(unittest.TestCase):
+    """Test the ``InlinePreprocessor`` minification of CSS and
+    JavaScript.
+    """
+
+    def p(self, text, detect=False):
+        import re
+
+        from wheezy.html.ext.lexer import INLINE_PARAMS, InlinePreprocessor
+        from wheezy.html.ext.loader import DictLoader
+        from wheezy.html.ext.minify import AssetMinifier
+
+        p = InlinePreprocessor(
+            re.compile(r"@(?P<path>[\w./]+)" + INLINE_PARAMS + ";"),
+            [],
+            loader=DictLoader(
+                {
+                    "a.css": "a {\n  color : {{c}}; /* x */\n}",
+                    "b.js": "var b = 1 ; // x",
+                    "c.txt": "a  b",
+                }
+            ),
+            minifier=AssetMinifier(re.compile(r"{{.*?}}"), detect),
+        )
+        return p(text)
+
+    def test_tagged(self):
+        """Content tagged with as_ parameter is minified."""
+        assert "a{\ncolor:{{c}};\n}" == self.p('@a.css as_="css";')
+        assert "var b=1;" == self.p("@b.js as_='js';")
+        assert "<style>a {\n  color : {{c}}; /* x */\n}</style>" == self.p(
+            "<style>@a.css;</style>"
+        )
+
+    def test_detect(self):
+        """Content inlined within style and script elements is
+        minified if detect is set.
+        """
+        assert "<style>a{\ncolor:{{c}};\n}</style>" == self.p(
+            "<style>@a.css;</style>", detect=True
+        )
+        assert "<script>var b=1;</script>a  b" == self.p(
+            "<script>@b.js;</script>@c.txt;", detect=True
+        )
+        assert '<script type="text/html">a  b</script>' == self.p(
+            '<script type="text/html">@c.txt;</script>', detect=True
+        )
+
+
+class InlinePolicyTestCase(unittest.TestCase):
+    """Test the ``InlinePolicy``."""
+
+    def setUp(self):
+        import re
+
+        from wheezy.html.ext.lexer import InlinePolicy, InlinePreprocessor
+
+        self.files = {"a": "[@c@]", "b": "b" * 100, "c": "c" * 10}
+        self.policy = InlinePolicy(min_include_size=5, max_inline_bytes=50)
+        self.p = InlinePreprocessor(
+            re.compile(r"@(?P<path>\w)@"),
+            [],
+            policy=self.policy,
+            include=lambda path: "<%s>" % path,
+        )
+        self.p.read = self.files.__getitem__
+
+    def test_scan(self):
+        """References are counted through inlined files."""
+        self.policy.scan(self.p, ["@a@ @a@", "@a@ @b@"])
+        assert {"a": 3, "b": 1, "c": 3} == self.policy.references
+
+    def test_decide(self):
+        """Small or rarely referenced files are inlined."""
+        self.policy.scan(self.p, ["@a@"] * 4 + ["@b@"])
+        assert "[cccccccccc]" == self.p("@a@")
+        assert "<b>" == self.p("@b@")
+        assert [
+            ("a", 5, 4, "inline"),
+            ("b", 100, 1, "include"),
+            ("c", 10, 4, "inline"),
+        ] == self.policy.report()
+
+    def test_hot(self):
+        """Hot files are always inlined."""
+        from wheezy.html.ext.lexer import InlinePolicy
+
+        self.p.policy = InlinePolicy(0, 0, hot=["b"])
+        assert "b" * 100 + "<c>" == self.p("@b@@c@")
+
+
+class ObserverTestCase(unittest.TestCase):
+    """Test the preprocessors ``observer``."""
+
+    def setUp(self):
+        from wheezy.html.ext.lexer import PreprocessorStats
+
+        self.stats = PreprocessorStats()
+
+    def test_widgets(self):
+        """Widget kinds are counted."""
+        from wheezy.html.ext.lexer import Preprocessor
+
+        p = Preprocessor(
+            r"(?P<expr>\w+)\.(?P<widget>%(widgets)s)\((?P<params>)\)"
+            r"(?P<expr_filter>)"
+        )
+        p.HIDDEN = "[%(name)s]"
+        p.EXPRESSION = "%(expr)s"
+        p.observer = self.stats
+        assert "[a] [b]" == p("a.hidden() b.hidden()", name="x")
+        s = self.stats.snapshot()
+        assert {"hidden": 2} == s["counts"]["widgets"]
+        stage = s["stages"]["widgets"]
+        assert 1 == stage["calls"]
+        assert 21 == stage["bytes_in"]
+        assert 7 == stage["bytes_out"]
+        assert stage["duration"] >= 0
+
+    def test_whitespace(self):
+        """Whitespace substitutions are counted."""
+        import re
+
+        from wheezy.html.ext.lexer import WhitespacePreprocessor
+
+        p = WhitespacePreprocessor(
+            rules=[(re.compile(r">\s+<"), "><")],
+            ignore_rules=[re.compile(r"<pre>.*?</pre>")],
+        )
+        p.observer = self.stats
+        assert "<a><b><pre> </pre><c><d>" == p("<a> <b><pre> </pre><c> <d>")
+        assert {"rules": 2} == self.stats.snapshot()["counts"]["whitespace"]
+
+    def test_inline(self):
+        """Nested inlines are counted within single stage call."""
+        import re
+
+        from wheezy.html.ext.lexer import InlinePreprocessor
+
+        files = {"a": "[@b@]", "b": "b"}
+        p = InlinePreprocessor(
+            re.compile(r"@(?P<path>\w)@"), [], lambda path: files[path]
+        )
+        p.observer = self.stats
+        assert "x[b]" == p("x@a@")
+        s = self.stats.snapshot()
+        assert {"inline": 2} == s["counts"]["inline"]
+        assert 1 == s["stages"]["inline"]["calls"]
+
+    def test_minify(self):
+        """Removed comments and quotes are counted."""
+        from wheezy.html.ext.lexer import HtmlMinifyPreprocessor
+
+        p = HtmlMinifyPreprocessor()
+        p.observer = self.stats
+        assert '<p id=a class="b c">' == p('<p id="a" class="b c"><!-- x -->')
+        s = self.stats.snapshot()
+        assert {"comments": 1, "quotes": 1} == s["counts"]["minify"]
+
+    def test_disabled(self):
+        """No notifications unless observer is assigned."""
+        from wheezy.html.ext.lexer import Preprocessor
+
+        p = Preprocessor("%(widgets)s")
+        assert "x" == p("x")
+        self.stats.reset()
+        assert {"stages": {}, "counts": {}} == self.stats.snapshot()
+
+
 class PreprocessorMixin(object):
     """Test the ``Preprocessor``."""
 
@@ -673,6 +1239,85 @@ class PreprocessorMixin(object):
             "</select>",
         )
 
+    def test_lazy_choices(self):
+        """choices given as a callable."""
+        from wheezy.html.utils import LazyChoices
+
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return PreprocessorMixin.scm
+
+        self.m.scm = "hg"
+        for scm in (factory, LazyChoices(factory)):
+            self.scm = scm
+            self.render(
+                self.DROPDOWN,
+                '<select id="scm" name="scm">'
+                '<option value="git">Git</option>'
+                '<option value="hg" selected="selected">Mercurial</option>'
+                '<option value="svn">SVN</option>'
+                "</select>",
+            )
+        assert len(self.WHITE_SPACE_PATTERNS) + 1 == len(calls)
+
+    def test_choices_evaluated_once(self):
+        """choices expression is evaluated once per widget render."""
+        calls = []
+
+        def scm():
+            calls.append(1)
+            return PreprocessorMixin.scm
+
+        self.scm = scm
+        self.m.scm = "hg"
+        for widget, html in [
+            (
+                self.DROPDOWN,
+                '<select id="scm" name="scm">'
+                '<option value="git">Git</option>'
+                '<option value="hg" selected="selected">Mercurial</option>'
+                '<option value="svn">SVN</option>'
+                "</select>",
+            ),
+            (
+                self.RADIO,
+                '<label><input type="radio" name="scm" value="git" />'
+                "Git</label>"
+                '<label><input type="radio" name="scm" value="hg" '
+                'checked="checked" />Mercurial</label>'
+                '<label><input type="radio" name="scm" value="svn" />'
+                "SVN</label>",
+            ),
+        ]:
+            del calls[:]
+            self.render(widget.replace("choices=scm", "choices=scm()"), html)
+            assert len(self.WHITE_SPACE_PATTERNS) == len(calls)
+        self.m.scm = ["hg", "svn"]
+        for widget, html in [
+            (
+                self.LISTBOX,
+                '<select id="scm" name="scm" multiple="multiple" class="x">'
+                '<option value="git">Git</option>'
+                '<option value="hg" selected="selected">Mercurial</option>'
+                '<option value="svn" selected="selected">SVN</option>'
+                "</select>",
+            ),
+            (
+                self.MULTIPLE_CHECKBOX,
+                '<label><input id="scm" name="scm" type="checkbox" '
+                'value="1" />Git</label>'
+                '<label><input id="scm" name="scm" type="checkbox" '
+                'value="1" checked="checked" />Mercurial</label>'
+                '<label><input id="scm" name="scm" type="checkbox" '
+                'value="1" checked="checked" />SVN</label>',
+            ),
+        ]:
+            del calls[:]
+            self.render(widget.replace("choices=scm", "choices=scm()"), html)
+            assert len(self.WHITE_SPACE_PATTERNS) == len(calls)
+
     def test_listbox(self):
         """listbox widget."""
         self.m.scm = ("hg", "svn")
@@ -704,6 +1349,17 @@ class PreprocessorMixin(object):
             "</select>",
         )
 
+    def test_no_errors(self):
+        """errors evaluated to False skip per field lookups."""
+        self.m.username = "John"
+        self.e = None
+        self.render(
+            self.TEXTBOX,
+            '<input id="username" name="username" type="text" '
+            'autocomplete="off" value="John" />',
+        )
+        self.render(self.ERROR, "")
+
     def test_attribute_error(self):
         """attribute error widget."""
         self.render(self.ERROR, "")
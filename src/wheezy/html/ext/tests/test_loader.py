@@ -0,0 +1,167 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+FILES = {
+    "a.html": "<a>é</a>",
+    "shared/b.html": "<b>",
+}
+
+
+class FileLoaderTestCase(unittest.TestCase):
+    """Test the ``FileLoader``."""
+
+    def setUp(self):
+        from wheezy.html.ext.loader import FileLoader
+
+        self.dir = tempfile.mkdtemp()
+        for name, text in FILES.items():
+            path = os.path.join(self.dir, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        self.loader = FileLoader([self.dir, self.dir])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_list_names(self):
+        assert sorted(FILES) == self.loader.list_names()
+
+    def test_load(self):
+        assert "<b>" == self.loader.load("shared/b.html")
+        assert self.loader.load("shared") is None
+        assert self.loader.load("x.html") is None
+
+    def test_load_bytes(self):
+        assert FILES["a.html"].encode("utf-8") == self.loader.load_bytes(
+            "a.html"
+        )
+        assert self.loader.load_bytes("x.html") is None
+
+    def test_preload(self):
+        """Assets are preloaded as bytes, text is decoded on load."""
+        from wheezy.html.ext.loader import preload
+
+        png = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\xff"
+        with open(os.path.join(self.dir, "x.png"), "wb") as f:
+            f.write(png)
+        loader = preload(self.loader)
+        assert png == loader.load_bytes("x.png")
+        assert FILES["a.html"] == loader.load("a.html")
+        assert loader.load("a.html") is loader.load("a.html")
+
+
+class ReadFileTestCase(unittest.TestCase):
+    """Test the ``read_file``."""
+
+    def setUp(self):
+        from wheezy.html.ext import loader
+
+        self.loader = loader
+        self.sizes = loader.MMAP_SIZE, loader.CHUNK_SIZE
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        self.loader.MMAP_SIZE, self.loader.CHUNK_SIZE = self.sizes
+        os.remove(self.path)
+
+    def read(self, data, *args):
+        with open(self.path, "wb") as f:
+            f.write(data)
+        return self.loader.read_file(self.path, *args)
+
+    def test_read(self):
+        data = "\ufeff<p>\r\n\u00e9\r</p>\r\n".encode("utf-8")
+        for mmap_size in (1 << 20, 1, 0):
+            self.loader.MMAP_SIZE = mmap_size
+            for chunk_size in (1, 2, 3, 1 << 20):
+                self.loader.CHUNK_SIZE = chunk_size
+                assert "\ufeff<p>\n\u00e9\n</p>\n" == self.read(data)
+                assert "<p>\n\u00e9\n</p>\n" == self.read(
+                    data, "utf-8", True, True
+                )
+                assert "<p>\r\n\u00e9\r</p>\r\n" == self.read(
+                    data, "UTF8", False, True
+                )
+            assert "" == self.read(b"")
+
+    def test_encoding(self):
+        data = "\ufeff\u0444\r\n".encode("utf-16-le")
+        assert "\u0444\n" == self.read(data, "utf-16-le", True, True)
+        self.loader.MMAP_SIZE = self.loader.CHUNK_SIZE = 1
+        assert "\u0444\n" == self.read(data, "utf-16-le", True, True)
+        assert "\u0444" == self.read(b"\xf4", "cp1251")
+
+
+class ZipMixin(object):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "app.zip")
+        with zipfile.ZipFile(self.path, "w") as z:
+            z.writestr("tplpkg/__init__.py", "")
+            for name, text in FILES.items():
+                z.writestr("tplpkg/templates/" + name, text.encode("utf-8"))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+
+class ZipLoaderTestCase(ZipMixin, unittest.TestCase):
+    """Test the ``ZipLoader``."""
+
+    def test_load(self):
+        from wheezy.html.ext.loader import ZipLoader
+
+        loader = ZipLoader(self.path, "/tplpkg/templates/")
+        try:
+            assert sorted(FILES) == loader.list_names()
+            assert FILES["a.html"] == loader.load("a.html")
+            assert b"<b>" == loader.load_bytes("shared/b.html")
+            assert loader.load("shared") is None
+            assert loader.load("x.html") is None
+        finally:
+            loader.close()
+        assert loader.zip is None
+
+    def test_root(self):
+        from wheezy.html.ext.loader import ZipLoader
+
+        loader = ZipLoader(self.path)
+        assert "<b>" == loader.load("tplpkg/templates/shared/b.html")
+        loader.close()
+
+
+class PackageLoaderTestCase(ZipMixin, unittest.TestCase):
+    """Test the ``PackageLoader`` with a package imported from zip."""
+
+    def setUp(self):
+        super(PackageLoaderTestCase, self).setUp()
+        sys.path.insert(0, self.path)
+
+    def tearDown(self):
+        sys.path.remove(self.path)
+        sys.modules.pop("tplpkg", None)
+        super(PackageLoaderTestCase, self).tearDown()
+
+    def test_load(self):
+        from wheezy.html.ext.loader import PackageLoader
+
+        loader = PackageLoader("tplpkg", "templates")
+        assert sorted(FILES) == loader.list_names()
+        assert FILES["a.html"] == loader.load("a.html")
+        assert "<b>" == loader.load("shared/b.html")
+        assert b"<b>" == loader.load_bytes("shared/b.html")
+        assert loader.load("shared") is None
+        assert loader.load("x.html") is None
+        assert [] == PackageLoader("tplpkg", "x").list_names()
+
+    def test_preload(self):
+        from wheezy.html.ext.loader import PackageLoader, preload
+
+        loader = preload(PackageLoader("tplpkg", "/templates"))
+        assert FILES == {name: loader.load(name) for name in FILES}
@@ -1,6 +1,7 @@
 import unittest
 
-from wheezy.html.ext.tests.test_lexer import PreprocessorMixin
+from wheezy.html.ext.tests.test_bundle import BundleLoaderMixin
+from wheezy.html.ext.tests.test_lexer import PreprocessorMixin, html_events
 
 
 class MakoPreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
@@ -31,6 +32,86 @@ class MakoPreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
     GENERAL_WARNING = "${message.warning()|h}"
 
 
+class MakoSharedPreprocessorTestCase(MakoPreprocessorTestCase):
+    """Test the ``MakoPreprocessor`` in shared mode."""
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.mako import MakoPreprocessor
+
+        assert_mako_equal(
+            template,
+            expected,
+            preprocessor=MakoPreprocessor(shared=True),
+            **kwargs,
+        )
+
+    def test_filter(self):
+        """Widgets with a filter other than escape are not shared."""
+        self.m.scm = "hg"
+        self.assert_render_equal(
+            self.DROPDOWN.replace(")}", ")|upper}"),
+            '<select id="scm" name="scm">'
+            '<option value="GIT">GIT</option>'
+            '<option value="HG" selected="selected">MERCURIAL</option>'
+            '<option value="SVN">SVN</option>'
+            "</select>",
+            model=self.m,
+            errors=self.e,
+            scm=self.scm,
+            upper=str.upper,
+        )
+
+
+class MakoFragmentsPreprocessorTestCase(MakoPreprocessorTestCase):
+    """Test the ``MakoPreprocessor`` in fragments mode."""
+
+    scm = tuple(PreprocessorMixin.scm)
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.mako import MakoPreprocessor
+
+        assert_mako_equal(
+            template,
+            expected,
+            preprocessor=MakoPreprocessor(fragments=True),
+            **kwargs,
+        )
+
+
+class MakoTimingPreprocessorTestCase(MakoPreprocessorTestCase):
+    """Test the ``MakoPreprocessor`` in timing mode."""
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.mako import MakoPreprocessor
+        from wheezy.html.utils import widget_timing
+
+        with widget_timing() as timings:
+            assert_mako_equal(
+                template,
+                expected,
+                preprocessor=MakoPreprocessor(timing=True),
+                **kwargs,
+            )
+        assert 1 == len(timings.durations)
+
+
+class MakoHTML5PreprocessorTestCase(MakoPreprocessorTestCase):
+    """Test the ``MakoPreprocessor`` in HTML5 mode, markup is
+    parsed the same as XHTML.
+    """
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.mako import MakoPreprocessor
+
+        assert_mako_equal(
+            template,
+            expected,
+            preprocessor=MakoPreprocessor(html5=True),
+            parse=html_events,
+            **kwargs,
+        )
+
+
 class MakoWhitespacePreprocessorTestCase(unittest.TestCase):
     """Test the ``whitespace_preprocessor``."""
 
@@ -45,13 +126,39 @@ class MakoWhitespacePreprocessorTestCase(unittest.TestCase):
         assert "><" == whitespace_preprocessor("  > < ")
 
 
+class MakoMinifyPreprocessorTestCase(unittest.TestCase):
+    """Test the ``minify_preprocessor``."""
+
+    def test_render(self):
+        """Directives are copied as is."""
+        from wheezy.html.ext.mako import minify_preprocessor
+
+        assert_mako_equal(
+            "<%! x = '<a  b>' %>\n"
+            '<ul  class="list">\n'
+            "    ## items\n"
+            "    % for key, text in scm:\n"
+            '    <li  id="${key}" class="item" >  ${text}  </li>\n'
+            "    % endfor\n"
+            "</ul><%def name='f()'>  ${x}  </%def>${f()}",
+            "\n<ul class=list>\n"
+            '<li id="git" class=item> Git </li>\n'
+            '<li id="hg" class=item> Mercurial </li>\n'
+            "</ul> <a  b> ",
+            preprocessor=minify_preprocessor,
+            scm=[("git", "Git"), ("hg", "Mercurial")],
+        )
+
+
 class InlinePreprocessorTestCase(unittest.TestCase):
     """Test the ``inline_preprocessor``."""
 
-    def p(self, text, fallback=False):
+    def p(self, text, fallback=False, policy=None):
         from wheezy.html.ext.mako import inline_preprocessor
 
-        p = inline_preprocessor(directories=["."], fallback=fallback)
+        p = inline_preprocessor(
+            directories=["."], fallback=fallback, policy=policy
+        )
         return p(text)
 
     def test_inline(self):
@@ -62,6 +169,53 @@ class InlinePreprocessorTestCase(unittest.TestCase):
             '<%inline file="LICENSE" />', fallback=True
         )
 
+    def test_inline_policy(self):
+        from wheezy.html.ext.lexer import InlinePolicy
+
+        policy = InlinePolicy(min_include_size=0, max_inline_bytes=0)
+        assert '<%include file="LICENSE"/>' == self.p(
+            '<%inline file="LICENSE" />', policy=policy
+        )
+        assert "include" == policy.report()[0][3]
+        policy = InlinePolicy(
+            min_include_size=0, max_inline_bytes=0, hot=["/LICENSE"]
+        )
+        assert "Copyright" in self.p(
+            '<%inline file="LICENSE" />', policy=policy
+        )
+
+    def test_inline_params(self):
+        """Parameters are substituted even if fallback is set."""
+        from wheezy.html.ext.mako import inline_preprocessor
+
+        p = inline_preprocessor(directories=[], fallback=True)
+        p.read = lambda path: "<h1>${title}</h1>${ title }${title | h}"
+        assert "<h1>Sign in</h1>Sign inSign in" == p(
+            '<%inline file="h.html" title="Sign in" />'
+        )
+
+    def test_inline_params_filters(self):
+        """Filters of placeholders are applied to parameters."""
+        from wheezy.html.ext.mako import inline_preprocessor
+
+        p = inline_preprocessor(directories=[])
+        p.read = lambda path: "${x|h}${ x | n,h }${x.y|h}"
+        assert "&lt;b&gt;&lt;b&gt;${x.y|h}" == p(
+            '<%inline file="a.html" x="<b>" />'
+        )
+        p.read = lambda path: "${x | u}"
+        self.assertRaises(ValueError, p, '<%inline file="b.html" x="b" />')
+
+    def test_inline_minify(self):
+        """Directives are kept within minified content."""
+        from wheezy.html.ext.mako import inline_preprocessor
+
+        p = inline_preprocessor(directories=[], minify=True)
+        p.read = lambda path: ("% if dark:\na { color : ${ c } ; }\n% endif\n")
+        assert "<style>\n% if dark:\na{color:${ c }}\n% endif\n</style>" == (
+            p('<style>\n<%inline file="a.css" /></style>')
+        )
+
     def test_inline_not_found(self):
         import warnings
 
@@ -70,17 +224,48 @@ class InlinePreprocessorTestCase(unittest.TestCase):
         warnings.simplefilter("default")
 
 
+class BundleLookupTestCase(BundleLoaderMixin, unittest.TestCase):
+    """Test the ``BundleLookup``."""
+
+    def assert_render_equal(self, expected, **kwargs):
+        from wheezy.html.ext.mako import BundleLookup, widget_preprocessor
+
+        b = self.bundle(
+            {
+                "x.html": '<%include file="y.html"/>',
+                "y.html": "${model.remember_me.checkbox()}",
+            },
+            [widget_preprocessor],
+        )
+        lookup = BundleLookup(b)
+        assert lookup.has_template("/x.html")
+        assert not lookup.has_template("/z.html")
+        assert_bundle_equal(lookup, "/x.html", expected, **kwargs)
+
+
 try:
     # from mako.template import Template
     Template = __import__("mako.template", None, None, ["Template"]).Template
     from wheezy.html.ext.mako import widget_preprocessor
 
-    def assert_mako_equal(text, expected, **kwargs):
-        template = Template(text, preprocessor=[widget_preprocessor])
+    def assert_mako_equal(
+        text, expected, preprocessor=None, parse=str, **kwargs
+    ):
+        template = Template(
+            text, preprocessor=[preprocessor or widget_preprocessor]
+        )
         value = template.render(**kwargs)
-        assert expected == value
+        assert parse(expected) == parse(value)
+
+    def assert_bundle_equal(lookup, uri, expected, **kwargs):
+        template = lookup.get_template(uri)
+        assert template is lookup.get_template(uri)
+        assert expected == template.render(**kwargs)
 
 except ImportError:  # pragma: nocover
 
     def assert_mako_equal(text, expected, **kwargs):  # noqa
         pass
+
+    def assert_bundle_equal(lookup, uri, expected, **kwargs):  # noqa
+        pass
@@ -0,0 +1,122 @@
+import re
+import unittest
+
+
+class MinifyCSSTestCase(unittest.TestCase):
+    """Test the ``minify_css``."""
+
+    def m(self, text):
+        from wheezy.html.ext.minify import minify_css
+
+        return minify_css(text)
+
+    def test_comments(self):
+        assert "a{}" == self.m("/* x */ a /* y */ { }")
+        assert "/*! MIT */\na{}" == self.m("/*! MIT */\na {}")
+        assert "a b" == self.m("a/**/b")
+
+    def test_whitespace(self):
+        assert "a{\ncolor:red\n}\n" == self.m("  a {\n\n  color : red\n}  \n")
+        assert ".a>.b,.c~.d{}" == self.m(".a > .b , .c ~ .d { }")
+
+    def test_selectors(self):
+        """Spaces before colon of a pseudo class are kept."""
+        assert "a :hover,a:focus{}" == self.m("a :hover, a:focus {}")
+        assert "@media (min-width:1px){a{b:c}}" == self.m(
+            "@media (min-width: 1px) { a { b : c ; } }"
+        )
+        assert "@media print{a :hover{color:red}}" == self.m(
+            "@media print { a :hover { color : red } }"
+        )
+        assert "@media print{a{b:c}.x :hover,a :focus{d:e}}" == self.m(
+            "@media print { a { b : c } .x :hover, a :focus { d : e; } }"
+        )
+
+    def test_values(self):
+        assert "a{width:calc(1px + 2%) !important}" == self.m(
+            "a { width: calc(1px + 2%) !important; }"
+        )
+        assert "a{content:\"a ; b\";x:'/* c */'}" == self.m(
+            "a { content: \"a ; b\"; x: '/* c */' }"
+        )
+
+
+class MinifyJSTestCase(unittest.TestCase):
+    """Test the ``minify_js``."""
+
+    def m(self, text):
+        from wheezy.html.ext.minify import minify_js
+
+        return minify_js(text)
+
+    def test_comments(self):
+        assert "a=1;\nb=2" == self.m("a = 1; // x\nb = 2 /* y */")
+        assert "a\nb" == self.m("a /* x\n */ b")
+        assert "/*! MIT */\nf()" == self.m("/*! MIT */\nf()")
+
+    def test_operators(self):
+        assert "a- -b+ +c-+d" == self.m("a - -b + +c - +d")
+        assert "a++ + ++b" == self.m("a++ + ++b")
+        assert "x=a/b/c" == self.m("x = a / b / c")
+
+    def test_line_breaks(self):
+        """Line breaks are kept for automatic semicolon insertion."""
+        assert "var a=b\n++c\nreturn\nx" == self.m(
+            "var a = b\n\n  ++c\nreturn\n  x"
+        )
+
+    def test_literals(self):
+        assert "f(\"a  b\",'c // d',`e\n  ${f}`)" == self.m(
+            "f( \"a  b\", 'c // d', `e\n  ${f}` )"
+        )
+        assert "x=/ a[/]b /g.test(s)?1:2" == self.m(
+            "x = / a[/]b /g.test(s) ? 1 : 2"
+        )
+        assert "return/a/.test(s)" == self.m("return /a/.test(s)")
+        assert "if(/a/.test(s)){}" == self.m("if (/a/.test(s)) { }")
+
+
+class AssetContextTestCase(unittest.TestCase):
+    """Test the ``asset_context``."""
+
+    def test_context(self):
+        from wheezy.html.ext.minify import asset_context
+
+        for text, kind in [
+            ("<p>", None),
+            ("<STYLE media=all>", "css"),
+            ("<style>a{}</style><p>", None),
+            ("<style", None),
+            ("<script>", "js"),
+            ('<script type="module">', "js"),
+            ('<script type="application/ld+json">', "js"),
+            ('<script type="text/x-template">', None),
+            ("<script></script><style>", "css"),
+        ]:
+            assert kind == asset_context(text, len(text)), text
+
+
+class AssetMinifierTestCase(unittest.TestCase):
+    """Test the ``AssetMinifier``."""
+
+    def test_directives(self):
+        """Directives are copied as is."""
+        from wheezy.html.ext.minify import AssetMinifier
+
+        m = AssetMinifier(re.compile(r"\$\{.*?\}"))
+        assert "var a=${ b , c },d=${ x }" == m(
+            "js", "var a = ${ b , c }, d = ${ x }"
+        )
+        assert "a{b:${ c }}" == m("css", "a { b: ${ c }; }")
+
+    def test_cache(self):
+        """Results are cached by kind and content hash."""
+        from wheezy.html.ext.minify import AssetMinifier
+
+        m = AssetMinifier()
+        assert "a{}" == m("css", "a { }")
+        assert 1 == len(m.cache)
+        assert "a{}" == m("css", "a { }")
+        assert 1 == len(m.cache)
+        assert "a{}" == m("js", "a { }")
+        assert 2 == len(m.cache)
@@ -1,6 +1,15 @@
+import re
 import unittest
 
-from wheezy.html.ext.tests.test_lexer import PreprocessorMixin
+from wheezy.html.ext.tests.test_bundle import BundleLoaderMixin
+from wheezy.html.ext.tests.test_lexer import (
+    PreprocessorMixin,
+    Translations,
+    html_events,
+)
+
+# markup that is not rendered in HTML5 mode
+RE_XHTML = re.compile(r'/>|="(checked|selected|multiple)"')
 
 
 class TemplatePreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
@@ -9,6 +18,23 @@ class TemplatePreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
     def assert_render_equal(self, template, expected, **kwargs):
         assert_template_equal(template, expected, **kwargs)
 
+    def assert_lazy_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.template import WidgetExtension
+        from wheezy.html.utils import resolve_choices
+
+        assert_template_equal(
+            template,
+            expected,
+            widget_extension=WidgetExtension(lazy=True),
+            global_vars={"resolve_choices": resolve_choices},
+            **kwargs,
+        )
+
+    def test_lazy_choices(self):
+        """choices given as a callable in lazy mode."""
+        self.assert_render_equal = self.assert_lazy_render_equal
+        super(TemplatePreprocessorTestCase, self).test_lazy_choices()
+
     HIDDEN = "@model.pref.hidden()!h"
     MULTIPLE_HIDDEN = "@model.prefs.multiple_hidden()"
     LABEL = "@model.username.label('<i>*</i>Username:')"
@@ -29,6 +55,164 @@ class TemplatePreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
     GENERAL_WARNING = "@message.warning()"
 
 
+class TemplateSharedPreprocessorTestCase(TemplatePreprocessorTestCase):
+    """Test the ``WheezyPreprocessor`` in shared mode."""
+
+    # shared helpers resolve lazy choices
+    test_lazy_choices = PreprocessorMixin.test_lazy_choices
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.template import WidgetExtension
+        from wheezy.html.utils import shared_widgets
+
+        assert_template_equal(
+            template,
+            expected,
+            widget_extension=WidgetExtension(shared=True),
+            global_vars=shared_widgets,
+            **kwargs,
+        )
+
+    def test_filter(self):
+        """Widgets with a filter other than escape are not shared."""
+        from wheezy.html.ext.template import WidgetExtension
+        from wheezy.html.utils import shared_widgets
+
+        self.m.scm = "hg"
+        assert_template_equal(
+            self.DROPDOWN + "!upper",
+            '<select id="scm" name="scm">'
+            '<option value="GIT">GIT</option>'
+            '<option value="HG" selected="selected">MERCURIAL</option>'
+            '<option value="SVN">SVN</option>'
+            "</select>",
+            widget_extension=WidgetExtension(shared=True),
+            global_vars=dict(shared_widgets, upper=str.upper),
+            model=self.m,
+            errors=self.e,
+            message="",
+            scm=self.scm,
+        )
+
+
+class TemplateFragmentsPreprocessorTestCase(TemplatePreprocessorTestCase):
+    """Test the ``WheezyPreprocessor`` in fragments mode."""
+
+    # shared helpers resolve lazy choices
+    test_lazy_choices = PreprocessorMixin.test_lazy_choices
+
+    scm = tuple(PreprocessorMixin.scm)
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.template import WidgetExtension
+        from wheezy.html.utils import shared_widgets
+
+        assert_template_equal(
+            template,
+            expected,
+            widget_extension=WidgetExtension(fragments=True),
+            global_vars=shared_widgets,
+            **kwargs,
+        )
+
+
+class TemplateTimingPreprocessorTestCase(TemplatePreprocessorTestCase):
+    """Test the ``WheezyPreprocessor`` in timing mode."""
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.template import WidgetExtension
+        from wheezy.html.utils import shared_widgets, widget_timing
+
+        with widget_timing() as timings:
+            assert_template_equal(
+                template,
+                expected,
+                widget_extension=WidgetExtension(timing=True),
+                global_vars=shared_widgets,
+                **kwargs,
+            )
+        assert [2] == [k[1] for k in timings.durations]
+
+    def test_templates(self):
+        """Widgets of templates that share a line are timed apart."""
+        from wheezy.html.ext.template import WidgetExtension
+        from wheezy.html.utils import shared_widgets, widget_timing
+
+        self.m.username = "x"
+        with widget_timing() as timings:
+            for text in (self.TEXTBOX, "@model.username.textbox()") * 2:
+                assert_template_equal(
+                    text,
+                    None,
+                    widget_extension=WidgetExtension(timing=True),
+                    global_vars=shared_widgets,
+                    parse=lambda value: None,
+                    model=self.m,
+                    errors=self.e,
+                    message="",
+                    scm=self.scm,
+                )
+        assert [[2], [2]] == [v[:1] for v in timings.durations.values()]
+        assert [2, 2] == [k[1] for k in timings.durations]
+
+
+class TemplateHTML5PreprocessorTestCase(TemplatePreprocessorTestCase):
+    """Test the ``WheezyPreprocessor`` in HTML5 mode, markup is
+    parsed the same as XHTML.
+    """
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.template import WidgetExtension
+
+        assert_template_equal(
+            template,
+            expected,
+            widget_extension=WidgetExtension(html5=True),
+            parse=html_events,
+            **kwargs,
+        )
+
+
+class TemplateSharedHTML5PreprocessorTestCase(TemplatePreprocessorTestCase):
+    """Test the ``WheezyPreprocessor`` in shared and HTML5 modes, shared
+    helpers render HTML5 markup.
+    """
+
+    # shared helpers resolve lazy choices
+    test_lazy_choices = PreprocessorMixin.test_lazy_choices
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.template import WidgetExtension
+        from wheezy.html.utils import shared_widgets
+
+        value = assert_template_equal(
+            template,
+            expected,
+            widget_extension=WidgetExtension(html5=True, shared=True),
+            global_vars=shared_widgets,
+            parse=html_events,
+            **kwargs,
+        )
+        assert not value or not RE_XHTML.search(value)
+
+
+class WidgetExtensionLazyTestCase(unittest.TestCase):
+    """Test the ``WidgetExtension`` lazy mode."""
+
+    def test_off(self):
+        """Choices are iterated as is, without a helper global."""
+        self.assertRaises(
+            TypeError,
+            assert_template_equal,
+            "@model.scm.dropdown(choices=scm)",
+            "",
+            model=PreprocessorMixin.Dummy(),
+            errors={},
+            message="",
+            scm=lambda: [],
+        )
+
+
 class WheezyWhitespaceExtensionTestCase(unittest.TestCase):
     """Test the ``WhitespaceExtension``."""
 
@@ -73,6 +257,34 @@ class WheezyWhitespaceExtensionTestCase(unittest.TestCase):
         assert tokens == [("1", "markup", "a")]
 
 
+class HtmlMinifyExtensionTestCase(unittest.TestCase):
+    """Test the ``HtmlMinifyExtension``."""
+
+    def test_render(self):
+        """Markup tokens are minified, markup state is carried over
+        code tokens.
+        """
+        from wheezy.html.ext.template import HtmlMinifyExtension
+
+        assert_template_equal(
+            '<ul  class="list">\n'
+            "    <!-- items -->\n"
+            "    @for key, text in scm:\n"
+            '    <li  id="@key" class="item" >  @text  </li>\n'
+            "    @end\n"
+            "</ul>",
+            "<ul class=list>\n\n"
+            ' <li id="git" class=item> Git </li>\n'
+            ' <li id="hg" class=item> Mercurial </li>\n'
+            "</ul>",
+            widget_extension=HtmlMinifyExtension(),
+            model=None,
+            errors=None,
+            message=None,
+            scm=[("git", "Git"), ("hg", "Mercurial")],
+        )
+
+
 class InlineExtensionTestCase(unittest.TestCase):
     """Test the ``InlineExtension``."""
 
@@ -91,6 +303,34 @@ class InlineExtensionTestCase(unittest.TestCase):
             '@inline("LICENSE")', fallback=True
         )
 
+    def test_inline_params(self):
+        """Parameters are substituted even if fallback is set."""
+        from wheezy.html.ext.template import InlineExtension
+
+        p = InlineExtension(searchpath=[], fallback=True).preprocessors[0]
+        p.read = lambda path: "<h1>@title</h1>@title.@title!h @title.x @x"
+        assert "<h1>Sign in</h1>Sign in.Sign in @title.x @x" == p(
+            '@inline("h.html", title="Sign in")'
+        )
+
+    def test_inline_params_filters(self):
+        """Filters of placeholders are applied to parameters."""
+        from wheezy.html.ext.template import InlineExtension
+
+        p = InlineExtension(searchpath=[]).preprocessors[0]
+        p.read = lambda path: "@x!h @x!s!h."
+        assert "&lt;b&gt; &lt;b&gt;." == p('@inline("a.html", x="<b>")')
+        p.read = lambda path: "@x!u"
+        self.assertRaises(ValueError, p, '@inline("b.html", x="b")')
+
+    def test_inline_loader(self):
+        from wheezy.html.ext.loader import DictLoader
+        from wheezy.html.ext.template import InlineExtension
+
+        loader = DictLoader({"a.html": '[@inline("b.html")]', "b.html": "b"})
+        p = InlineExtension(loader=loader).preprocessors[0]
+        assert "x[b]" == p('x@inline("/a.html")')
+
     def test_inline_not_found(self):
         import warnings
 
@@ -99,6 +339,43 @@ class InlineExtensionTestCase(unittest.TestCase):
         warnings.simplefilter("default")
 
 
+class WidgetExtensionLocalizeTestCase(unittest.TestCase):
+    """Test the ``WidgetExtension`` with translations."""
+
+    def test_label(self):
+        from wheezy.html.ext.template import WidgetExtension
+
+        t = Translations({"Username:": "Nom d'utilisateur :"})
+        assert_template_equal(
+            "@model.username.label(_('Username:'))",
+            '<label for="username">Nom d\'utilisateur :</label>',
+            widget_extension=WidgetExtension(t),
+            model=None,
+            errors={},
+            message="",
+            scm=[],
+        )
+
+
+class BundleLoaderTestCase(BundleLoaderMixin, unittest.TestCase):
+    """Test the ``BundleLoader``."""
+
+    def assert_render_equal(self, expected, **kwargs):
+        from wheezy.html.ext.template import BundleLoader, WheezyPreprocessor
+
+        b = self.bundle(
+            {
+                "x.html": "@require(model, errors)\n"
+                "@model.remember_me.checkbox()"
+            },
+            [WheezyPreprocessor()],
+        )
+        loader = BundleLoader(b)
+        assert ("x.html",) == loader.list_names()
+        assert loader.load("y.html") is None
+        assert_bundle_equal(loader, "x.html", expected, **kwargs)
+
+
 try:
     from wheezy.template.engine import Engine
     from wheezy.template.ext.core import CoreExtension
@@ -107,18 +384,38 @@ try:
     from wheezy.html.ext.template import WidgetExtension
     from wheezy.html.utils import html_escape
 
-    def assert_template_equal(text, expected, **kwargs):
+    def assert_template_equal(
+        text,
+        expected,
+        widget_extension=None,
+        parse=str,
+        global_vars=None,
+        **kwargs,
+    ):
         engine = Engine(
             loader=DictLoader(
                 {"x": "@require(model, errors, message, scm)\n" + text}
             ),
-            extensions=[CoreExtension(), WidgetExtension()],
+            extensions=[
+                CoreExtension(),
+                widget_extension or WidgetExtension(),
+            ],
         )
         engine.global_vars.update({"h": html_escape})
+        engine.global_vars.update(global_vars or {})
         value = engine.render("x", kwargs, {}, {})
+        assert parse(expected) == parse(value)
+        return value
+
+    def assert_bundle_equal(loader, name, expected, **kwargs):
+        engine = Engine(loader=loader, extensions=[CoreExtension()])
+        value = engine.render(name, kwargs, {}, {})
         assert expected == value
 
 except ImportError:  # pragma: nocover
 
     def assert_template_equal(text, expected, **kwargs):  # noqa
         pass
+
+    def assert_bundle_equal(loader, name, expected, **kwargs):  # noqa
+        pass
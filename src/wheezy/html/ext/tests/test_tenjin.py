@@ -1,6 +1,7 @@
 import unittest
 
-from wheezy.html.ext.tests.test_lexer import PreprocessorMixin
+from wheezy.html.ext.tests.test_bundle import BundleLoaderMixin
+from wheezy.html.ext.tests.test_lexer import PreprocessorMixin, html_events
 
 
 class TenjinPreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
@@ -31,6 +32,84 @@ class TenjinPreprocessorTestCase(PreprocessorMixin, unittest.TestCase):
     GENERAL_WARNING = "${message.warning()}"
 
 
+class TenjinSharedPreprocessorTestCase(TenjinPreprocessorTestCase):
+    """Test the ``TenjinPreprocessor`` in shared mode."""
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.tenjin import TenjinPreprocessor
+        from wheezy.html.utils import shared_widgets
+
+        kwargs.update(shared_widgets)
+        assert_tenjin_equal(
+            template,
+            expected,
+            preprocessor=TenjinPreprocessor(shared=True),
+            **kwargs,
+        )
+
+    def test_filter(self):
+        """Tenjin expressions have no filters, values of widgets in
+        both ${...} and #{...} are escaped by shared helpers.
+        """
+        from wheezy.html.ext.tenjin import TenjinPreprocessor
+
+        p = TenjinPreprocessor(shared=True)
+        for w in (self.DROPDOWN, self.DROPDOWN.replace("#", "$")):
+            assert "widget_select(" in p(w)
+
+
+class TenjinFragmentsPreprocessorTestCase(TenjinPreprocessorTestCase):
+    """Test the ``TenjinPreprocessor`` in fragments mode."""
+
+    scm = tuple(PreprocessorMixin.scm)
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.tenjin import TenjinPreprocessor
+        from wheezy.html.utils import shared_widgets
+
+        kwargs.update(shared_widgets)
+        assert_tenjin_equal(
+            template,
+            expected,
+            preprocessor=TenjinPreprocessor(fragments=True),
+            **kwargs,
+        )
+
+
+class TenjinTimingPreprocessorTestCase(TenjinPreprocessorTestCase):
+    """Test the ``TenjinPreprocessor`` in timing mode."""
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.tenjin import TenjinPreprocessor
+        from wheezy.html.utils import widget_timing
+
+        with widget_timing() as timings:
+            assert_tenjin_equal(
+                template,
+                expected,
+                preprocessor=TenjinPreprocessor(timing=True),
+                **kwargs,
+            )
+        assert 1 == len(timings.durations)
+
+
+class TenjinHTML5PreprocessorTestCase(TenjinPreprocessorTestCase):
+    """Test the ``TenjinPreprocessor`` in HTML5 mode, markup is
+    parsed the same as XHTML.
+    """
+
+    def assert_render_equal(self, template, expected, **kwargs):
+        from wheezy.html.ext.tenjin import TenjinPreprocessor
+
+        assert_tenjin_equal(
+            template,
+            expected,
+            preprocessor=TenjinPreprocessor(html5=True),
+            parse=html_events,
+            **kwargs,
+        )
+
+
 class TenjinWhitespacePreprocessorTestCase(unittest.TestCase):
     """Test the ``whitespace_preprocessor``."""
 
@@ -48,6 +127,29 @@ class TenjinWhitespacePreprocessorTestCase(unittest.TestCase):
         assert "?> <?" == whitespace_preprocessor("  ?> <? ")
 
 
+class TenjinMinifyPreprocessorTestCase(unittest.TestCase):
+    """Test the ``minify_preprocessor``."""
+
+    def test_render(self):
+        """Directives are copied as is."""
+        from wheezy.html.ext.tenjin import minify_preprocessor
+
+        assert_tenjin_equal(
+            '<ul  class="list">\n'
+            "    <!-- items -->\n"
+            "    <?py for key, text in scm: ?>\n"
+            '    <li  id="${key}" class="item" >  #{text}  </li>\n'
+            "    <?py #endfor ?>\n"
+            "</ul>",
+            "<ul class=list>\n\n"
+            '<li id="git" class=item> Git </li>\n'
+            '<li id="hg" class=item> Mercurial </li>\n'
+            "</ul>",
+            preprocessor=minify_preprocessor,
+            scm=[("git", "Git"), ("hg", "Mercurial")],
+        )
+
+
 class InlinePreprocessorTestCase(unittest.TestCase):
     """Test the ``inline_preprocessor``."""
 
@@ -65,6 +167,24 @@ class InlinePreprocessorTestCase(unittest.TestCase):
             '<?py inline("LICENSE") ?>', fallback=True
         )
 
+    def test_inline_params(self):
+        """Parameters are substituted even if fallback is set."""
+        from wheezy.html.ext.tenjin import inline_preprocessor
+
+        p = inline_preprocessor(directories=[], fallback=True)
+        p.read = lambda path: "<h1>${title}</h1>#{ title }${title()}"
+        assert "<h1>Sign in</h1>Sign in${title()}" == p(
+            '<?py inline("h.html", title="Sign in") ?>'
+        )
+
+    def test_inline_params_filters(self):
+        """Parameters of escaping placeholders are escaped."""
+        from wheezy.html.ext.tenjin import inline_preprocessor
+
+        p = inline_preprocessor(directories=[])
+        p.read = lambda path: "${x}#{x}"
+        assert "&lt;b&gt;<b>" == p('<?py inline("a.html", x="<b>") ?>')
+
     def test_inline_not_found(self):
         import warnings
 
@@ -73,6 +193,24 @@ class InlinePreprocessorTestCase(unittest.TestCase):
         warnings.simplefilter("default")
 
 
+class BundleLoaderTestCase(BundleLoaderMixin, unittest.TestCase):
+    """Test the ``BundleLoader``."""
+
+    def assert_render_equal(self, expected, **kwargs):
+        from wheezy.html.ext.tenjin import BundleLoader, widget_preprocessor
+
+        b = self.bundle(
+            {"t/x.pyhtml": "#{model.remember_me.checkbox()}"},
+            [widget_preprocessor],
+        )
+        loader = BundleLoader(b)
+        assert "t/x.pyhtml" == loader.find("x.pyhtml", ["t"])
+        assert "t/x.pyhtml" == loader.find("t/x.pyhtml")
+        assert loader.find("y.pyhtml") is None
+        assert loader.load("y.pyhtml") is None
+        assert_bundle_equal(loader, ["t"], "x.pyhtml", expected, **kwargs)
+
+
 try:
     # from tenjin import Template
     Template = __import__("tenjin", None, None, ["Template"]).Template
@@ -81,12 +219,23 @@ try:
     assert escape, to_str
     from wheezy.html.ext.tenjin import widget_preprocessor
 
-    def assert_tenjin_equal(text, expected, **kwargs):
-        template = Template(input=widget_preprocessor(text))
+    def assert_tenjin_equal(
+        text, expected, preprocessor=None, parse=str, **kwargs
+    ):
+        template = Template(input=(preprocessor or widget_preprocessor)(text))
         value = template.render(kwargs)
-        assert expected == value
+        assert parse(expected) == parse(value)
+
+    def assert_bundle_equal(loader, path, name, expected, **kwargs):
+        from tenjin import Engine, MemoryCacheStorage
+
+        engine = Engine(path=path, loader=loader, cache=MemoryCacheStorage())
+        assert expected == engine.render(name, kwargs)
 
 except ImportError:  # pragma: nocover
 
     def assert_tenjin_equal(text, expected, **kwargs):  # noqa
         pass
+
+    def assert_bundle_equal(loader, path, name, expected, **kwargs):  # noqa
+        pass
@@ -0,0 +1,65 @@
+import gc
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class ListTemplatesTestCase(unittest.TestCase):
+    """Test the ``list_templates``."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name in ["a.html", "b/c.html", "b/d.txt"]:
+            path = os.path.join(self.dir, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(name)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_list(self):
+        from wheezy.html.ext.warmup import list_templates
+
+        assert ["a.html", "b/c.html", "b/d.txt"] == list_templates(
+            [self.dir, self.dir]
+        )
+        assert ["a.html", "b/c.html"] == list_templates([self.dir], [".html"])
+
+
+class WarmUpTestCase(unittest.TestCase):
+    """Test the ``warm_up``."""
+
+    def get_template(self, name):
+        if name == "x.html":
+            raise LookupError(name)
+        return name.upper()
+
+    def test_sequential(self):
+        from wheezy.html.ext.warmup import warm_up
+
+        report = warm_up(self.get_template, ["a.html", "x.html"], freeze=False)
+        assert {"a.html": "A.HTML"} == report.templates
+        assert ["x.html"] == list(report.errors)
+        assert ["list", "compile"] == [p["name"] for p in report.phases]
+        summary = report.summary()
+        assert "templates: 1, errors: 1" in summary
+        assert "error x.html: x.html" in summary
+
+    def test_workers_freeze(self):
+        from wheezy.html.ext.warmup import warm_up
+
+        names = ["t%d.html" % i for i in range(10)]
+        try:
+            report = warm_up(self.get_template, names, workers=4)
+            assert gc.get_freeze_count() > 0
+        finally:
+            gc.unfreeze()
+        assert 10 == len(report.templates)
+        assert ["list", "compile", "freeze"] == [
+            p["name"] for p in report.phases
+        ]
+        for p in report.phases:
+            assert p["duration"] >= 0
+            assert p["objects"] > 0
@@ -0,0 +1,145 @@
+"""Warm up of templates in a prefork server master process.
+
+Templates are preprocessed and compiled lazily, on the first request
+to each worker. :py:func:`warm_up` loads templates through an engine
+loader before workers are forked, so workers start with compiled
+templates, and then freezes garbage collector tracked objects with
+``gc.freeze()``, so the garbage collector of a worker does not touch
+(and copy on write) memory pages shared with the master::
+
+    from wheezy.html.ext.warmup import list_templates, warm_up
+
+    # Jinja2
+    report = warm_up(env.get_template, env.list_templates())
+    # wheezy.template
+    report = warm_up(engine.get_template, engine.loader.list_names())
+    # Mako
+    report = warm_up(lookup.get_template, list_templates(directories))
+    # Tenjin
+    report = warm_up(engine.get_template, list_templates(engine.path))
+
+    print(report.summary())
+
+Engines keep compiled templates in their own caches, so the cache
+must be large enough to hold all templates.
+"""
+
+import gc
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+
+def list_templates(directories, extensions=None):
+    """Returns sorted names, relative paths with ``/`` separator, of
+    files found in ``directories``. If ``extensions`` are specified,
+    e.g. ``(".html",)``, other files are skipped.
+    """
+    names = set()
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for filename in files:
+                if extensions and not filename.endswith(tuple(extensions)):
+                    continue
+                path = os.path.relpath(os.path.join(root, filename), directory)
+                names.add(path.replace(os.sep, "/"))
+    return sorted(names)
+
+
+def memory_usage():
+    """Returns resident set size of the process in bytes or ``None``
+    if it is not available (it is read from ``/proc``).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):  # pragma: nocover
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class WarmUpReport(object):
+    """Result of :py:func:`warm_up`: loaded ``templates`` and
+    ``errors`` by name, and ``phases``, a list of dictionaries with
+    phase name, duration in seconds, resident set size in bytes and
+    the number of objects tracked by the garbage collector, frozen
+    ones included.
+    """
+
+    def __init__(self):
+        self.templates = {}
+        self.errors = {}
+        self.phases = []
+        self.start = perf_counter()
+
+    def phase(self, name):
+        end = perf_counter()
+        self.phases.append(
+            {
+                "name": name,
+                "duration": end - self.start,
+                "rss": memory_usage(),
+                "objects": len(gc.get_objects()) + gc.get_freeze_count(),
+            }
+        )
+        self.start = end
+
+    def summary(self):
+        lines = [
+            "templates: %d, errors: %d"
+            % (len(self.templates), len(self.errors))
+        ]
+        for p in self.phases:
+            rss = p["rss"]
+            lines.append(
+                "%-8s %10.2f ms %10s %10d objects"
+                % (
+                    p["name"],
+                    p["duration"] * 1000,
+                    "%.1f MB" % (rss / 1048576.0) if rss else "n/a",
+                    p["objects"],
+                )
+            )
+        for name in sorted(self.errors):
+            lines.append("error %s: %s" % (name, self.errors[name]))
+        return "\n".join(lines)
+
+
+def load(get_template, name):
+    try:
+        return name, get_template(name), None
+    except Exception as e:
+        return name, None, e
+
+
+def warm_up(get_template, names, workers=None, freeze=True):
+    """Loads templates ``names`` with ``get_template`` (an engine
+    method that preprocesses, compiles and caches a template) and
+    returns :py:class:`WarmUpReport`. A template that fails to load
+    is reported in errors and does not stop the warm up.
+
+    Templates are loaded in a thread pool of ``workers`` threads if
+    specified, the engine must be thread safe. If ``freeze`` is
+    ``True`` objects tracked by the garbage collector are moved to the
+    permanent generation after a full collection.
+    """
+    report = WarmUpReport()
+    names = list(names)
+    report.phase("list")
+    if workers:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda n: load(get_template, n), names))
+    else:
+        results = [load(get_template, name) for name in names]
+    for name, template, error in results:
+        if error is None:
+            report.templates[name] = template
+        else:
+            report.errors[name] = error
+    report.phase("compile")
+    if freeze:
+        gc.collect()
+        gc.freeze()
+        report.phase("freeze")
+    return report
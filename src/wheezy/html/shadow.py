@@ -0,0 +1,27 @@
+"""Minimal stand-in for ``cython`` pure Python mode names, used when
+Cython is not installed. Compiled modules never import it.
+
+>>> @cfunc
+... @locals(i=Py_ssize_t)
+... def f(i):
+...     return i + 1
+>>> f(1), compiled
+(2, False)
+"""
+
+compiled = False
+
+Py_ssize_t = int
+bint = bool
+
+
+def cfunc(func):
+    return func
+
+
+def inline(func):
+    return func
+
+
+def locals(**types):
+    return lambda func: func
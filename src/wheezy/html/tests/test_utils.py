@@ -17,6 +17,49 @@ class EscapeHTMLMixin:
     def test_type_error(self):
         self.assertRaises(TypeError, lambda: self.escape(1))
 
+    def test_hook(self):
+        from wheezy.html.utils import set_escape_hook
+
+        calls = []
+        set_escape_hook(lambda i, o: calls.append((i, o)))
+        try:
+            self.escape("a<b")
+            self.escape("ab")
+        finally:
+            set_escape_hook(None)
+        self.escape("x")
+        assert [(3, 6), (2, 2)] == calls
+
+    def test_hook_sample_rate(self):
+        from wheezy.html.utils import set_escape_hook
+
+        calls = []
+        set_escape_hook(lambda i, o: calls.append(i), 2)
+        try:
+            for s in ["a", "bb", "ccc", "dddd", "eeeee"]:
+                self.escape(s)
+        finally:
+            set_escape_hook(None)
+        assert [2, 4] == calls
+
+    def test_stats(self):
+        from wheezy.html.utils import (
+            disable_escape_stats,
+            enable_escape_stats,
+        )
+
+        stats = enable_escape_stats()
+        try:
+            self.escape("<>")
+            self.escape("abc")
+        finally:
+            disable_escape_stats()
+        s = stats.snapshot()
+        assert 2 == s["calls"]
+        assert 1 == s["unchanged"]
+        assert 5 == s["bytes_in"]
+        assert 11 == s["bytes_out"]
+
 
 class NativeEscapeHTMLTestCase(unittest.TestCase, EscapeHTMLMixin):
     def setUp(self):
@@ -34,3 +77,249 @@ try:
 
 except ImportError:  # pragma: nocover
     pass
+
+
+class ChoicesCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        from wheezy.html.utils import ChoicesCache
+
+        self.cache = ChoicesCache(maxsize=2)
+
+    def test_identity(self):
+        a = (("a", "A"),)
+        b = tuple(list(a))
+        assert self.cache(a) is self.cache(a)
+        assert self.cache(a) is not self.cache(b)
+        s = self.cache.snapshot()
+        assert 2 == s["hits"]
+        assert 2 == s["misses"]
+
+    def test_evict(self):
+        choices = [((str(i), "X"),) for i in range(3)]
+        for c in choices:
+            self.cache(c)
+        self.cache(choices[0])
+        s = self.cache.snapshot()
+        assert 0 == s["hits"]
+        assert 4 == s["misses"]
+        assert 2 == s["size"]
+        self.cache.clear()
+        assert 0 == self.cache.snapshot()["size"]
+
+    def test_uncached(self):
+        self.cache([("a", "<A>")])
+        self.cache((["a", "<A>"],))
+        assert [("a", "a", "&lt;A&gt;")] == self.cache((("a", "<A>"),))
+        s = self.cache.snapshot()
+        assert 2 == s["uncached"]
+        assert 1 == s["misses"]
+        self.cache.reset()
+        assert 0 == self.cache.snapshot()["uncached"]
+
+    def test_lazy(self):
+        from wheezy.html.utils import LazyChoices
+
+        choices = (("a", "A"),)
+        lazy = LazyChoices(lambda: choices)
+        assert self.cache(choices) is self.cache(lazy)
+
+    def test_shared_widgets(self):
+        from wheezy.html.utils import choices_cache, widget_radio
+
+        choices = (("git", "Git"), ("hg", "<Hg>"))
+        hits = choices_cache.snapshot()["hits"]
+        for _ in range(2):
+            assert (
+                '<label><input type="radio" name="scm" value="git" />'
+                "Git</label>"
+                '<label><input type="radio" name="scm" value="hg" '
+                'checked="checked" />&lt;Hg&gt;</label>'
+            ) == widget_radio("scm", "scm", "hg", choices)
+        assert hits + 1 == choices_cache.snapshot()["hits"]
+
+
+class OptionsBlockTestCase(unittest.TestCase):
+    def render(self, value, multiple=False):
+        from wheezy.html.utils import widget_options
+
+        return widget_options(value, self.choices, multiple)
+
+    def setUp(self):
+        self.choices = [(1, "a"), (2, "b"), (1, "c")]
+
+    def test_select(self):
+        assert (
+            '<option value="1" selected="selected">a</option>'
+            '<option value="2">b</option>'
+            '<option value="1" selected="selected">c</option>'
+        ) == self.render(1)
+        assert "selected" not in self.render(3)
+        assert "selected" not in self.render([1])
+
+    def test_multiple(self):
+        assert (
+            '<option value="1">a</option>'
+            '<option value="2" selected="selected">b</option>'
+            '<option value="1">c</option>'
+        ) == self.render([2, 3], True)
+        assert 3 == self.render((1, 2), True).count('" selected="selected"')
+
+    def test_unhashable_keys(self):
+        self.choices = [([1], "a"), ([2], "b")]
+        assert (
+            '<option value="[1]">a</option>'
+            '<option value="[2]" selected="selected">b</option>'
+        ) == self.render([2])
+
+    def test_render_scope(self):
+        from wheezy.html.utils import options_cache, render_scope
+
+        options_cache.reset()
+        with render_scope():
+            for value in range(3):
+                self.render(value)
+        with render_scope():
+            self.render(0)
+        assert 2 == options_cache.snapshot()["uncached"]
+
+    def test_cached(self):
+        from wheezy.html.utils import options_block
+
+        self.choices = tuple(self.choices)
+        assert options_block(self.choices) is options_block(self.choices)
+
+
+class GatherContextTestCase(unittest.TestCase):
+    def test_concurrent(self):
+        import asyncio
+
+        from wheezy.html.utils import gather_context
+
+        started = []
+
+        async def load(name):
+            started.append(name)
+            await asyncio.sleep(0)
+            return [(name, str(len(started)))]
+
+        async def main():
+            ctx = {
+                "a": load("a"),
+                "b": asyncio.ensure_future(load("b")),
+                "c": [("c", "C")],
+            }
+            return await gather_context(ctx, ["a", "b", "c", "d"])
+
+        assert {
+            "a": [("a", "2")],
+            "b": [("b", "2")],
+            "c": [("c", "C")],
+        } == asyncio.run(main())
+
+
+class FragmentCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        from wheezy.html.utils import FragmentCache
+
+        self.now = 0
+        self.cache = FragmentCache(maxsize=2, ttl=10, timer=lambda: self.now)
+
+    def test_ttl(self):
+        self.cache.set("a", "<a>")
+        self.now = 9
+        assert "<a>" == self.cache.get("a")
+        self.now = 10
+        assert self.cache.get("a") is None
+        s = self.cache.snapshot()
+        assert 1 == s["expired"]
+        assert 0 == s["size"]
+
+    def test_lru(self):
+        self.cache.set("a", "<a>")
+        self.cache.set("b", "<b>")
+        self.cache.get("a")
+        self.cache.set("c", "<c>")
+        assert self.cache.get("b") is None
+        assert "<a>" == self.cache.get("a")
+        assert 1 == self.cache.snapshot()["evictions"]
+        self.cache.clear()
+        self.cache.reset()
+        assert {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "uncached": 0,
+            "size": 0,
+            "maxsize": 2,
+        } == self.cache.snapshot()
+
+    def test_no_ttl(self):
+        self.cache.ttl = None
+        self.cache.set("a", "<a>")
+        self.now = 1000
+        assert "<a>" == self.cache.get("a")
+
+
+class WidgetFragmentTestCase(unittest.TestCase):
+    def setUp(self):
+        from wheezy.html.utils import fragment_cache
+
+        fragment_cache.clear()
+        fragment_cache.reset()
+        self.choices = (("git", "Git"), ("hg", "Hg"))
+
+    def render(self, value, error=None):
+        from wheezy.html.utils import widget_fragment, widget_multiple_select
+
+        return widget_fragment(
+            widget_multiple_select,
+            "scm",
+            "scm",
+            value,
+            self.choices,
+            "",
+            "",
+            error,
+        )
+
+    def test_key(self):
+        from wheezy.html.utils import fragment_cache
+
+        a = self.render(["hg"])
+        assert a is self.render(["hg"])
+        assert a != self.render(["git"])
+        assert 'class="error"' in self.render(["hg"], {"scm": "x"})
+        s = fragment_cache.snapshot()
+        assert 1 == s["hits"]
+        assert 3 == s["misses"]
+
+    def test_uncached(self):
+        from wheezy.html.utils import fragment_cache
+
+        self.choices = list(self.choices)
+        self.render(["hg"])
+        self.choices = (("git", "Git"), ("hg", "Hg"))
+        self.render([["hg"]])
+        assert 2 == fragment_cache.snapshot()["uncached"]
+
+    def test_choices_identity(self):
+        """Choices are keyed by identity, not hashed per render."""
+        from wheezy.html.utils import fragment_cache
+
+        hashed = []
+
+        class Key(str):
+            def __hash__(self):
+                hashed.append(self)
+                return str.__hash__(self)
+
+        self.choices = ((Key("git"), "Git"), (Key("hg"), "Hg"))
+        a = self.render(["hg"])
+        del hashed[:]
+        assert a is self.render(["hg"])
+        assert not hashed
+        self.choices = (("git", "Git"), ("hg", "Hg"))
+        assert a == self.render(["hg"])
+        s = fragment_cache.snapshot()
+        assert (1, 2, 2) == (s["hits"], s["misses"], s["size"])
@@ -1,4 +1,17 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import date, datetime
+from itertools import count
+from threading import Lock
+from time import monotonic, perf_counter_ns
+
+try:
+    import cython
+except ImportError:  # pragma: nocover
+    from wheezy.html import shadow as cython
+
+escape_hook = None
 
 
 def escape_html(s):
@@ -15,7 +28,7 @@ def escape_html(s):
     if s is None:
         return ""
     try:
-        return (
+        result = (
             s.replace("&", "&amp;")
             .replace("<", "&lt;")
             .replace(">", "&gt;")
@@ -26,22 +39,842 @@ def escape_html(s):
             "expected string or unicode object, "
             "%s found" % s.__class__.__name__
         )
+    if escape_hook is not None:
+        escape_hook(len(s), len(result))
+    return result
 
 
 escape_html_native = escape_html
 
 try:
-    from wheezy.html.boost import escape_html
+    from wheezy.html.boost import (
+        escape_html,
+        set_escape_hook as boost_set_escape_hook,
+    )
 
     html_escape = escape_html  # pragma: nocover
 except ImportError:  # pragma: nocover
+    boost_set_escape_hook = None
     html_escape = escape_html
 
 
+def set_escape_hook(hook, sample_rate=1):
+    """Sets ``hook(size_in, size_out)`` to be called for 1 in
+    ``sample_rate`` calls of html escape, both C and Python
+    implementations. Pass ``None`` to disable.
+
+    Takes effect immediately, templates that already hold a
+    reference to ``html_escape`` need not be reloaded.
+    """
+    global escape_hook
+    if sample_rate < 1:
+        raise ValueError("sample rate must be >= 1")
+    if boost_set_escape_hook is not None:  # pragma: nocover
+        boost_set_escape_hook(hook, sample_rate)
+    if hook is not None and sample_rate > 1:
+        hook = sample_hook(hook, sample_rate)
+    escape_hook = hook
+
+
+def sample_hook(hook, sample_rate):
+    """Returns a hook that forwards 1 in ``sample_rate`` calls.
+
+    >>> calls = []
+    >>> h = sample_hook(lambda i, o: calls.append(i), 3)
+    >>> for i in range(7):
+    ...     h(i, i)
+    >>> calls
+    [2, 5]
+    """
+    counter = count(1)
+
+    def sampled(size_in, size_out):
+        if next(counter) % sample_rate == 0:
+            hook(size_in, size_out)
+
+    return sampled
+
+
+class EscapeStats(object):
+    """Thread-safe html escape statistics. Sampled calls are scaled
+    by ``sample_rate``.
+
+    >>> stats = EscapeStats(sample_rate=2)
+    >>> stats.record(3, 3)
+    >>> stats.record(5, 9)
+    >>> s = stats.snapshot()
+    >>> s['calls'], s['bytes_in'], s['bytes_out'], s['unchanged']
+    (4, 16, 24, 2)
+    >>> s['unchanged_ratio']
+    0.5
+    >>> sorted(s['histogram'].items())
+    [(4, 2), (8, 2)]
+    """
+
+    def __init__(self, sample_rate=1):
+        self.sample_rate = sample_rate
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.unchanged = 0
+        self.histogram = {}
+
+    def record(self, size_in, size_out):
+        """Records a sampled call. The length histogram is keyed by
+        the power of two exclusive upper bound of input size.
+        """
+        n = self.sample_rate
+        bucket = 1 << size_in.bit_length()
+        with self.lock:
+            self.calls += n
+            self.bytes_in += size_in * n
+            self.bytes_out += size_out * n
+            if size_in == size_out:
+                self.unchanged += n
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + n
+
+    def snapshot(self):
+        """Returns a copy of statistics."""
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "unchanged": self.unchanged,
+                "unchanged_ratio": (
+                    self.calls and float(self.unchanged) / self.calls
+                ),
+                "histogram": dict(self.histogram),
+            }
+
+
+def enable_escape_stats(sample_rate=1):
+    """Starts collecting html escape statistics for 1 in
+    ``sample_rate`` calls. Returns :py:class:`EscapeStats`.
+    """
+    stats = EscapeStats(sample_rate)
+    set_escape_hook(stats.record, sample_rate)
+    return stats
+
+
+def disable_escape_stats():
+    """Stops collecting html escape statistics."""
+    set_escape_hook(None)
+
+
 def html_id(name):
     return name.replace("_", "-")
 
 
+# region: choices
+
+
+class LazyChoices(object):
+    """Choices loaded by ``factory``, a zero-argument callable, on
+    first use and at most once. Pass it to widgets instead of a list
+    of ``(key, text)`` pairs when choices are expensive to load and
+    the widget is rendered on some template branches only.
+
+    >>> calls = []
+    >>> choices = LazyChoices(lambda: calls.append(1) or [('a', 'A')])
+    >>> calls
+    []
+    >>> list(choices), choices(), calls
+    ([('a', 'A')], [('a', 'A')], [1])
+    """
+
+    __slots__ = ("factory", "value")
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.value = None
+
+    def __call__(self):
+        value = self.value
+        if value is None:
+            value = self.value = self.factory()
+        return value
+
+    def __iter__(self):
+        return iter(self())
+
+    def __len__(self):
+        return len(self())
+
+
+def resolve_choices(choices):
+    """Returns ``choices``, if it is callable returns the result of
+    the call.
+
+    >>> resolve_choices([(1, 'a')]), resolve_choices(lambda: [(2, 'b')])
+    ([(1, 'a')], [(2, 'b')])
+    """
+    return choices() if callable(choices) else choices
+
+
+def escape_choices(choices):
+    """Returns a list of ``(key, escaped_key, escaped_text)`` tuples,
+    the raw key is kept to test selected state.
+
+    >>> escape_choices([(1, 'a<b>')])
+    [(1, '1', 'a&lt;b&gt;')]
+    """
+    return [
+        (key, html_escape(str(key)), html_escape(str(text)))
+        for key, text in choices
+    ]
+
+
+class ChoicesCache(object):
+    """Bounded cache of choices transformed by ``factory``, html
+    escaped choices by default, see :py:func:`escape_choices`.
+
+    Only tuples of tuples are cached since they are immutable; a
+    cached tuple is keyed by its identity and held by the cache so
+    the identity is not reused. Choices of other types (e.g. lists)
+    are escaped on each call. The oldest entry is evicted when the
+    cache is full.
+
+    >>> cache = ChoicesCache(maxsize=1)
+    >>> choices = (('a', '<A>'),)
+    >>> cache(choices) is cache(choices)
+    True
+    >>> cache([('b', 'B')])
+    [('b', 'b', 'B')]
+    >>> s = cache.snapshot()
+    >>> s['hits'], s['misses'], s['uncached'], s['size']
+    (1, 1, 1, 1)
+    """
+
+    def __init__(self, maxsize=256, factory=escape_choices):
+        self.maxsize = maxsize
+        self.factory = factory
+        self.lock = Lock()
+        self.items = {}
+        self.reset()
+
+    def reset(self):
+        """Resets statistics."""
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __call__(self, choices):
+        choices = resolve_choices(choices)
+        entry = self.items.get(id(choices))
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        escaped = self.factory(choices)
+        if type(choices) is not tuple or not all(
+            [type(c) is tuple for c in choices]
+        ):
+            self.uncached += 1
+            return escaped
+        with self.lock:
+            self.misses += 1
+            items = self.items
+            if len(items) >= self.maxsize:
+                del items[next(iter(items))]
+            items[id(choices)] = (choices, escaped)
+        return escaped
+
+    def snapshot(self):
+        """Returns a copy of statistics. Counters are not
+        synchronized with renders and are approximate under
+        concurrency.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "size": len(self.items),
+            "maxsize": self.maxsize,
+        }
+
+
+# escaped choices used by shared widget helpers
+choices_cache = ChoicesCache()
+
+
+class OptionsBlock(object):
+    """Html options of choices rendered once, the selected marker is
+    spliced in per value.
+
+    >>> b = OptionsBlock([('a', 'A'), ('b', '<B>')])
+    >>> b.render('b', False)
+    '<option value="a">A</option>\
+<option value="b" selected="selected">&lt;B&gt;</option>'
+    >>> b.render(['a', 'b'], True).count('selected')
+    4
+    >>> b.render('a', False, True)
+    '<option value="a" selected>A</option>\
+<option value="b">&lt;B&gt;</option>'
+    >>> b.render('c', False) is b.html
+    True
+    """
+
+    __slots__ = ("html", "keys", "offsets")
+
+    def __init__(self, choices):
+        parts = []
+        keys = []
+        pos = 0
+        for key, escaped_key, text in escape_choices(choices):
+            head = '<option value="' + escaped_key + '"'
+            tail = ">" + text + "</option>"
+            pos += len(head)
+            keys.append((key, pos))
+            pos += len(tail)
+            parts.append(head)
+            parts.append(tail)
+        self.html = "".join(parts)
+        self.keys = keys
+        offsets = {}
+        try:
+            for key, pos in keys:
+                offsets.setdefault(key, []).append(pos)
+        except TypeError:
+            offsets = None
+        self.offsets = offsets
+
+    def selected(self, value, multiple):
+        """Returns offsets of selected options."""
+        if multiple:
+            return [pos for key, pos in self.keys if key in value]
+        if self.offsets is not None:
+            try:
+                return self.offsets.get(value, ())
+            except TypeError:
+                pass
+        return [pos for key, pos in self.keys if key == value]
+
+    def render(self, value, multiple, html5=False):
+        html = self.html
+        positions = self.selected(value, multiple)
+        if not positions:
+            return html
+        parts = []
+        start = 0
+        for pos in positions:
+            parts.append(html[start:pos])
+            start = pos
+        parts.append(html[start:])
+        return (html5 and " selected" or ' selected="selected"').join(parts)
+
+
+# option blocks of cacheable choices, shared by all renders
+options_cache = ChoicesCache(factory=OptionsBlock)
+# option blocks of any choices, memoized by identity in a render scope
+options_scope = ContextVar("options_scope", default=None)
+
+
+@contextmanager
+def render_scope():
+    """Memoizes html options of shared select widgets by identity of
+    choices until exit, so the same choices, e.g. a list loaded per
+    request, rendered in every row of a grid are escaped and joined
+    once. Choices must not be changed within the scope.
+
+    >>> choices = [('a', 'A'), ('b', 'B')]
+    >>> with render_scope():
+    ...     options_block(choices) is options_block(choices)
+    True
+    >>> options_block(choices) is options_block(choices)
+    False
+    """
+    token = options_scope.set({})
+    try:
+        yield
+    finally:
+        options_scope.reset(token)
+
+
+def options_block(choices):
+    """Returns :py:class:`OptionsBlock` of ``choices``."""
+    choices = resolve_choices(choices)
+    memo = options_scope.get()
+    if memo is None:
+        return options_cache(choices)
+    entry = memo.get(id(choices))
+    if entry is None:
+        entry = memo[id(choices)] = (choices, options_cache(choices))
+    return entry[1]
+
+
+async def gather_context(context, names):
+    """Awaits values of ``names`` in ``context`` that are awaitable
+    or async functions concurrently and replaces them with results.
+    Names that widgets of a template refer to are returned by
+    ``context_names`` of a widget preprocessor.
+
+    >>> import asyncio
+    >>> async def countries():
+    ...     return [('ca', 'Canada')]
+    >>> ctx = {'countries': countries, 'model': None}
+    >>> asyncio.run(gather_context(ctx, ['countries', 'model', 'x']))
+    {'countries': [('ca', 'Canada')], 'model': None}
+    """
+    from asyncio import gather
+    from inspect import isawaitable, iscoroutinefunction
+
+    pending = []
+    awaitables = []
+    for name in names:
+        value = context.get(name)
+        if iscoroutinefunction(value):
+            value = value()
+        if isawaitable(value):
+            pending.append(name)
+            awaitables.append(value)
+    if awaitables:
+        context.update(zip(pending, await gather(*awaitables)))
+    return context
+
+
+# region: shared widgets
+
+
+# checked and unchecked input endings, XHTML and HTML5
+CHECKED = (
+    (' checked="checked" />', " />"),
+    (" checked>", ">"),
+)
+
+
+def widget_class(class_, error):
+    """Returns html class attribute of a widget.
+
+    >>> widget_class('', False), widget_class('x', False)
+    ('', ' class="x"')
+    >>> widget_class('', True), widget_class('x', True)
+    (' class="error"', ' class="error x"')
+    """
+    if error:
+        return class_ and ' class="error ' + class_ + '"' or ' class="error"'
+    return class_ and ' class="' + class_ + '"' or ""
+
+
+def widget_multiple_hidden(name, value, html5=False):
+    """Multiple HTML element input of type hidden.
+
+    >>> widget_multiple_hidden('prefs', ['a', '<b>'])
+    '<input type="hidden" name="prefs" value="a" />\
+<input type="hidden" name="prefs" value="&lt;b&gt;" />'
+    >>> widget_multiple_hidden('prefs', ['a'], True)
+    '<input type=hidden name="prefs" value="a">'
+    """
+    start = (
+        html5 and '<input type=hidden name="' or '<input type="hidden" name="'
+    ) + name
+    end = html5 and '">' or '" />'
+    return "".join(
+        [start + '" value="' + html_escape(str(item)) + end for item in value]
+    )
+
+
+def widget_multiple_checkbox(
+    id_, name, value, choices, attrs="", class_="", error=False, html5=False
+):
+    """Multiple HTML element input of type checkbox.
+
+    >>> widget_multiple_checkbox('scm', 'scm', ['hg'],
+    ...     [('git', 'Git'), ('hg', 'Hg')])
+    '<label><input id="scm" name="scm" type="checkbox" value="1" />\
+Git</label><label><input id="scm" name="scm" type="checkbox" value="1" \
+checked="checked" />Hg</label>'
+    >>> widget_multiple_checkbox('scm', 'scm', ['hg'], [('hg', 'Hg')],
+    ...     html5=True)
+    '<label><input id="scm" name="scm" type=checkbox value=1 checked>\
+Hg</label>'
+    """
+    class_ = widget_class(class_, error)
+    label = "<label" + attrs + class_ + ">"
+    start = (
+        label
+        + '<input id="'
+        + id_
+        + '" name="'
+        + name
+        + (
+            html5
+            and '" type=checkbox value=1'
+            or '" type="checkbox" value="1"'
+        )
+        + attrs
+        + class_
+    )
+    checked, unchecked = CHECKED[html5]
+    return "".join(
+        [
+            start + (key in value and checked or unchecked) + text + "</label>"
+            for key, _, text in choices_cache(choices)
+        ]
+    )
+
+
+def widget_radio(
+    id_, name, value, choices, attrs="", class_="", error=False, html5=False
+):
+    """A group of HTML input elements of type radio.
+
+    >>> widget_radio('scm', 'scm', 'hg', [('git', 'Git'), ('hg', 'Hg')])
+    '<label><input type="radio" name="scm" value="git" />Git</label>\
+<label><input type="radio" name="scm" value="hg" checked="checked" />\
+Hg</label>'
+    >>> widget_radio('scm', 'scm', 'hg', [('hg', 'Hg')], html5=True)
+    '<label><input type=radio name="scm" value="hg" checked>Hg</label>'
+    """
+    class_ = widget_class(class_, error)
+    start = (
+        "<label"
+        + attrs
+        + class_
+        + (html5 and "><input type=radio" or '><input type="radio"')
+        + ' name="'
+        + name
+        + '"'
+        + attrs
+        + ' value="'
+    )
+    checked, unchecked = CHECKED[html5]
+    return "".join(
+        [
+            start
+            + escaped_key
+            + '"'
+            + class_
+            + (key == value and checked or unchecked)
+            + text
+            + "</label>"
+            for key, escaped_key, text in choices_cache(choices)
+        ]
+    )
+
+
+def widget_options(value, choices, multiple, html5=False):
+    """Returns html options of select element. Choices that are not
+    cached or memoized are rendered directly.
+    """
+    choices = resolve_choices(choices)
+    if type(choices) is tuple or options_scope.get() is not None:
+        return options_block(choices).render(value, multiple, html5)
+    selected = html5 and '" selected>' or '" selected="selected">'
+    return "".join(
+        [
+            '<option value="'
+            + escaped_key
+            + (
+                (key in value if multiple else key == value)
+                and selected
+                or '">'
+            )
+            + text
+            + "</option>"
+            for key, escaped_key, text in escape_choices(choices)
+        ]
+    )
+
+
+def widget_select(
+    id_, name, value, choices, attrs="", class_="", error=False, html5=False
+):
+    """HTML element select.
+
+    >>> widget_select('scm', 'scm', 'hg', [('git', 'Git'), ('hg', 'Hg')],
+    ...     ' size="2"', 'x', True)
+    '<select id="scm" name="scm" size="2" class="error x">\
+<option value="git">Git</option>\
+<option value="hg" selected="selected">Hg</option></select>'
+    """
+    return (
+        '<select id="'
+        + id_
+        + '" name="'
+        + name
+        + '"'
+        + attrs
+        + widget_class(class_, error)
+        + ">"
+        + widget_options(value, choices, False, html5)
+        + "</select>"
+    )
+
+
+def widget_multiple_select(
+    id_, name, value, choices, attrs="", class_="", error=False, html5=False
+):
+    """HTML element select of type multiple."""
+    return (
+        '<select id="'
+        + id_
+        + '" name="'
+        + name
+        + (html5 and '" multiple' or '" multiple="multiple"')
+        + attrs
+        + widget_class(class_, error)
+        + ">"
+        + widget_options(value, choices, True, html5)
+        + "</select>"
+    )
+
+
+class FragmentCache(object):
+    """Thread-safe LRU cache of rendered widget fragments. Entries
+    expire ``ttl`` seconds after they are stored, ``None`` disables
+    expiration.
+
+    >>> cache = FragmentCache(maxsize=1)
+    >>> cache.set('a', '<a>')
+    >>> cache.get('a'), cache.get('b')
+    ('<a>', None)
+    >>> cache.set('b', '<b>')
+    >>> cache.get('a')
+    >>> s = cache.snapshot()
+    >>> s['hits'], s['misses'], s['evictions'], s['size']
+    (1, 2, 1, 1)
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, timer=monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.lock = Lock()
+        self.items = OrderedDict()
+        self.reset()
+
+    def reset(self):
+        """Resets statistics."""
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.uncached = 0
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def get(self, key):
+        """Returns fragment stored for ``key`` or ``None``."""
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] is not None and entry[0] <= self.timer():
+                del self.items[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, fragment, ref=None):
+        """Stores ``fragment`` for ``key``, the entry keeps a reference
+        to ``ref``, e.g. an object which id is a part of the key.
+        """
+        expires = self.ttl is not None and self.timer() + self.ttl or None
+        with self.lock:
+            items = self.items
+            items[key] = (expires, fragment, ref)
+            items.move_to_end(key)
+            if len(items) > self.maxsize:
+                items.popitem(last=False)
+                self.evictions += 1
+
+    def add_uncached(self):
+        """Counts a fragment rendered without the cache."""
+        with self.lock:
+            self.uncached += 1
+
+    def snapshot(self):
+        """Returns a copy of statistics."""
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "uncached": self.uncached,
+                "size": len(self.items),
+                "maxsize": self.maxsize,
+            }
+
+
+# fragments of choice widgets rendered in fragments mode
+fragment_cache = FragmentCache()
+
+
+def widget_fragment(
+    helper,
+    id_,
+    name,
+    value,
+    choices,
+    attrs="",
+    class_="",
+    error=False,
+    html5=False,
+):
+    """Returns output of a shared widget ``helper`` cached in
+    :py:data:`fragment_cache`. Fragments are keyed by helper, field
+    name, value, identity of choices and error state, so the value is
+    the version token of a fragment and choices are not hashed per
+    render. Choices must be a tuple of tuples to be cached, it is
+    referenced by the cache entry, so its id is not reused while the
+    fragment is cached. The value must be hashable (a list value is
+    keyed as a tuple).
+
+    >>> widget_fragment(widget_select, 'scm', 'scm', 'hg',
+    ...     (('hg', 'Hg'),))
+    '<select id="scm" name="scm">\
+<option value="hg" selected="selected">Hg</option></select>'
+    """
+    choices = resolve_choices(choices)
+    error = bool(error)
+    key = (
+        helper,
+        id_,
+        name,
+        tuple(value) if type(value) is list else value,
+        id(choices),
+        attrs,
+        class_,
+        error,
+        html5,
+    )
+    try:
+        if type(choices) is not tuple:
+            raise TypeError
+        fragment = fragment_cache.get(key)
+    except TypeError:
+        fragment_cache.add_uncached()
+        return helper(id_, name, value, choices, attrs, class_, error, html5)
+    if fragment is None:
+        fragment = helper(
+            id_, name, value, choices, attrs, class_, error, html5
+        )
+        fragment_cache.set(key, fragment, choices)
+    return fragment
+
+
+# region: widget timing
+
+
+class WidgetTimings(object):
+    """Render durations of widgets in timing mode, keyed by
+    ``(template, line, name)``; a template is a ``#`` prefixed hash of
+    its source if the engine does not pass template name to
+    preprocessors.
+
+    >>> t = WidgetTimings()
+    >>> t.record(('x.html', 3, 'scm'), 2000)
+    >>> t.record(('x.html', 3, 'scm'), 4000)
+    >>> t.durations
+    {('x.html', 3, 'scm'): [2, 6000]}
+    >>> print(t.summary())
+    template:line name                  calls   total ms    mean us
+    x.html:3 scm                            2      0.006      3.000
+    """
+
+    def __init__(self):
+        self.started = []
+        self.durations = {}
+
+    def record(self, key, elapsed):
+        entry = self.durations.get(key)
+        if entry is None:
+            self.durations[key] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def summary(self, limit=None):
+        """Returns a table of widgets, the slowest first."""
+        rows = sorted(self.durations.items(), key=lambda i: -i[1][1])
+        lines = [
+            "%-32s %8s %10s %10s"
+            % ("template:line name", "calls", "total ms", "mean us")
+        ]
+        for (template, line, name), (calls, total) in rows[:limit]:
+            lines.append(
+                "%-32s %8d %10.3f %10.3f"
+                % (
+                    "%s:%d %s" % (template, line, name),
+                    calls,
+                    total / 1e6,
+                    total / 1e3 / calls,
+                )
+            )
+        return "\n".join(lines)
+
+
+widget_timings = ContextVar("widget_timings", default=None)
+
+
+@contextmanager
+def widget_timing():
+    """Collects render durations of widgets in timing mode until exit,
+    e.g. per request. Yields :py:class:`WidgetTimings`.
+
+    >>> with widget_timing() as timings:
+    ...     widget_timer_start() + widget_timer_stop('x.html', 1, 'scm')
+    ''
+    >>> list(timings.durations)
+    [('x.html', 1, 'scm')]
+    """
+    timings = WidgetTimings()
+    token = widget_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        widget_timings.reset(token)
+
+
+def widget_timer_start():
+    """Starts timing of a widget, renders nothing."""
+    timings = widget_timings.get()
+    if timings is not None:
+        timings.started.append(perf_counter_ns())
+    return ""
+
+
+def widget_timer_stop(template, line, name):
+    """Stops timing of a widget, renders nothing."""
+    timings = widget_timings.get()
+    if timings is not None and timings.started:
+        timings.record(
+            (template, line, name), perf_counter_ns() - timings.started.pop()
+        )
+    return ""
+
+
+# names used by widgets in shared mode, to be available in template
+# globals
+shared_widgets = {
+    "resolve_choices": resolve_choices,
+    "widget_fragment": widget_fragment,
+    "widget_multiple_checkbox": widget_multiple_checkbox,
+    "widget_multiple_hidden": widget_multiple_hidden,
+    "widget_multiple_select": widget_multiple_select,
+    "widget_radio": widget_radio,
+    "widget_select": widget_select,
+    "widget_timer_start": widget_timer_start,
+    "widget_timer_stop": widget_timer_stop,
+}
+
+
+@cython.locals(formatter_name=str)
 def format_value(value, format_spec=None, format_provider=None):
     """Formats widget value.
 
@@ -79,9 +912,8 @@ def format_value(value, format_spec=None, format_provider=None):
     else:
         if format_provider is None:
             formatter_name = type(value).__name__
-            if formatter_name in format_providers:
-                format_provider = format_providers[formatter_name]
-            else:
+            format_provider = format_providers.get(formatter_name)
+            if format_provider is None:
                 return str(value)
         return format_provider(value, format_spec)
 